@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    throughput and latency of the ViSearchAPI methods against a local mock server
+
+    python benchmarks/bench_client.py [--methods search,uploadsearch] [--concurrency 1,4,16]
+                                      [--requests 200] [--latency 20] [--results 30] [--fields 10]
+                                      [--transport requests|urllib3|memory] [--output results.json]
+
+    benchmarks/mock_server.py runs in its own process, every (method, concurrency) pair in
+    another one, so that cpu time and peak memory (max rss) belong to the client only.
+    prints one json document with requests/sec, latency percentiles, cpu milliseconds per
+    request and peak rss for every pair.
+
+    with `--transport memory` no server is started, the client gets the same answers from a
+    MemoryTransport: what is left is the cost of the sdk itself, building the parameters,
+    encoding the request and decoding the response.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, '..'))
+
+from bench_read_image import make_image, _max_rss_kb
+from mock_server import canned_responses
+
+
+TRANSPORTS = ('requests', 'urllib3', 'memory')
+METHODS = ('search', 'recommendation', 'colorsearch', 'uploadsearch', 'discoversearch',
+           'insert', 'remove', 'insert_status')
+WARMUP_REQUESTS = 5
+
+
+def method_calls(api, image_path, limit):
+    return {
+        'search': lambda i: api.search('image-%d' % (i % 100), limit=limit, get_all_fl=True),
+        'recommendation': lambda i: api.recommendation('image-%d' % (i % 100), limit=limit, get_all_fl=True),
+        'colorsearch': lambda i: api.colorsearch('fa4d4d', limit=limit, get_all_fl=True),
+        'uploadsearch': lambda i: api.uploadsearch(image_path=image_path, resize='STANDARD', limit=limit),
+        'discoversearch': lambda i: api.discoversearch(im_url='http://example.com/%d.jpg' % i),
+        'insert': lambda i: api.insert([{'im_name': 'image-%d' % i, 'im_url': 'http://example.com/%d.jpg' % i}]),
+        'remove': lambda i: api.remove(['image-%d' % i]),
+        'insert_status': lambda i: api.insert_status(352649805417295872),
+    }
+
+
+def percentile(values, percent):
+    return values[min(int(len(values) * percent / 100.0), len(values) - 1)]
+
+
+def create_transport(name, pool_maxsize, results, fields):
+    from visearch import transport
+
+    if name == 'urllib3':
+        return transport.Urllib3Transport(pool_maxsize=pool_maxsize)
+    if name == 'memory':
+        return transport.MemoryTransport(canned_responses(results, fields), keep=0)
+    return transport.RequestsTransport(pool_maxsize=pool_maxsize)
+
+
+def run_method(host, method, concurrency, requests, image_path, limit, transport='requests', fields=10):
+    from visearch import client
+
+    api = client.ViSearchAPI('bench', 'bench', host=host,
+                             transport=create_transport(transport, max(concurrency, 10), limit, fields))
+    call = method_calls(api, image_path, limit)[method]
+    for i in range(WARMUP_REQUESTS):
+        call(i)
+
+    def timed(i):
+        start = time.time()
+        try:
+            call(i)
+            error = False
+        except Exception:
+            error = True
+        return time.time() - start, error
+
+    rss_before = _max_rss_kb()
+    cpu_before = os.times()
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed, range(requests)))
+    elapsed = time.time() - start
+    cpu_after = os.times()
+    api.close()
+
+    latencies = sorted(latency for latency, _ in outcomes)
+    cpu = (cpu_after[0] - cpu_before[0]) + (cpu_after[1] - cpu_before[1])
+    return {
+        'method': method,
+        'transport': transport,
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for _, error in outcomes if error),
+        'requests_per_sec': requests / elapsed,
+        'mean_ms': 1000 * sum(latencies) / len(latencies),
+        'p50_ms': 1000 * percentile(latencies, 50),
+        'p95_ms': 1000 * percentile(latencies, 95),
+        'p99_ms': 1000 * percentile(latencies, 99),
+        'max_ms': 1000 * latencies[-1],
+        'cpu_ms_per_request': 1000 * cpu / requests,
+        'peak_rss_kb': _max_rss_kb(),
+        'peak_rss_growth_kb': _max_rss_kb() - rss_before,
+        'pool': api.pool_stats,
+    }
+
+
+def start_server(args):
+    server = subprocess.Popen([sys.executable, os.path.join(BENCHMARKS_DIR, 'mock_server.py'),
+                               '--latency', str(args.latency), '--results', str(args.results),
+                               '--fields', str(args.fields)], stdout=subprocess.PIPE)
+    port = json.loads(server.stdout.readline().decode('utf-8'))['port']
+    return server, 'http://127.0.0.1:%d/' % port
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--methods', default=','.join(METHODS))
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=20, help='server latency in milliseconds')
+    parser.add_argument('--results', type=int, default=30, help='results per search answer')
+    parser.add_argument('--fields', type=int, default=10, help='metadata fields per result')
+    parser.add_argument('--transport', default='requests', choices=TRANSPORTS)
+    parser.add_argument('--output', help='also write the results to this file')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    parser.add_argument('--host', help=argparse.SUPPRESS)
+    parser.add_argument('--image', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_method(args.host, args.run, int(args.concurrency), args.requests, args.image,
+                                    args.results, args.transport, args.fields)))
+        return
+
+    methods = args.methods.split(',')
+    unknown = set(methods) - set(METHODS)
+    if unknown:
+        parser.error('unknown methods: %s' % ', '.join(sorted(unknown)))
+
+    tmp_dir = tempfile.mkdtemp()
+    image_path = os.path.join(tmp_dir, 'bench.jpg')
+    make_image(image_path, (1600, 1200))
+    if args.transport == 'memory':
+        server, host = None, 'http://visearch.visenze.com/'
+    else:
+        server, host = start_server(args)
+    try:
+        results = []
+        for method in methods:
+            for concurrency in args.concurrency.split(','):
+                output = subprocess.check_output([
+                    sys.executable, os.path.abspath(__file__), '--run', method, '--concurrency', concurrency,
+                    '--requests', str(args.requests), '--results', str(args.results), '--fields', str(args.fields),
+                    '--transport', args.transport, '--host', host, '--image', image_path])
+                results.append(json.loads(output.decode('utf-8')))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        os.remove(image_path)
+        os.rmdir(tmp_dir)
+
+    report = json.dumps({
+        'server': {'latency_ms': args.latency, 'results': args.results, 'fields': args.fields},
+        'transport': args.transport,
+        'python': sys.version.split()[0],
+        'results': results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
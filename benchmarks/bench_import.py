@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    cold import time of the sdk, from `python -X importtime`
+
+    python benchmarks/bench_import.py [--module visearch.client] [--runs 10] [--top 15]
+                                      [--max-ms 50] [--output importtime.json]
+
+    every run imports the module in a fresh interpreter. prints the median cumulative import
+    time of the module, the modules with the highest median self time under it, and which of
+    the heavy dependencies (Pillow, requests, urllib3, aiohttp) the import loaded. exits with
+    status 1 when the median is above --max-ms, to track regressions.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# loaded on demand by the sdk: with the first image read, the first request, the async client
+HEAVY_MODULES = ('PIL', 'requests', 'urllib3', 'aiohttp', 'multiprocessing')
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def parse_importtime(output, module):
+    """
+        {name: (self_us, cumulative_us)} of module and everything imported while importing it
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or line.endswith('| imported package'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((int(self_us), int(cumulative_us), name.strip(), depth))
+
+    # a module is reported after its imports, the ones right above it with a deeper level
+    for index in range(len(entries) - 1, -1, -1):
+        if entries[index][2] == module:
+            modules = {module: entries[index][:2]}
+            depth = entries[index][3]
+            for self_us, cumulative_us, name, level in reversed(entries[:index]):
+                if level <= depth:
+                    break
+                modules[name] = (self_us, cumulative_us)
+            return modules
+    raise RuntimeError('%s was not imported' % module)
+
+
+def run_once(module):
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+                               stderr=subprocess.PIPE, env=env)
+    _, stderr = process.communicate()
+    if process.returncode:
+        raise RuntimeError(stderr.decode('utf-8', 'replace'))
+    return parse_importtime(stderr.decode('utf-8'), module)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='visearch.client')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--max-ms', type=float)
+    parser.add_argument('--output', help='also write the results to this file')
+    args = parser.parse_args()
+
+    # the first run writes the bytecode caches
+    run_once(args.module)
+    runs = [run_once(args.module) for _ in range(args.runs)]
+
+    names = set(name for modules in runs for name in modules)
+    self_times = dict((name, median([modules.get(name, (0, 0))[0] for modules in runs])) for name in names)
+    total_ms = median([modules[args.module][1] for modules in runs]) / 1000.0
+    top = sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    report = json.dumps({
+        'module': args.module,
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'import_ms': total_ms,
+        'modules': len(runs[-1]),
+        'heavy_modules_loaded': [heavy for heavy in HEAVY_MODULES if heavy in names],
+        'top_self_ms': [{'module': name, 'self_ms': us / 1000.0} for name, us in top],
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        sys.stderr.write('import of %s took %.1fms, more than %.1fms\n' % (args.module, total_ms, args.max_ms))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
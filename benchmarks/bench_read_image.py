@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    compare the standard and the fast resize path of visearch.image.read_image
+
+    python benchmarks/bench_read_image.py [--image photo.jpg] [--resize STANDARD] [--runs 20]
+
+    without --image a 4000x3000 (12MP) jpeg is generated. every mode runs in its own
+    process so that the reported peak memory (max rss) belongs to that mode only.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def _max_rss_kb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def make_image(path, size=(4000, 3000)):
+    from PIL import Image, ImageDraw
+    image = Image.new('RGB', size, (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    for i in range(0, size[0], 40):
+        draw.line([(i, 0), (size[0] - i, size[1])], fill=(i % 255, 80, 160), width=7)
+    image.save(path, 'JPEG', quality=92)
+
+
+def run_mode(image_path, resize, runs, fast):
+    from visearch.image import read_image
+
+    rss_before = _max_rss_kb()
+    timings = []
+    upload_size = 0
+    for _ in range(runs):
+        start = time.time()
+        files = read_image(image_path, resize, fast=fast)
+        timings.append(time.time() - start)
+        upload_size = len(files['image'][1])
+    timings.sort()
+    return {
+        'mode': 'fast' if fast else 'standard',
+        'runs': runs,
+        'mean_ms': 1000 * sum(timings) / len(timings),
+        'p50_ms': 1000 * timings[len(timings) // 2],
+        'max_ms': 1000 * timings[-1],
+        'upload_bytes': upload_size,
+        'peak_rss_kb': _max_rss_kb(),
+        'peak_rss_growth_kb': _max_rss_kb() - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image')
+    parser.add_argument('--resize', default='STANDARD')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--mode', choices=['standard', 'fast'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.image, args.resize, args.runs, args.mode == 'fast')))
+        return
+
+    tmp_dir = None
+    image_path = args.image
+    if not image_path:
+        tmp_dir = tempfile.mkdtemp()
+        image_path = os.path.join(tmp_dir, 'bench.jpg')
+        make_image(image_path)
+
+    try:
+        results = []
+        for mode in ('standard', 'fast'):
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--image', image_path,
+                                              '--resize', args.resize, '--runs', str(args.runs), '--mode', mode])
+            results.append(json.loads(output.decode('utf-8')))
+        print(json.dumps({
+            'image': os.path.basename(image_path),
+            'image_bytes': os.path.getsize(image_path),
+            'resize': args.resize,
+            'results': results,
+            'speedup': results[0]['mean_ms'] / results[1]['mean_ms'],
+        }, indent=2))
+    finally:
+        if tmp_dir:
+            os.remove(image_path)
+            os.rmdir(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    a local stand-in for the ViSearch api, for benchmarks
+
+    python benchmarks/mock_server.py [--port 0] [--latency 20] [--results 30] [--fields 10]
+
+    answers /search, /recommendation, /colorsearch, /uploadsearch, /discoversearch,
+    /insert, /remove and /insert/status/{trans_id} with well-formed responses after
+    `latency` milliseconds. search answers carry min(limit, results) results with `fields`
+    metadata fields each. prints {"port": ...} once it is listening.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from six.moves.urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tests.local_server import LocalServer
+
+
+SEARCH_ENDPOINTS = ('search', 'recommendation', 'colorsearch', 'uploadsearch')
+
+
+def search_response(method, limit, fields):
+    return {
+        'status': 'OK',
+        'method': method,
+        'error': [],
+        'page': 1,
+        'limit': limit,
+        'total': 10000,
+        'result': [{
+            'im_name': 'image-%d' % i,
+            'score': 1 - i / 1000.0,
+            'value_map': dict(('field_%d' % f, 'value %d of image %d' % (f, i)) for f in range(fields)),
+        } for i in range(limit)],
+    }
+
+
+def discover_response(fields):
+    objects = []
+    for index, kind in enumerate(('top', 'bottom', 'shoe')):
+        result = search_response('discoversearch', 10, fields)['result']
+        objects.append({'type': kind, 'box': [10 * index, 10, 200, 300], 'total': 10, 'result': result})
+    return {'status': 'OK', 'method': 'discoversearch', 'error': [], 'objects': objects}
+
+
+def write_response(endpoint):
+    return {'status': 'OK', 'method': endpoint, 'total': 1, 'trans_id': 352649805417295872}
+
+
+def status_response(trans_id):
+    return {'status': 'OK', 'method': 'insert/status', 'result': [{
+        'trans_id': trans_id, 'processed_percent': 100, 'total': 1, 'success_count': 1, 'fail_count': 0}]}
+
+
+def canned_responses(results=30, fields=10):
+    """
+        the same answers for a MemoryTransport, search answers always carry `results` results
+    """
+    responses = dict((endpoint, (200, json.dumps(search_response(endpoint, results, fields))))
+                     for endpoint in SEARCH_ENDPOINTS)
+    responses['discoversearch'] = (200, json.dumps(discover_response(fields)))
+    for endpoint in ('insert', 'remove'):
+        responses[endpoint] = (200, json.dumps(write_response(endpoint)))
+    responses['insert/status'] = (200, lambda request: json.dumps(status_response(request.url.rsplit('/', 1)[-1])))
+    return responses
+
+
+class MockServer(LocalServer):
+    """
+        latency: seconds before every answer
+        results: maximum number of results per search answer
+        fields: metadata fields per result
+    """
+
+    def __init__(self, port=0, latency=0.02, results=30, fields=10):
+        responses = dict((endpoint, (200, self.search_body)) for endpoint in SEARCH_ENDPOINTS)
+        responses['discoversearch'] = (200, json.dumps(discover_response(fields)))
+        for endpoint in ('insert', 'remove'):
+            responses[endpoint] = (200, json.dumps(write_response(endpoint)))
+        responses['insert/status'] = (200, self.status_body)
+        super(MockServer, self).__init__(responses, port, latency, record=False)
+        self.results = results
+        self.fields = fields
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def route(self, path):
+        path = path.strip('/')
+        if path.startswith('insert/status/'):
+            path = 'insert/status'
+        return self.responses.get(path) or (404, json.dumps({'status': 'fail', 'error': ['unknown endpoint %s' % path]}))
+
+    def search_body(self, method, path, request_body):
+        url = urlparse(path)
+        endpoint = url.path.strip('/')
+        limit = min(int(parse_qs(url.query).get('limit', ['30'])[0]), self.results)
+        key = (endpoint, limit)
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is None:
+                body = self._bodies[key] = json.dumps(search_response(endpoint, limit, self.fields))
+            return body
+
+    def status_body(self, method, path, request_body):
+        return json.dumps(status_response(urlparse(path).path.rsplit('/', 1)[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=20, help='milliseconds before every answer')
+    parser.add_argument('--results', type=int, default=30)
+    parser.add_argument('--fields', type=int, default=10)
+    args = parser.parse_args()
+
+    server = MockServer(args.port, args.latency / 1000.0, args.results, args.fields)
+    print(json.dumps({'port': server.httpd.server_port}))
+    sys.stdout.flush()
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -18,9 +18,15 @@ requirements = [
     'requests',
     'six',
     'simplejson',
-    'pillow'
+    'pillow',
+    'futures; python_version < "3"'
 ]
 
+extras_requirements = {
+    'async': ['aiohttp>=3.3'],
+    'fast': ['orjson; python_version >= "3.6"'],
+}
+
 test_requirements = [
     # TODO: put package test requirements here
     'httpretty==0.8.10'
@@ -42,6 +48,7 @@ setup(
                  'visearch'},
     include_package_data=True,
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="BSD",
     zip_safe=False,
     keywords='visearch',
@@ -1 +1,14 @@
 # -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+
+def additional_tests():
+    """
+        the coroutine tests of tests/py3, python 2 cannot compile them. the directory has no
+        __init__.py so that setuptools' test loader does not import them on its own.
+    """
+    if sys.version_info < (3, 5):
+        return unittest.TestSuite()
+    return unittest.defaultTestLoader.discover(os.path.join(os.path.dirname(__file__), 'py3'))
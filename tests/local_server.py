@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+    a keep-alive capable http server on localhost for tests that need real sockets,
+    benchmarks/mock_server.py builds on it too
+"""
+import threading
+import time
+from requests.structures import CaseInsensitiveDict
+from six.moves.BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from six.moves.socketserver import ThreadingMixIn
+from six.moves.urllib.parse import urlparse
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, nagle would hold the body back for a delayed ack
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            body = self._read_chunked()
+        else:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+        path = urlparse(self.path).path.lstrip('/')
+        if self.server.requests is not None:
+            self.server.requests.append((self.command, self.path, CaseInsensitiveDict(self.headers.items()), body))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        status, resp_body = self.server.route(path)
+        headers = {}
+        if callable(resp_body):
+            resp_body = resp_body(self.command, self.path, body)
+        if isinstance(resp_body, tuple):
+            # the callable decided on the status, and maybe headers, itself
+            status, resp_body, headers = (resp_body + ({}, ))[:3]
+        if not isinstance(resp_body, bytes):
+            resp_body = resp_body.encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(resp_body)))
+        self.end_headers()
+        self.wfile.write(resp_body)
+
+    def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b';')[0], 16)
+            if not size:
+                self.rfile.readline()
+                return b''.join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    do_GET = _respond
+    do_POST = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer(object):
+    """
+        responses maps a path without the leading slash to (status, body),
+        body may be a callable taking (method, path, request_body) and returning
+        the body or a (status, body[, headers]) tuple
+
+        latency: seconds to wait before every answer
+        record: keep every request in `requests`, off for long benchmark runs
+    """
+
+    def __init__(self, responses=None, port=0, latency=0, record=True):
+        self.httpd = _ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self.httpd.responses = responses or {}
+        self.httpd.requests = [] if record else None
+        self.httpd.latency = latency
+        self.httpd.route = self.route
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={'poll_interval': 0.05})
+        self.thread.daemon = True
+
+    @property
+    def host(self):
+        return 'http://127.0.0.1:%d/' % self.httpd.server_port
+
+    @property
+    def responses(self):
+        return self.httpd.responses
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def route(self, path):
+        """
+            the (status, body) entry answering `path`
+        """
+        return self.responses.get(path, (404, '{}'))
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
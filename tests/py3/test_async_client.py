@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import os.path
+import sys
+import time
+import unittest
+from six.moves.urllib.parse import urlparse, parse_qs
+from visearch.bind import ViSearchAPIError
+from visearch.breaker import CircuitBreakers, CLOSED, HALF_OPEN
+from visearch.metrics import MetricsCollector
+from visearch.ratelimit import RateLimiter, RateLimitExceeded
+from tests.local_server import LocalServer
+from tests.test_singleflight import slow
+
+try:
+    import aiohttp
+    from visearch.async_client import AsyncViSearchAPI
+except ImportError:
+    aiohttp = None
+
+# the coroutine tests of the other modules are here as well. python 2 cannot compile this
+# module, it is only loaded on python 3 (see tests/__init__.py), and asyncio.run needs 3.7
+requires_asyncio = unittest.skipIf(aiohttp is None or sys.version_info < (3, 7),
+                                   'aiohttp and python 3.7+ are needed')
+
+SEARCH_RESPONSE = '{"status": "OK", "method": "search", "result": [{"im_name": "39882808162"}], "error": [], "total": 1, "page": 1}'
+INSERT_RESPONSE = '{"status": "OK", "total": 1, "method": "insert", "trans_id": 352649805417295872}'
+UPLOADSEARCH_RESPONSE = '{"status": "OK", "method": "uploadsearch", "result": [], "error": [], "total": 0, "page": 1}'
+
+
+@requires_asyncio
+class TestAsyncVisearch(unittest.TestCase):
+
+    def setUp(self):
+        self.image_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + '/fixtures/upload.jpg'
+
+    def run_with_client(self, server, func, **kwargs):
+        async def main():
+            async with AsyncViSearchAPI('debug', 'debug', host=server.host, **kwargs) as api:
+                return await func(api)
+        return asyncio.run(main())
+
+    def test_search(self):
+        with LocalServer({'search': (200, SEARCH_RESPONSE)}) as server:
+            resp = self.run_with_client(server, lambda api: api.search('test_im', fl=['price', 'brand'], limit=10))
+
+            self.assertEqual(resp['result'][0]['im_name'], '39882808162')
+            method, path, headers, _ = server.requests[0]
+            query = parse_qs(urlparse(path).query)
+            self.assertEqual(method, 'GET')
+            self.assertEqual(query['im_name'], ['test_im'])
+            self.assertEqual(query['fl'], ['price', 'brand'])
+            self.assertEqual(query['limit'], ['10'])
+            self.assertTrue(headers['X-Requested-With'].startswith('ViSenze-Python-SDK'))
+            self.assertTrue(headers['Authorization'].startswith('Basic '))
+
+    def test_insert(self):
+        with LocalServer({'insert': (200, INSERT_RESPONSE)}) as server:
+            images = [{'im_name': 'a', 'im_url': 'http://a.jpg'}, {'im_name': 'b', 'im_url': 'http://b.jpg'}]
+            resp = self.run_with_client(server, lambda api: api.insert(images))
+
+            self.assertEqual(resp['trans_id'], 352649805417295872)
+            body = parse_qs(server.requests[0][3].decode('utf-8'))
+            self.assertEqual(body['im_name[1]'], ['b'])
+            self.assertEqual(body['im_url[0]'], ['http://a.jpg'])
+
+    def test_uploadsearch_resize(self):
+        with LocalServer({'uploadsearch': (200, UPLOADSEARCH_RESPONSE)}) as server:
+            resp = self.run_with_client(server, lambda api: api.uploadsearch(image_path=self.image_path, resize='STANDARD'))
+
+            self.assertEqual(resp['status'], 'OK')
+            method, _, headers, body = server.requests[0]
+            self.assertEqual(method, 'POST')
+            self.assertTrue(headers['Content-Type'].startswith('multipart/form-data'))
+            self.assertTrue(b'name="image"' in body)
+
+    def test_discoversearch_list_parameter(self):
+        with LocalServer({'discoversearch': (200, '{"status": "OK", "objects": []}')}) as server:
+            self.run_with_client(server, lambda api: api.discoversearch(image=self.image_path, fl=['price', 'brand']))
+
+            body = server.requests[0][3]
+            self.assertTrue(b'name="fl"\r\n\r\nprice\r\n' in body)
+            self.assertTrue(b'name="fl"\r\n\r\nbrand\r\n' in body)
+
+    def test_api_error(self):
+        with LocalServer({'search': (502, '{}')}) as server:
+            self.assertRaises(ViSearchAPIError, self.run_with_client, server, lambda api: api.search('test_im'))
+
+    def test_bounded_concurrency(self):
+        with LocalServer({'search': (200, SEARCH_RESPONSE)}) as server:
+            async def search_many(api):
+                return await asyncio.gather(*[api.search('im_%d' % i) for i in range(20)])
+
+            resps = self.run_with_client(server, search_many, max_concurrency=3)
+
+            self.assertEqual(len(resps), 20)
+            self.assertEqual(len(server.requests), 20)
+
+    def test_result_objects(self):
+        with LocalServer({'search': (200, SEARCH_RESPONSE)}) as server:
+            resp = self.run_with_client(server, lambda api: api.search('test_im'), result_objects=True)
+
+            self.assertEqual(resp.status, 'OK')
+            self.assertEqual(resp.result[0].im_name, '39882808162')
+
+
+@requires_asyncio
+class TestAsyncCoalescing(unittest.TestCase):
+
+    def test_identical_searches(self):
+        async def main(host):
+            async with AsyncViSearchAPI('debug', 'debug', host=host, coalesce=True) as api:
+                results = await asyncio.gather(*[api.search('a') for _ in range(6)])
+                return api, results
+
+        with LocalServer({'search': (200, slow(200, SEARCH_RESPONSE))}) as server:
+            api, results = asyncio.run(main(server.host))
+
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(len(results), 6)
+        self.assertEqual(api.singleflight.stats, {'calls': 1, 'shared': 5, 'in_flight': 0})
+
+    def test_cancelled_caller(self):
+        async def main(host):
+            async with AsyncViSearchAPI('debug', 'debug', host=host, coalesce=True) as api:
+                first = asyncio.ensure_future(api.search('a'))
+                second = asyncio.ensure_future(api.search('a'))
+                await asyncio.sleep(0.05)
+                first.cancel()
+                return await second
+
+        with LocalServer({'search': (200, slow(200, SEARCH_RESPONSE))}) as server:
+            resp = asyncio.run(main(server.host))
+
+        self.assertEqual(resp['status'], 'OK')
+        self.assertEqual(len(server.requests), 1)
+
+
+@requires_asyncio
+class TestAsyncClientMetrics(unittest.TestCase):
+
+    def test_search(self):
+        collector = MetricsCollector()
+
+        async def main(host):
+            async with AsyncViSearchAPI('debug', 'debug', host=host, hooks=[collector]) as api:
+                await asyncio.gather(api.search('a'), api.search('b'))
+
+        with LocalServer({'search': (200, SEARCH_RESPONSE)}) as server:
+            asyncio.run(main(server.host))
+
+        stats = collector.stats['search']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['status_codes'], {200: 2})
+        self.assertEqual(set(stats['timings']), {'encode', 'queue', 'connect', 'ttfb', 'download', 'decode', 'total'})
+        self.assertTrue(stats['timings']['connect']['max'] > 0)
+
+
+@requires_asyncio
+class TestAsyncClientRateLimit(unittest.TestCase):
+
+    def test_search(self):
+        limiter = RateLimiter(search_qps=50, burst=1)
+
+        async def main(host):
+            async with AsyncViSearchAPI('debug', 'debug', host=host, rate_limiter=limiter) as api:
+                start = time.time()
+                await asyncio.gather(*[api.search('image-%d' % i) for i in range(5)])
+                return time.time() - start
+
+        with LocalServer({'search': (200, SEARCH_RESPONSE)}) as server:
+            elapsed = asyncio.run(main(server.host))
+            self.assertEqual(len(server.requests), 5)
+        self.assertTrue(elapsed >= 0.07)
+        self.assertEqual(limiter.stats['search']['requests'], 5)
+
+
+@requires_asyncio
+class TestAsyncCircuitBreaker(unittest.TestCase):
+
+    def test_rate_limited_probe(self):
+        breakers = CircuitBreakers(failure_threshold=1, reset_timeout=0.05)
+        limiter = RateLimiter(search_qps=10, burst=1, max_wait=0)
+
+        async def main(host):
+            async with AsyncViSearchAPI('debug', 'debug', host=host, circuit_breaker=breakers,
+                                        rate_limiter=limiter) as api:
+                breakers.get('search').record(0.01, failed=True)
+                # no token left for the probe
+                limiter.acquire('search')
+                await asyncio.sleep(0.06)
+                with self.assertRaises(RateLimitExceeded):
+                    await api.search('a')
+                self.assertEqual(breakers.stats['search']['state'], HALF_OPEN)
+                await asyncio.sleep(0.1)
+                return await api.search('a')
+
+        with LocalServer({'search': (200, SEARCH_RESPONSE)}) as server:
+            resp = asyncio.run(main(server.host))
+
+        self.assertEqual(resp['status'], 'OK')
+        self.assertEqual(breakers.stats['search']['state'], CLOSED)
+
+    def test_cancelled_probe(self):
+        breakers = CircuitBreakers(failure_threshold=1, reset_timeout=0.05)
+
+        async def main(host):
+            async with AsyncViSearchAPI('debug', 'debug', host=host, circuit_breaker=breakers) as api:
+                breakers.get('search').record(0.01, failed=True)
+                await asyncio.sleep(0.06)
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(api.search('a'), 0.05)
+                # the cancelled probe did not close the circuit, and another one may go
+                self.assertEqual(breakers.stats['search']['state'], HALF_OPEN)
+                self.assertEqual(breakers.stats['search']['successes'], 0)
+                return await api.search('b')
+
+        with LocalServer({'search': (200, slow(200, SEARCH_RESPONSE, 0.2))}) as server:
+            resp = asyncio.run(main(server.host))
+
+        self.assertEqual(resp['status'], 'OK')
+        self.assertEqual(breakers.stats['search']['state'], CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
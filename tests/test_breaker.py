@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import time
+import unittest
+from visearch import client
+from visearch.bind import ViSearchAPIError
+from visearch.breaker import CircuitBreaker, CircuitBreakers, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from visearch.cache import ResultCache
+from visearch.metrics import RequestHook
+from visearch.ratelimit import RateLimiter, RateLimitExceeded
+from visearch.transport import MemoryTransport
+from tests.local_server import LocalServer
+
+
+SEARCH_RESPONSE = '{"status": "OK", "method": "search", "result": [], "error": [], "total": 0, "page": 1}'
+
+
+class Switch(object):
+
+    def __init__(self):
+        self.down = False
+
+    def __call__(self, method, path, body):
+        if self.down:
+            return 503, '{}'
+        return 200, SEARCH_RESPONSE
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_open_and_recover(self):
+        breaker = CircuitBreaker('search', failure_threshold=2, reset_timeout=0.05)
+        breaker.before_call()
+        breaker.record(0.01, failed=True)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.before_call()
+        breaker.record(0.01, failed=True)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertRaises(CircuitOpenError, breaker.before_call)
+
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        breaker.before_call()
+        # a single probe at a time
+        self.assertRaises(CircuitOpenError, breaker.before_call)
+        breaker.record(0.01, failed=False)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.stats, {'state': CLOSED, 'successes': 1, 'failures': 2, 'slow_calls': 0,
+                                         'rejected': 2, 'times_opened': 1})
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker('search', failure_threshold=1, reset_timeout=0.05)
+        breaker.record(0.01, failed=True)
+        time.sleep(0.06)
+        breaker.before_call()
+        breaker.record(0.01, failed=True)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.times_opened, 2)
+
+    def test_release(self):
+        breaker = CircuitBreaker('search', failure_threshold=1, reset_timeout=0.05)
+        breaker.record(0.01, failed=True)
+        time.sleep(0.06)
+        breaker.before_call()
+        breaker.release()
+        # the probe was not sent, another one may go
+        breaker.before_call()
+        self.assertEqual(breaker.state, HALF_OPEN)
+
+    def test_slow_calls(self):
+        breaker = CircuitBreaker('search', failure_threshold=2, slow_call_duration=1)
+        breaker.record(2, failed=False)
+        breaker.record(0.5, failed=False)
+        breaker.record(2, failed=False)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record(3, failed=False)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_per_endpoint(self):
+        breakers = CircuitBreakers(failure_threshold=1)
+        self.assertTrue(breakers.get('insert/status/1') is breakers.get('insert/status/2'))
+        breakers.get('search').record(0.01, failed=True)
+        self.assertEqual(breakers.get('colorsearch').state, CLOSED)
+        self.assertEqual(breakers.stats['search']['state'], OPEN)
+
+
+class TestClientCircuitBreaker(unittest.TestCase):
+
+    def test_fail_fast(self):
+        switch = Switch()
+        switch.down = True
+        with LocalServer({'search': (200, switch)}) as server:
+            breakers = CircuitBreakers(failure_threshold=2, reset_timeout=60)
+            with client.ViSearchAPI('debug', 'debug', host=server.host, circuit_breaker=breakers) as api:
+                self.assertRaises(ViSearchAPIError, api.search, 'a')
+                self.assertRaises(ViSearchAPIError, api.search, 'a')
+                self.assertRaises(CircuitOpenError, api.search, 'a')
+
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(breakers.stats['search']['rejected'], 1)
+
+    def test_client_errors_do_not_open(self):
+        with LocalServer({'search': (404, '{}')}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, circuit_breaker=CircuitBreakers(failure_threshold=1)) as api:
+                self.assertRaises(ViSearchAPIError, api.search, 'a')
+                self.assertRaises(ViSearchAPIError, api.search, 'a')
+                self.assertEqual(api.circuit_breakers.stats['search']['state'], CLOSED)
+
+    def test_fallback_to_cache(self):
+        switch = Switch()
+        with LocalServer({'search': (200, switch)}) as server:
+            breakers = CircuitBreakers(failure_threshold=1, reset_timeout=60)
+            cache = ResultCache(ttl=0)
+            with client.ViSearchAPI('debug', 'debug', host=server.host, cache=cache, circuit_breaker=breakers) as api:
+                cached = api.search('a')
+                switch.down = True
+                self.assertRaises(ViSearchAPIError, api.search, 'a')
+                # open: the expired result is served instead of failing
+                self.assertEqual(api.search('a'), cached)
+                self.assertRaises(CircuitOpenError, api.search, 'b')
+
+    def test_rate_limited_probe(self):
+        switch = Switch()
+        switch.down = True
+        with LocalServer({'search': (200, switch)}) as server:
+            breakers = CircuitBreakers(failure_threshold=1, reset_timeout=0.05)
+            limiter = RateLimiter(search_qps=10, burst=1, max_wait=0)
+            with client.ViSearchAPI('debug', 'debug', host=server.host, circuit_breaker=breakers,
+                                    rate_limiter=limiter) as api:
+                self.assertRaises(ViSearchAPIError, api.search, 'a')
+                time.sleep(0.06)
+                # the probe is turned down by the limiter before it is sent
+                self.assertRaises(RateLimitExceeded, api.search, 'a')
+                self.assertEqual(breakers.stats['search']['state'], HALF_OPEN)
+                time.sleep(0.1)
+                switch.down = False
+                api.search('a')
+
+        self.assertEqual(breakers.stats['search']['state'], CLOSED)
+        self.assertEqual(len(server.requests), 2)
+
+    def test_failing_hook_releases_probe(self):
+        class FailingHook(RequestHook):
+            def before_request(self, metrics):
+                raise ValueError('hook')
+
+        breakers = CircuitBreakers(failure_threshold=1, reset_timeout=0.05)
+        with LocalServer({'search': (200, SEARCH_RESPONSE)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, circuit_breaker=breakers) as api:
+                breakers.get('search').record(0.01, failed=True)
+                time.sleep(0.06)
+                api.hooks.append(FailingHook())
+                self.assertRaises(ValueError, api.search, 'a')
+                api.hooks.pop()
+                api.search('a')
+
+        self.assertEqual(breakers.stats['search']['state'], CLOSED)
+
+    def test_interrupted_probe(self):
+        def interrupt(request):
+            raise KeyboardInterrupt()
+
+        breakers = CircuitBreakers(failure_threshold=1, reset_timeout=0.05)
+        transport = MemoryTransport({'search': (200, interrupt)})
+        with client.ViSearchAPI('debug', 'debug', circuit_breaker=breakers, transport=transport) as api:
+            breakers.get('search').record(0.01, failed=True)
+            time.sleep(0.06)
+            self.assertRaises(KeyboardInterrupt, api.search, 'a')
+            # neither closed by a call that did not finish, nor stuck waiting for it
+            self.assertEqual(breakers.stats['search']['state'], HALF_OPEN)
+            transport.responses['search'] = (200, SEARCH_RESPONSE)
+            api.search('a')
+
+        self.assertEqual(breakers.stats['search']['state'], CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
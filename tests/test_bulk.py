@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import itertools
+import json
+import os.path
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from six.moves.urllib.parse import parse_qs
+from visearch import client
+from visearch.bulk import iter_batches, prefetch
+from visearch.bind import ViSearchClientError
+from visearch.concurrency import AdaptiveConcurrency
+from tests.local_server import LocalServer
+
+
+def insert_callback(method, path, body):
+    params = parse_qs(body.decode('utf-8'))
+    im_names = [value[0] for key, value in params.items() if key.startswith('im_name[')]
+    if 'bad' in im_names:
+        return json.dumps({'status': 'fail', 'method': 'insert', 'error': [{'error_code': 107}]})
+    # the first image name is unique per batch, use it as trans_id
+    return json.dumps({'status': 'OK', 'method': 'insert', 'total': len(im_names), 'trans_id': params['im_name[0]'][0]})
+
+
+class TestBulkInsert(unittest.TestCase):
+
+    def test_iter_batches(self):
+        batches = list(iter_batches((i for i in range(7)), 3))
+        self.assertEqual(batches, [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertRaises(ViSearchClientError, list, iter_batches([], 0))
+
+    def test_bulk_insert_generator(self):
+        images = ({'im_name': 'im_%d' % i, 'im_url': 'http://img.com/%d.jpg' % i} for i in range(25))
+
+        with LocalServer({'insert': (200, insert_callback)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                result = api.bulk_insert(images, batch_size=10, workers=3)
+
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual([batch.count for batch in result.batches], [10, 10, 5])
+        self.assertEqual(result.trans_ids, ['im_0', 'im_10', 'im_20'])
+        self.assertEqual(result.total, 25)
+        self.assertEqual(result.failed, [])
+
+    def test_bulk_insert_partial_failure(self):
+        images = [{'im_name': 'im_%d' % i, 'im_url': 'http://img.com/%d.jpg' % i} for i in range(6)]
+        images[4]['im_name'] = 'bad'
+        # missing the required im_url, fails on the client side
+        images.append({'im_name': 'no_url'})
+
+        with LocalServer({'insert': (200, insert_callback)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                result = api.bulk_insert(images, batch_size=2, workers=2)
+
+        self.assertEqual(len(result.batches), 4)
+        self.assertEqual([batch.index for batch in result.succeeded], [0, 1])
+        self.assertEqual([batch.index for batch in result.failed], [2, 3])
+        self.assertEqual(result.failed[0].images, images[4:6])
+        self.assertEqual(result.failed[0].response['status'], 'fail')
+        self.assertTrue(isinstance(result.failed[1].error, ViSearchClientError))
+        self.assertTrue(result.succeeded[0].images is None)
+
+    def test_iter_bulk_insert_stops_early(self):
+        images = ({'im_name': 'im_%d' % i, 'im_url': 'http://img.com/%d.jpg' % i} for i in itertools.count())
+
+        with LocalServer({'insert': (200, insert_callback)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                batches = list(itertools.islice(api.iter_bulk_insert(images, batch_size=5, workers=2), 3))
+
+        self.assertEqual(len(batches), 3)
+        self.assertTrue(all(batch.succeeded for batch in batches))
+
+    def test_bulk_insert_adaptive(self):
+        images = [{'im_name': 'im_%d' % i, 'im_url': 'http://img.com/%d.jpg' % i} for i in range(40)]
+        concurrency = AdaptiveConcurrency(initial=2, max_limit=6, latency_tolerance=100)
+
+        with LocalServer({'insert': (200, insert_callback)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                result = api.bulk_insert(images, batch_size=2, adaptive=concurrency)
+
+        self.assertEqual(len(result.succeeded), 20)
+        self.assertEqual(concurrency.limit, 6)
+        self.assertTrue(all(2 <= batch.concurrency <= 6 for batch in result.batches))
+
+    def test_bulk_insert_adaptive_backs_off(self):
+        images = [{'im_name': 'im_%d' % i, 'im_url': 'http://img.com/%d.jpg' % i} for i in range(10)]
+
+        def overloaded(method, path, body):
+            return 503, '{"status": "fail", "error": ["overloaded"]}'
+
+        with LocalServer({'insert': (200, overloaded)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                batches = list(api.iter_bulk_insert(images, batch_size=1, workers=4, adaptive=True))
+
+        self.assertEqual(len(batches), 10)
+        self.assertTrue(all(batch.error is not None for batch in batches))
+        self.assertEqual(min(batch.concurrency for batch in batches), 1)
+
+    def test_bulk_remove(self):
+        names = ('im_%d' % i for i in range(5))
+        remove_response = '{"status": "OK", "method": "remove", "total": 2}'
+
+        with LocalServer({'remove': (200, remove_response)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                result = api.bulk_remove(names, batch_size=2, workers=2)
+
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual([batch.count for batch in result.batches], [2, 2, 1])
+        self.assertEqual(result.failed, [])
+        self.assertTrue(all(batch.concurrency == 2 for batch in result.batches))
+        bodies = sorted(parse_qs(request[3].decode('utf-8'))['im_name[0]'][0] for request in server.requests)
+        self.assertEqual(bodies, ['im_0', 'im_2', 'im_4'])
+
+
+
+class TestBatchUploadsearch(unittest.TestCase):
+
+    def setUp(self):
+        self.image_path = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+        self.missing_path = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/missing.jpg'
+
+    def test_batch_uploadsearch_ordered(self):
+        image_paths = [self.image_path, self.missing_path, self.image_path, self.image_path]
+
+        with LocalServer({'uploadsearch': (200, '{"status": "OK", "result": []}')}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                results = list(api.batch_uploadsearch(image_paths, resize='STANDARD', fl=['price'],
+                                                      workers=2, processes=2, ordered=True))
+
+        self.assertEqual([result.index for result in results], [0, 1, 2, 3])
+        self.assertEqual([result.succeeded for result in results], [True, False, True, True])
+        self.assertTrue(isinstance(results[1].error, IOError))
+        self.assertEqual(len(server.requests), 3)
+        method, path, _, body = server.requests[0]
+        self.assertTrue('fl=price' in path)
+        self.assertTrue(b'name="image"' in body)
+
+    def test_batch_uploadsearch_raw_images(self):
+        with LocalServer({'uploadsearch': (200, '{"status": "OK", "result": []}')}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                results = list(api.batch_uploadsearch(iter([self.image_path] * 5), workers=3))
+
+        self.assertEqual(sorted(result.index for result in results), [0, 1, 2, 3, 4])
+        self.assertTrue(all(result.succeeded for result in results))
+        with open(self.image_path, 'rb') as f:
+            self.assertTrue(f.read() in server.requests[0][3])
+
+    def test_batch_uploadsearch_adaptive(self):
+        concurrency = AdaptiveConcurrency(initial=1, max_limit=3, latency_tolerance=100)
+        with LocalServer({'uploadsearch': (200, '{"status": "OK", "result": []}')}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                results = list(api.batch_uploadsearch([self.image_path] * 6, adaptive=concurrency))
+
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertEqual(concurrency.limit, 3)
+        self.assertEqual(concurrency.stats['in_flight'], 0)
+
+    def test_resizes_ahead_of_uploads(self):
+        started = []
+        release = threading.Event()
+
+        def resize(item):
+            started.append(item)
+            release.wait(1)
+            return item
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            prepared = prefetch(executor, resize, range(20), depth=6)
+            # the first item is handed out while the next ones are resized
+            item, future = next(prepared)
+            time.sleep(0.1)
+            self.assertEqual(len(started), 7)
+            release.set()
+            self.assertEqual((item, future.result()), (0, 0))
+            self.assertEqual([item for item, _ in prepared], list(range(1, 20)))
+
+    def test_batch_uploadsearch_overlaps_stages(self):
+        def slow_upload(method, path, body):
+            time.sleep(0.1)
+            return '{"status": "OK", "result": []}'
+
+        with LocalServer({'uploadsearch': (200, slow_upload)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                results = list(api.batch_uploadsearch([self.image_path] * 6, resize='STANDARD', workers=1,
+                                                      processes=2, ordered=True))
+
+        self.assertEqual([result.index for result in results], list(range(6)))
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertEqual(len(server.requests), 6)
+
+    def test_batch_uploadsearch_invalid_box(self):
+        api = client.ViSearchAPI('debug', 'debug')
+        self.assertRaises(ViSearchClientError, api.batch_uploadsearch, [self.image_path], box=(1, 2))
+
+
+class TestSearchObjects(unittest.TestCase):
+
+    def setUp(self):
+        self.image_path = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+        self.discover_response = json.dumps({'status': 'OK', 'method': 'discoversearch', 'objects': [
+            {'type': 'top', 'box': [10, 10, 300, 200], 'result': []},
+            {'type': 'bottom', 'box': [100, 150, 400, 420], 'result': []},
+            {'type': 'shoe', 'box': [300, 300, 640, 427], 'result': []},
+        ]})
+
+    def _uploadsearch(self, method, path, body):
+        time.sleep(0.2)
+        # the crop of the box, not the whole image
+        with open(self.image_path, 'rb') as f:
+            self.assertFalse(f.read() in body)
+        return json.dumps({'status': 'OK', 'method': 'uploadsearch', 'result': [{'im_name': str(len(body))}]})
+
+    def test_search_objects(self):
+        responses = {'discoversearch': (200, self.discover_response), 'uploadsearch': (200, self._uploadsearch)}
+        with LocalServer(responses) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                start = time.time()
+                results = api.search_objects(self.image_path, limit=5, fl=['price'])
+                elapsed = time.time() - start
+
+        self.assertEqual([result.type for result in results], ['top', 'bottom', 'shoe'])
+        self.assertEqual([result.box for result in results], [[10, 10, 300, 200], [100, 150, 400, 420],
+                                                             [300, 300, 640, 427]])
+        self.assertTrue(all(result.succeeded for result in results))
+        # the three searches ran at the same time
+        self.assertTrue(elapsed < 0.5)
+
+        discover, uploads = server.requests[0], server.requests[1:]
+        self.assertTrue('discoversearch' in discover[1])
+        self.assertTrue(b'name="result_limit"\r\n\r\n1\r\n' in discover[3])
+        self.assertEqual(len(uploads), 3)
+        self.assertTrue(all('limit=5' in request[1] and 'fl=price' in request[1] for request in uploads))
+        self.assertTrue(all('box=' not in request[1] for request in uploads))
+
+    def test_given_objects(self):
+        objects = json.loads(self.discover_response)
+
+        def failing(method, path, body):
+            if len(body) > 20000:
+                return 503, '{"status": "fail", "error": ["busy"]}'
+            return '{"status": "OK", "result": []}'
+
+        with LocalServer({'uploadsearch': (200, failing)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                results = api.search_objects(self.image_path, objects=objects['objects'][:2], resize='STANDARD')
+                self.assertRaises(ViSearchClientError, api.search_objects, self.image_path,
+                                  objects={'status': 'fail', 'error': ['bad image']})
+                self.assertEqual(api.search_objects(self.image_path, objects={'status': 'OK', 'objects': []}), [])
+
+        self.assertEqual(len(server.requests), 2)
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertEqual([result.detection['type'] for result in results], ['top', 'bottom'])
+
+
+class TestUploadsearchBoxes(unittest.TestCase):
+
+    def setUp(self):
+        self.image_path = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+
+    def test_uploadsearch_boxes(self):
+        def uploadsearch(method, path, body):
+            if b'name="image"' not in body:
+                return 400, '{"status": "fail", "error": ["no image"]}'
+            return json.dumps({'status': 'OK', 'result': [{'im_name': str(len(body))}]})
+
+        boxes = [[0, 0, 320, 213], (320, 213, 640, 427), (0, 0, 320, 213), (100.0, 100, 200, 300)]
+        with LocalServer({'uploadsearch': (200, uploadsearch)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                results = api.uploadsearch_boxes(self.image_path, boxes, limit=10, resize='STANDARD')
+
+        self.assertEqual(list(results), [(0, 0, 320, 213), (320, 213, 640, 427), (100, 100, 200, 300)])
+        self.assertTrue(all(result.succeeded for result in results.values()))
+        self.assertEqual([result.index for result in results.values()], [0, 1, 2])
+        # one upload per distinct box, each a crop smaller than the image
+        self.assertEqual(len(server.requests), 3)
+        size = os.path.getsize(self.image_path)
+        self.assertTrue(all(len(request[3]) < size for request in server.requests))
+        self.assertTrue(all('limit=10' in request[1] and 'box=' not in request[1] for request in server.requests))
+
+    def test_invalid_box(self):
+        with LocalServer({}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                self.assertRaises(ViSearchClientError, api.uploadsearch_boxes, self.image_path,
+                                  [(0, 0, 10, 10), (10, 10, 0, 0)])
+                self.assertRaises(ViSearchClientError, api.uploadsearch_boxes, self.image_path, [(700, 0, 800, 10)])
+                self.assertEqual(api.uploadsearch_boxes(self.image_path, []), {})
+        self.assertEqual(server.requests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
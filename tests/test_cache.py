@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import multiprocessing
+import os.path
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from visearch import client
+from visearch.bind import canonical_parameters
+from visearch.cache import DiskCache, ResultCache, UploadCache, upload_cache_key
+from tests.local_server import LocalServer
+
+
+SEARCH_RESPONSE = '{"status": "OK", "method": "search", "result": [{"im_name": "39882808162"}], "error": [], "total": 1, "page": 1}'
+FAIL_RESPONSE = '{"status": "fail", "method": "search", "result": [], "error": ["Image not found with ID."], "total": 0, "page": 1}'
+INSERT_RESPONSE = '{"status": "OK", "total": 1, "method": "insert", "trans_id": 352649805417295872}'
+UPLOADSEARCH_RESPONSE = '{"status": "OK", "method": "uploadsearch", "result": [{"im_name": "39882808162"}], "error": [], "total": 1, "page": 1}'
+
+
+def write_entries(directory, value):
+    cache = DiskCache(directory)
+    for _ in range(200):
+        cache.set('shared', {'expires_at': 2 ** 40, 'value': value * 5000})
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = ResultCache(maxsize=2)
+        cache.set(('search', 'a'), 1, 'search')
+        cache.set(('search', 'b'), 2, 'search')
+        self.assertEqual(cache.get(('search', 'a')), 1)
+        cache.set(('search', 'c'), 3, 'search')
+
+        self.assertEqual(cache.get(('search', 'b')), None)
+        self.assertEqual(cache.get(('search', 'a')), 1)
+        self.assertEqual(cache.stats, {'hits': 2, 'misses': 1, 'evictions': 1, 'size': 2})
+
+    def test_ttl_per_endpoint(self):
+        cache = ResultCache(ttl=60, ttls={'colorsearch': 0})
+        cache.set(('colorsearch', 'a'), 1, 'colorsearch')
+        cache.set(('search', 'a'), 2, 'search')
+
+        self.assertEqual(cache.get(('colorsearch', 'a')), None)
+        self.assertEqual(cache.get(('search', 'a')), 2)
+
+    def test_invalidate(self):
+        cache = ResultCache()
+        cache.set(('colorsearch', 'a'), 1, 'colorsearch')
+        cache.set(('search', 'a'), 2, 'search')
+
+        cache.invalidate('search')
+        self.assertEqual(len(cache), 1)
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+    def test_canonical_parameters(self):
+        self.assertEqual(canonical_parameters('im_name=a&fl=price&fl=brand&fq=brand:x&fq=price:0.0,20.0'),
+                         canonical_parameters('fq=price:0.0,20.0&fl=brand&im_name=a&fq=brand:x&fl=price'))
+
+
+class TestClientCache(unittest.TestCase):
+
+    def test_search_cached(self):
+        with LocalServer({'search': (200, SEARCH_RESPONSE), 'insert': (200, INSERT_RESPONSE)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, cache=True) as api:
+                first = api.search('test_im', fl=['price', 'brand'], fq={'brand': 'x'})
+                second = api.search('test_im', fl=['brand', 'price'], fq={'brand': 'x'})
+                self.assertEqual(first, second)
+                self.assertEqual(len(server.requests), 1)
+
+                api.search('test_im', page=2)
+                self.assertEqual(len(server.requests), 2)
+
+                # indexing changes results, the cache is dropped
+                api.insert({'im_name': 'a', 'im_url': 'http://a.jpg'})
+                api.search('test_im', fl=['price', 'brand'], fq={'brand': 'x'})
+                self.assertEqual(len(server.requests), 4)
+                self.assertEqual(api.cache.stats['hits'], 1)
+
+    def test_failed_response_not_cached(self):
+        with LocalServer({'search': (200, FAIL_RESPONSE)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, cache=ResultCache(maxsize=10)) as api:
+                api.search('test_im')
+                api.search('test_im')
+        self.assertEqual(len(server.requests), 2)
+
+
+
+class TestUploadCache(unittest.TestCase):
+
+    def setUp(self):
+        self.image_path = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_key(self):
+        key = upload_cache_key(self.image_path, 'STANDARD', 'box=0,0,10,10&limit=30')
+        self.assertEqual(key, upload_cache_key(self.image_path, 'STANDARD', 'box=0,0,10,10&limit=30'))
+        self.assertNotEqual(key, upload_cache_key(self.image_path, 'HIGH', 'box=0,0,10,10&limit=30'))
+        self.assertNotEqual(key, upload_cache_key(self.image_path, 'STANDARD', 'box=0,0,10,20&limit=30'))
+
+    def test_uploadsearch_cached(self):
+        upload_cache = UploadCache(directory=self.cache_dir)
+        with LocalServer({'uploadsearch': (200, UPLOADSEARCH_RESPONSE)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, upload_cache=upload_cache) as api:
+                first = api.uploadsearch(image_path=self.image_path, resize='STANDARD', fl=['price'])
+                second = api.uploadsearch(image_path=self.image_path, resize='STANDARD', fl=['price'])
+                api.uploadsearch(image_path=self.image_path, resize='STANDARD', box=(0, 0, 10, 10))
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(server.requests), 2)
+        stats = upload_cache.stats
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        self.assertTrue(stats['bytes_saved'] > 0)
+
+    def test_disk_level(self):
+        key = upload_cache_key(self.image_path, None, '')
+        UploadCache(directory=self.cache_dir).set(key, {'status': 'OK'}, 1000)
+
+        # a fresh process only has the files on disk
+        upload_cache = UploadCache(directory=self.cache_dir)
+        self.assertEqual(upload_cache.get(key), {'status': 'OK'})
+        self.assertEqual(upload_cache.stats['bytes_saved'], 1000)
+
+    def test_disk_bounded(self):
+        upload_cache = UploadCache(directory=self.cache_dir, max_disk_bytes=1000)
+        for i in range(20):
+            upload_cache.set('key%d' % i, {'status': 'OK', 'result': ['x' * 100]}, 1000)
+
+        total = sum(os.path.getsize(os.path.join(self.cache_dir, name)) for name in os.listdir(self.cache_dir))
+        self.assertTrue(0 < total <= 1000)
+
+    def test_disk_shared_between_processes(self):
+        processes = [multiprocessing.Process(target=write_entries, args=(self.cache_dir, value)) for value in 'ab']
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        entry = DiskCache(self.cache_dir).get('shared')
+        self.assertTrue(entry['value'] in ('a' * 5000, 'b' * 5000))
+        self.assertEqual([name for name in os.listdir(self.cache_dir) if name.endswith('.tmp')], [])
+
+    def test_disk_files_removed_by_another_cache(self):
+        first = DiskCache(self.cache_dir, max_bytes=1000)
+        second = DiskCache(self.cache_dir, max_bytes=1000)
+        for i in range(5):
+            first.set('key%d' % i, {'expires_at': 2 ** 40, 'result': ['x' * 100]})
+        listed = first._files()
+        second.clear()
+
+        # the files first listed are gone when it prunes and clears
+        first._files = lambda: listed
+        first.set('key5', {'expires_at': 2 ** 40, 'result': ['x' * 1000]})
+        first.clear()
+
+    def test_disk_shared_between_threads_of_two_caches(self):
+        caches = [DiskCache(self.cache_dir, max_bytes=2000) for _ in range(2)]
+        errors = []
+
+        def churn(cache, index):
+            try:
+                for i in range(100):
+                    cache.set('key%d' % (i % 10), {'expires_at': 2 ** 40, 'result': ['x' * 300]})
+                    if i % 25 == index:
+                        cache.clear()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=churn, args=(caches[i % 2], i)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_disk_write_failure(self):
+        upload_cache = UploadCache(directory=os.path.join(self.cache_dir, 'sub'))
+        shutil.rmtree(os.path.join(self.cache_dir, 'sub'))
+        upload_cache.set('key', {'status': 'OK'}, 1000)
+        # still cached in memory
+        self.assertEqual(upload_cache.get('key'), {'status': 'OK'})
+
+    def test_disk_hit_keeps_expiry(self):
+        key = upload_cache_key(self.image_path, None, '')
+        UploadCache(ttl=0.1, directory=self.cache_dir).set(key, {'status': 'OK'}, 1000)
+
+        upload_cache = UploadCache(ttl=300, directory=self.cache_dir)
+        self.assertEqual(upload_cache.get(key), {'status': 'OK'})
+        time.sleep(0.15)
+        # promoted to memory with the expiry it had on disk, not a fresh ttl
+        self.assertEqual(upload_cache.get(key), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+from requests.exceptions import ReadTimeout
+from visearch.bind import ViSearchAPIError, ViSearchClientError
+from visearch.breaker import CircuitOpenError
+from visearch.concurrency import AdaptiveConcurrency
+
+
+def overloaded():
+    raise ViSearchAPIError(503, 'Service Unavailable', 'overloaded')
+
+
+def bad_request():
+    raise ViSearchAPIError(400, 'Bad Request', 'missing im_url')
+
+
+def circuit_open():
+    raise CircuitOpenError('insert', 30)
+
+
+class TestAdaptiveConcurrency(unittest.TestCase):
+
+    def test_additive_increase(self):
+        concurrency = AdaptiveConcurrency(initial=2, max_limit=4)
+        for _ in range(2):
+            concurrency.call(lambda: None)
+        self.assertEqual(concurrency.limit, 3)
+        for _ in range(3):
+            concurrency.call(lambda: None)
+        self.assertEqual(concurrency.limit, 4)
+        for _ in range(10):
+            concurrency.call(lambda: None)
+        self.assertEqual(concurrency.limit, 4)
+        self.assertEqual(concurrency.stats['increases'], 2)
+
+    def test_multiplicative_decrease(self):
+        concurrency = AdaptiveConcurrency(initial=8, min_limit=3)
+        self.assertRaises(ViSearchAPIError, concurrency.call, overloaded)
+        self.assertEqual(concurrency.limit, 4)
+        self.assertRaises(ReadTimeout, concurrency.call, self._timeout)
+        self.assertEqual(concurrency.limit, 3)
+        # client side errors say nothing about the load of the service
+        self.assertRaises(ViSearchAPIError, concurrency.call, bad_request)
+        self.assertEqual(concurrency.limit, 3)
+        self.assertEqual(concurrency.stats['decreases'], 2)
+
+    def test_errors_are_not_healthy(self):
+        concurrency = AdaptiveConcurrency(initial=4)
+        concurrency.call(time.sleep, 0.01)
+        latency = concurrency.stats['latency']
+        for _ in range(50):
+            self.assertRaises(ViSearchAPIError, concurrency.call, bad_request)
+        # fast errors neither grow the limit nor lower the latency baseline
+        self.assertEqual(concurrency.limit, 4)
+        self.assertEqual(concurrency.stats['latency'], latency)
+        self.assertEqual(concurrency.stats['in_flight'], 0)
+
+    def test_circuit_open_is_overload(self):
+        concurrency = AdaptiveConcurrency(initial=4)
+        for _ in range(200):
+            self.assertRaises(CircuitOpenError, concurrency.call, circuit_open)
+        self.assertEqual(concurrency.limit, 1)
+        self.assertEqual(concurrency.stats['increases'], 0)
+
+    def _timeout(self):
+        raise ReadTimeout()
+
+    def test_one_cut_per_window(self):
+        concurrency = AdaptiveConcurrency(initial=8)
+        tokens = [concurrency.acquire() for _ in range(4)]
+        for token in tokens:
+            concurrency.release(token, overloaded=True)
+        self.assertEqual(concurrency.limit, 4)
+        concurrency.release(concurrency.acquire(), overloaded=True)
+        self.assertEqual(concurrency.limit, 2)
+
+    def test_slow_requests_hold(self):
+        concurrency = AdaptiveConcurrency(initial=1, latency_tolerance=2)
+        concurrency.release(concurrency.acquire())
+        self.assertEqual(concurrency.limit, 2)
+        concurrency._latency = 0.001
+        concurrency.call(time.sleep, 0.05)
+        concurrency.call(time.sleep, 0.05)
+        self.assertEqual(concurrency.limit, 2)
+
+    def test_blocks_at_limit(self):
+        concurrency = AdaptiveConcurrency(initial=1)
+        token = concurrency.acquire()
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(concurrency.acquire()))
+        thread.start()
+        time.sleep(0.05)
+        self.assertEqual(acquired, [])
+        concurrency.release(token)
+        thread.join(1)
+        self.assertEqual(len(acquired), 1)
+        self.assertEqual(concurrency.stats['in_flight'], 1)
+
+    def test_invalid(self):
+        self.assertRaises(ViSearchClientError, AdaptiveConcurrency, initial=0)
+        self.assertRaises(ViSearchClientError, AdaptiveConcurrency, initial=8, max_limit=4)
+        self.assertRaises(ViSearchClientError, AdaptiveConcurrency, backoff=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import os.path
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+from visearch import client
+from visearch.bind import ViSearchClientError
+from visearch.image import crop_regions, read_image
+from tests.local_server import LocalServer
+
+
+class TestReadImage(unittest.TestCase):
+
+    def setUp(self):
+        self.image_path = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _make_image(self, name, size, mode='RGB', fmt='JPEG'):
+        path = os.path.join(self.tmp_dir, name)
+        Image.new(mode, size, color=(200, 10, 10, 255)[:len(mode)]).save(path, fmt)
+        return path
+
+    def _decode(self, files):
+        return Image.open(io.BytesIO(bytes(files['image'][1])))
+
+    def test_standard_resize_stretches(self):
+        image = self._decode(read_image(self.image_path, 'STANDARD'))
+        self.assertEqual(image.size, (512, 512))
+
+    def test_fast_resize_keeps_aspect_ratio(self):
+        path = self._make_image('large.jpg', (4000, 3000))
+        sizes = []
+        files = read_image(path, 'STANDARD', validation_func=lambda w, h, size: sizes.append((w, h, size)), fast=True)
+
+        image = self._decode(files)
+        self.assertEqual(image.size, (512, 384))
+        self.assertEqual(image.format, 'JPEG')
+        # validated from the header of the file, before it is decoded
+        self.assertEqual(sizes, [(4000, 3000, os.path.getsize(path))])
+
+    def test_fast_resize_small_jpeg_sent_as_is(self):
+        files = read_image(self.image_path, 'HIGH', fast=True)
+
+        with open(self.image_path, 'rb') as f:
+            self.assertEqual(bytes(files['image'][1]), f.read())
+
+    def test_fast_resize_png_with_alpha(self):
+        path = self._make_image('large.png', (2000, 1000), mode='RGBA', fmt='PNG')
+        image = self._decode(read_image(path, (300, 300, 80), fast=True))
+
+        self.assertEqual(image.size, (300, 150))
+        self.assertEqual(image.mode, 'RGB')
+
+    def test_uploadsearch_fast_resize(self):
+        path = self._make_image('large.jpg', (3000, 2000))
+        with LocalServer({'uploadsearch': (200, '{"status": "OK", "result": []}')}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, fast_resize=True) as api:
+                resp = api.uploadsearch(image_path=path, resize='STANDARD')
+
+        self.assertEqual(resp['status'], 'OK')
+        body = server.requests[0][3]
+        start = body.index(b'\xff\xd8')
+        self.assertEqual(Image.open(io.BytesIO(body[start:])).size, (512, 341))
+
+
+class TestCropRegions(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.tmp_dir, 'look.jpg')
+        image = Image.new('RGB', (4000, 3000), (255, 255, 255))
+        # a red top left quarter, a blue bottom right one
+        image.paste((255, 0, 0), (0, 0, 2000, 1500))
+        image.paste((0, 0, 255), (2000, 1500, 4000, 3000))
+        image.save(self.image_path, 'JPEG', quality=95)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _decode(self, files):
+        return Image.open(io.BytesIO(bytes(files['image'][1])))
+
+    def test_crops(self):
+        regions = crop_regions(self.image_path, [(100, 100, 1100, 600), [2500, 2000, 3000, 3500]])
+        top, bottom = [self._decode(files) for files in regions]
+        self.assertEqual(regions[0]['image'][0], 'look.jpg')
+        self.assertEqual(top.size, (1000, 500))
+        # clipped to the image
+        self.assertEqual(bottom.size, (500, 1000))
+        self.assertEqual(top.getpixel((500, 250))[0] > 200, True)
+        self.assertEqual(bottom.getpixel((250, 500))[2] > 200, True)
+
+    def test_resize_keeps_aspect_ratio(self):
+        for fast in (False, True):
+            regions = crop_regions(self.image_path, [(0, 0, 2000, 1000), (2000, 1500, 2600, 2100)], 'STANDARD',
+                                   fast=fast)
+            sizes = [self._decode(files).size for files in regions]
+            self.assertEqual(sizes, [(512, 256), (512, 512)])
+
+    def test_invalid_boxes(self):
+        self.assertRaises(ViSearchClientError, crop_regions, self.image_path, [(10, 10, 5, 20)])
+        self.assertRaises(ViSearchClientError, crop_regions, self.image_path, [(1, 2, 3)])
+        self.assertRaises(ViSearchClientError, crop_regions, self.image_path, [(5000, 10, 6000, 20)])
+
+
+if __name__ == '__main__':
+    unittest.main()
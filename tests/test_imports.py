@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os.path
+import subprocess
+import sys
+import unittest
+
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+
+
+def loaded_after(code):
+    script = code + '\nimport sys\nprint(" ".join(sorted(sys.modules)))'
+    output = subprocess.check_output([sys.executable, '-c', script], cwd=ROOT_DIR)
+    return set(output.decode('utf-8').split())
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_import_client(self):
+        modules = loaded_after('from visearch import client\napi = client.ViSearchAPI("key", "secret")')
+        for heavy in ('PIL', 'requests', 'urllib3', 'multiprocessing', 'orjson', 'ujson', 'simplejson'):
+            self.assertFalse(heavy in modules, heavy)
+
+    def test_first_request(self):
+        modules = loaded_after(
+            'from visearch import client\n'
+            'api = client.ViSearchAPI("key", "secret")\n'
+            'api.transport')
+        self.assertTrue('requests' in modules)
+        self.assertFalse('PIL' in modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os.path
+import unittest
+from visearch import client
+from visearch.bind import ViSearchAPIError
+from visearch.metrics import Histogram, MetricsCollector, RequestHook
+from tests.local_server import LocalServer
+
+
+SEARCH_RESPONSE = '{"status": "OK", "method": "search", "result": [{"im_name": "a"}], "error": [], "total": 1, "page": 1}'
+
+
+class Recorder(RequestHook):
+
+    def __init__(self):
+        self.events = []
+
+    def before_request(self, metrics):
+        self.events.append(('before', metrics.endpoint, metrics.status_code))
+
+    def after_request(self, metrics):
+        self.events.append(('after', metrics.endpoint, metrics.status_code))
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        for ms in range(1, 1001):
+            histogram.record(ms / 1000.0)
+
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 1000)
+        self.assertAlmostEqual(summary['mean'], 0.5005)
+        self.assertAlmostEqual(summary['p50'], 0.5, delta=0.5 * 0.05)
+        self.assertAlmostEqual(summary['p95'], 0.95, delta=0.95 * 0.05)
+        self.assertAlmostEqual(summary['p99'], 0.99, delta=0.99 * 0.05)
+        self.assertEqual(summary['max'], 1.0)
+
+    def test_small_values(self):
+        histogram = Histogram()
+        histogram.record(0)
+        self.assertEqual(histogram.percentile(50), 0)
+        self.assertEqual(Histogram().percentile(50), None)
+
+
+class TestClientMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.image_path = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+
+    def test_search(self):
+        collector = MetricsCollector()
+        recorder = Recorder()
+        with LocalServer({'search': (200, SEARCH_RESPONSE), 'colorsearch': (500, '{}')}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, hooks=[collector, recorder]) as api:
+                api.search('a')
+                api.search('b')
+                self.assertRaises(ViSearchAPIError, api.colorsearch, 'fff')
+
+        self.assertEqual(recorder.events[:2], [('before', 'search', None), ('after', 'search', 200)])
+        stats = collector.stats
+        search = stats['search']
+        self.assertEqual(search['requests'], 2)
+        self.assertEqual(search['errors'], 0)
+        self.assertEqual(search['status_codes'], {200: 2})
+        self.assertEqual(search['response_bytes'], 2 * len(SEARCH_RESPONSE))
+        self.assertEqual(set(search['timings']), {'encode', 'connect', 'ttfb', 'download', 'decode', 'total'})
+        self.assertEqual(search['timings']['total']['count'], 2)
+        self.assertEqual(stats['colorsearch']['errors'], 1)
+        self.assertEqual(stats['colorsearch']['status_codes'], {500: 1})
+
+    def test_connect_time(self):
+        timings = []
+
+        class Timings(RequestHook):
+            def after_request(self, metrics):
+                timings.append(metrics.timings)
+
+        with LocalServer({'search': (200, SEARCH_RESPONSE)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, hooks=[Timings()]) as api:
+                api.search('a')
+                api.search('a')
+
+        self.assertTrue(timings[0]['connect'] > 0)
+        # the second request reuses the keep-alive connection
+        self.assertEqual(timings[1]['connect'], 0)
+
+    def test_uploadsearch(self):
+        collector = MetricsCollector()
+        with LocalServer({'uploadsearch': (200, SEARCH_RESPONSE)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, hooks=[collector]) as api:
+                api.uploadsearch(image_path=self.image_path, resize='STANDARD')
+
+        stats = collector.stats['uploadsearch']
+        self.assertEqual(stats['timings']['preprocess']['count'], 1)
+        self.assertEqual(stats['request_bytes'], len(server.requests[0][3]))
+
+
+if __name__ == '__main__':
+    unittest.main()
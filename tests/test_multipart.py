@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import email
+import os.path
+import pickle
+import unittest
+import six
+from requests.models import RequestEncodingMixin
+from six.moves.urllib.parse import parse_qs
+from visearch import client
+from visearch.bind import bind_method
+from visearch.bind import ViSearchClientError
+from visearch.image import read_image
+from visearch.multipart import FilePart, FormBody, MappedFilePart, MultipartBody, _join
+from tests.local_server import LocalServer
+
+
+OK_RESPONSE = '{"status": "OK", "method": "insert", "trans_id": 1, "result": []}'
+
+
+def parse_multipart(content_type, body):
+    # message_from_string parses bytes on python 2
+    parse = getattr(email, 'message_from_bytes', email.message_from_string)
+    message = parse(b'Content-Type: ' + content_type.encode('ascii') + b'\r\n\r\n' + body)
+    return dict((part.get_param('name', header='content-disposition'),
+                 (part.get_filename(), part.get_payload(decode=True))) for part in message.get_payload())
+
+
+class TestFormBody(unittest.TestCase):
+
+    def test_encoding(self):
+        fields = [('im_name[0]', u'caf\xe9 & co'), ('price[0]', 10.5), ('tags', ['a', 'b=c']), ('flag', True)]
+        body = FormBody(fields, chunk_size=8)
+
+        encoded = b''.join(body)
+        self.assertEqual(encoded, RequestEncodingMixin._encode_params(fields).encode('ascii'))
+        self.assertEqual(body.len, len(encoded))
+        self.assertTrue(len(list(body)) > 1)
+        # sent again on a retry
+        self.assertEqual(b''.join(body), encoded)
+
+    def test_generated_fields(self):
+        body = FormBody(lambda: (('im_name[%d]' % i, i) for i in range(3)))
+        self.assertEqual(b''.join(body), b'im_name%5B0%5D=0&im_name%5B1%5D=1&im_name%5B2%5D=2')
+        self.assertEqual(body.len, len(b''.join(body)))
+
+    def test_one_shot_iterator(self):
+        body = FormBody(('im_name[%d]' % i, i) for i in range(3))
+        self.assertEqual(body.len, None)
+        with LocalServer({'insert': (200, OK_RESPONSE)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                bind_method(api, 'insert', 'POST', data=body)
+
+        _, _, headers, request_body = server.requests[0]
+        self.assertEqual(headers['Transfer-Encoding'], 'chunked')
+        self.assertEqual(parse_qs(request_body.decode('ascii'))['im_name[2]'], ['2'])
+
+
+class TestMultipartBody(unittest.TestCase):
+
+    def setUp(self):
+        self.image_path = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+        with open(self.image_path, 'rb') as f:
+            self.image = f.read()
+
+    def test_encoding(self):
+        body = MultipartBody({'detection': 'all', 'result_limit': 10},
+                             {'image': ('a "b".jpg', FilePart(self.image_path, chunk_size=1024), 'image/jpeg'),
+                              'other': ('c.jpg', memoryview(b'abc'))})
+
+        encoded = _join(body)
+        self.assertEqual(body.len, len(encoded))
+        parts = parse_multipart(body.content_type, encoded)
+        self.assertEqual(parts['detection'], (None, b'all'))
+        self.assertEqual(parts['result_limit'], (None, b'10'))
+        self.assertEqual(parts['image'], ('a %22b%22.jpg', self.image))
+        self.assertEqual(parts['other'], ('c.jpg', b'abc'))
+        self.assertEqual(_join(body), encoded)
+
+    def test_list_fields(self):
+        body = MultipartBody([('fl', ['price', 'brand']), ('fq', ('a:b', )), ('page', None)], boundary='xyz')
+        encoded = b''.join(body)
+        self.assertEqual(body.len, len(encoded))
+        # one part per item, as requests sends them
+        self.assertEqual(encoded, b'--xyz\r\nContent-Disposition: form-data; name="fl"\r\n\r\nprice\r\n'
+                                  b'--xyz\r\nContent-Disposition: form-data; name="fl"\r\n\r\nbrand\r\n'
+                                  b'--xyz\r\nContent-Disposition: form-data; name="fq"\r\n\r\na:b\r\n'
+                                  b'--xyz--\r\n')
+
+    def test_file_part(self):
+        part = FilePart(self.image_path, chunk_size=1000)
+        chunks = list(part)
+        self.assertEqual(len(part), len(self.image))
+        self.assertEqual(len(chunks[0]), 1000)
+        self.assertEqual(b''.join(chunks), self.image)
+        self.assertEqual(part.read(), self.image)
+
+
+    def test_mapped_file_part(self):
+        part = MappedFilePart(self.image_path, chunk_size=1000)
+        chunks = list(part)
+        if six.PY3:
+            self.assertTrue(all(isinstance(chunk, memoryview) for chunk in chunks))
+        self.assertEqual(b''.join(chunks), self.image)
+        self.assertEqual(part._map, None)
+        del chunks
+        # mapped again for a retry
+        self.assertEqual(b''.join(bytes(chunk) for chunk in part), self.image)
+
+        part.open()
+        self.assertEqual(pickle.loads(pickle.dumps(part))._map, None)
+        part.close()
+
+    def test_mapped_file_part_python2(self):
+        part = MappedFilePart(self.image_path, chunk_size=1000)
+        py2, six.PY2 = six.PY2, True
+        try:
+            # the slices python 2 sends instead of memoryviews
+            chunks = list(part)
+        finally:
+            six.PY2 = py2
+        self.assertTrue(all(isinstance(chunk, bytes) and len(chunk) <= 1000 for chunk in chunks))
+        self.assertEqual(b''.join(chunks), self.image)
+        self.assertEqual(part._map, None)
+
+    def test_read_image_mmap(self):
+        files = read_image(self.image_path, None, mmap_file=True)
+        part = files['image'][1]
+        self.assertTrue(isinstance(part, MappedFilePart))
+        # the header was parsed from the map that is sent
+        self.assertTrue(part._map is not None)
+        self.assertEqual(b''.join(bytes(chunk) for chunk in part), self.image)
+
+        def validation(width, height, size):
+            self.assertEqual((width, height, size), (640, 427, len(self.image)))
+            raise ViSearchClientError('too small')
+
+        self.assertRaises(ViSearchClientError, read_image, self.image_path, None, validation, mmap_file=True)
+
+
+class TestClientBodies(unittest.TestCase):
+
+    def test_discoversearch_list_parameter(self):
+        image_path = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+        with LocalServer({'discoversearch': (200, '{"status": "OK", "objects": []}')}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                api.discoversearch(image=image_path, fl=['price', 'brand'])
+
+        body = server.requests[0][3]
+        self.assertTrue(b'name="fl"\r\n\r\nprice\r\n' in body)
+        self.assertTrue(b'name="fl"\r\n\r\nbrand\r\n' in body)
+        self.assertFalse(b"['price'" in body)
+
+    def test_insert(self):
+        images = [{'im_name': 'a', 'im_url': 'http://a.jpg'}, {'im_name': u'\xe9', 'im_url': 'http://b.jpg', 'price': 1}]
+        with LocalServer({'insert': (200, OK_RESPONSE)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                api.insert(images, custom='x')
+
+        _, _, headers, body = server.requests[0]
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        self.assertEqual(headers['Content-Type'], 'application/x-www-form-urlencoded')
+        # python 2 leaves the values utf-8 encoded
+        name = u'\xe9' if six.PY3 else u'\xe9'.encode('utf-8')
+        self.assertEqual(parse_qs(str(body.decode('ascii'))), {
+            'im_name[0]': ['a'], 'im_url[0]': ['http://a.jpg'], 'im_name[1]': [name],
+            'im_url[1]': ['http://b.jpg'], 'price[1]': ['1'], 'custom': ['x']})
+
+    def test_uploadsearch_streams_file(self):
+        image_path = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+        with LocalServer({'uploadsearch': (200, OK_RESPONSE)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                api.uploadsearch(image_path=image_path)
+
+        _, _, headers, body = server.requests[0]
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        with open(image_path, 'rb') as f:
+            self.assertEqual(parse_multipart(headers['Content-Type'], body)['image'], ('upload.jpg', f.read()))
+
+    def test_mmap_uploads(self):
+        image_path = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+        with open(image_path, 'rb') as f:
+            image = f.read()
+        with LocalServer({'uploadsearch': (200, OK_RESPONSE), 'discoversearch': (200, OK_RESPONSE)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, mmap_uploads=True) as api:
+                api.uploadsearch(image_path=image_path)
+                api.discoversearch(image=image_path)
+
+        for _, _, headers, body in server.requests:
+            self.assertEqual(parse_multipart(headers['Content-Type'], body)['image'], ('upload.jpg', image))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import threading
+import unittest
+from six.moves.urllib.parse import urlparse, parse_qs
+from visearch import client
+from visearch.bind import ViSearchClientError
+from visearch.pagination import ResultIterator
+from tests.local_server import LocalServer
+
+
+def paged_search(total):
+    def callback(method, path, body):
+        query = parse_qs(urlparse(path).query)
+        page, limit = int(query['page'][0]), int(query['limit'][0])
+        indexes = range((page - 1) * limit, min(page * limit, total))
+        result = [{'im_name': 'im_%d' % i, 'score': 1 - i / 100.0} for i in indexes]
+        return json.dumps({'status': 'OK', 'method': 'search', 'result': result, 'total': total, 'page': page, 'limit': limit})
+    return callback
+
+
+class TestResultIterator(unittest.TestCase):
+
+    def _pages(self, server):
+        return [int(parse_qs(urlparse(path).query)['page'][0]) for _, path, _, _ in server.requests]
+
+    def test_iter_search_all_pages(self):
+        with LocalServer({'search': (200, paged_search(25))}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                names = [result['im_name'] for result in api.iter_search('test_im', limit=10, fl=['price'])]
+
+        self.assertEqual(names, ['im_%d' % i for i in range(25)])
+        self.assertEqual(sorted(self._pages(server)), [1, 2, 3])
+
+    def test_iter_search_stop_conditions(self):
+        with LocalServer({'search': (200, paged_search(100)), 'colorsearch': (200, paged_search(100))}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                results = list(api.iter_search('test_im', limit=10, max_results=15))
+                self.assertEqual(len(results), 15)
+
+                results = list(api.iter_search('test_im', limit=10, score_min=0.885))
+                self.assertEqual(results[-1]['im_name'], 'im_11')
+
+                results = list(api.iter_colorsearch('#fa4d4d', limit=10, stop_when=lambda r: r['im_name'] == 'im_3'))
+                self.assertEqual(len(results), 3)
+
+        # 2 pages each, max_results and score_min are known to be reached without a third page
+        self.assertEqual(len([path for _, path, _, _ in server.requests if path.startswith('/search')]), 4)
+
+    def test_prefetch_next_page(self):
+        fetched = []
+        second_page_requested = threading.Event()
+
+        def fetch(page):
+            fetched.append(page)
+            if page == 2:
+                second_page_requested.set()
+            return {'status': 'OK', 'result': [{'im_name': '%d_%d' % (page, i)} for i in range(2)], 'total': 6}
+
+        iterator = iter(ResultIterator(fetch, limit=2))
+        next(iterator)
+        # page 2 is requested while the caller still works on page 1
+        self.assertTrue(second_page_requested.wait(5))
+        self.assertEqual(len(list(iterator)), 5)
+        self.assertEqual(fetched, [1, 2, 3])
+
+    def test_failed_page(self):
+        iterator = ResultIterator(lambda page: {'status': 'fail', 'error': ['Image not found with ID.']})
+        self.assertRaises(ViSearchClientError, list, iterator)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import os.path
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+from visearch import client
+from visearch.bind import ViSearchClientError
+from visearch.image import read_image
+from visearch.probe import probe_file, probe_image
+from tests.local_server import LocalServer
+
+
+class TestProbeImage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _save(self, name, size=(321, 123), mode='RGB', **kwargs):
+        path = os.path.join(self.tmp_dir, name)
+        Image.new(mode, size, color=(10, 200, 10, 128)[:len(mode)]).save(path, **kwargs)
+        return path
+
+    def assertProbed(self, path, image_format, size=(321, 123)):
+        info = probe_image(path)
+        self.assertEqual((info.format, info.width, info.height, info.size),
+                         (image_format, size[0], size[1], os.path.getsize(path)))
+
+    def test_jpeg(self):
+        self.assertProbed(self._save('plain.jpg', format='JPEG'), 'JPEG')
+        self.assertProbed(self._save('progressive.jpg', format='JPEG', progressive=True), 'JPEG')
+        # the frame header comes after a large exif segment
+        exif = Image.Exif()
+        exif[0x010e] = 'x' * 60000
+        self.assertProbed(self._save('exif.jpg', format='JPEG', exif=exif.tobytes()), 'JPEG')
+        fixture = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+        self.assertProbed(fixture, 'JPEG', (640, 427))
+
+    def test_png(self):
+        self.assertProbed(self._save('image.png', mode='RGBA', format='PNG'), 'PNG')
+
+    def test_webp(self):
+        self.assertProbed(self._save('lossy.webp', format='WEBP'), 'WEBP')
+        self.assertProbed(self._save('lossless.webp', format='WEBP', lossless=True), 'WEBP')
+        self.assertProbed(self._save('alpha.webp', (5000, 3), mode='RGBA', format='WEBP'), 'WEBP', (5000, 3))
+
+    def test_other_formats(self):
+        self.assertEqual(probe_image(self._save('image.gif', format='GIF')), None)
+        self.assertEqual(probe_file(io.BytesIO(b'not an image' * 10), 120), None)
+
+        with open(self._save('cut.jpg', format='JPEG'), 'rb') as f:
+            head = f.read(40)
+        self.assertEqual(probe_file(io.BytesIO(head), 40), None)
+
+
+class TestValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        # a valid png header followed by 11MB that are not image data
+        self.large_path = os.path.join(self.tmp_dir, 'large.png')
+        header = io.BytesIO()
+        Image.new('RGB', (2000, 1000)).save(header, 'PNG')
+        with open(self.large_path, 'wb') as f:
+            f.write(header.getvalue()[:33])
+            f.write(b'\0' * (11 * 2 ** 20))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_validated_before_decode(self):
+        sizes = []
+
+        def validation(width, height, size):
+            sizes.append((width, height, size))
+            raise ViSearchClientError('rejected')
+
+        # the image data is broken, decoding it would fail with another error
+        for resize in (None, 'STANDARD'):
+            self.assertRaises(ViSearchClientError, read_image, self.large_path, resize, validation)
+        self.assertEqual(sizes, [(2000, 1000, os.path.getsize(self.large_path))] * 2)
+
+    def test_gif_validated_from_pillow_header(self):
+        path = os.path.join(self.tmp_dir, 'image.gif')
+        Image.new('L', (30, 20)).save(path, 'GIF')
+        sizes = []
+        read_image(path, None, lambda width, height, size: sizes.append((width, height, size)), mmap_file=True)
+        self.assertEqual(sizes, [(30, 20, os.path.getsize(path))])
+
+    def test_discoversearch_rejects_large_file(self):
+        with LocalServer({}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                self.assertRaises(ViSearchClientError, api.discoversearch, image=self.large_path)
+        self.assertEqual(server.requests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
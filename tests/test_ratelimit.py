@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+from visearch import client
+from visearch.ratelimit import RateLimiter, RateLimitExceeded, TokenBucket
+from tests.local_server import LocalServer
+
+
+SEARCH_RESPONSE = '{"status": "OK", "method": "search", "result": [], "error": [], "total": 0, "page": 1}'
+INSERT_RESPONSE = '{"status": "OK", "method": "insert", "trans_id": 1, "total": 1}'
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        clock = Clock()
+        bucket = TokenBucket(10, burst=2, clock=clock)
+        self.assertEqual(bucket.reserve(), (0, True))
+        self.assertEqual(bucket.reserve(), (0, True))
+        wait, reserved = bucket.reserve()
+        self.assertAlmostEqual(wait, 0.1)
+        # the next caller queues behind the previous reservation
+        wait, reserved = bucket.reserve()
+        self.assertAlmostEqual(wait, 0.2)
+
+        clock.now += 1
+        # refilled up to the burst only
+        self.assertEqual(bucket.reserve(), (0, True))
+        self.assertEqual(bucket.reserve(), (0, True))
+        self.assertTrue(bucket.reserve()[0] > 0)
+
+    def test_no_second_over_rate(self):
+        clock = Clock()
+        bucket = TokenBucket(8, clock=clock)
+        sent = []
+        for i in range(40):
+            # callers arriving in bursts
+            if i % 10 == 0:
+                clock.now += 0.7
+            wait, _ = bucket.reserve()
+            sent.append(clock.now + wait)
+
+        for start in sent:
+            self.assertTrue(len([at for at in sent if start <= at < start + 1]) <= 8)
+        self.assertEqual(sent[:3], [100.7, 100.825, 100.95])
+
+    def test_max_wait(self):
+        clock = Clock()
+        bucket = TokenBucket(4, burst=1, clock=clock)
+        bucket.reserve()
+        wait, reserved = bucket.reserve(max_wait=0)
+        self.assertFalse(reserved)
+        self.assertAlmostEqual(wait, 0.25)
+        # nothing was taken by the refused call
+        clock.now += 0.25
+        self.assertEqual(bucket.reserve(max_wait=0), (0, True))
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_buckets(self):
+        limiter = RateLimiter(search_qps=10, write_qps=1, burst=1, max_wait=0, clock=Clock())
+        self.assertEqual(limiter.bucket_name('uploadsearch'), 'search')
+        self.assertEqual(limiter.bucket_name('remove'), 'write')
+        self.assertEqual(limiter.bucket_name('insert/status/1'), None)
+
+        limiter.acquire('search')
+        self.assertRaises(RateLimitExceeded, limiter.acquire, 'colorsearch')
+        # writes have their own bucket, insert status is not limited
+        limiter.acquire('insert')
+        self.assertRaises(RateLimitExceeded, limiter.acquire, 'remove')
+        for _ in range(5):
+            self.assertEqual(limiter.acquire('insert/status/1'), 0)
+
+        self.assertEqual(limiter.stats['search'], {'requests': 1, 'waited': 0, 'rejected': 1})
+        self.assertEqual(limiter.stats['write'], {'requests': 1, 'waited': 0, 'rejected': 1})
+
+    def test_for_account(self):
+        limiter = RateLimiter.for_account('test-for-account', search_qps=5)
+        self.assertIs(RateLimiter.for_account('test-for-account'), limiter)
+        self.assertIsNot(RateLimiter.for_account('test-for-account-2'), limiter)
+
+    def test_threads(self):
+        limiter = RateLimiter(search_qps=50, burst=1)
+        start = time.time()
+        threads = [threading.Thread(target=limiter.wait, args=('search',)) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(time.time() - start >= 0.17)
+        self.assertEqual(limiter.stats['search']['requests'], 10)
+
+
+class TestClientRateLimit(unittest.TestCase):
+
+    def test_shared_between_clients(self):
+        limiter = RateLimiter(search_qps=50, write_qps=50, burst=1)
+        with LocalServer({'search': (200, SEARCH_RESPONSE), 'insert': (200, INSERT_RESPONSE)}) as server:
+            first = client.ViSearchAPI('debug', 'debug', host=server.host, rate_limiter=limiter)
+            second = client.ViSearchAPI('debug', 'debug', host=server.host, rate_limiter=limiter)
+            start = time.time()
+            for i in range(5):
+                (first if i % 2 else second).search('a')
+            self.assertTrue(time.time() - start >= 0.07)
+            first.insert([{'im_name': 'a', 'im_url': 'http://example.com/a.jpg'}])
+            first.close()
+            second.close()
+        self.assertEqual(limiter.stats['search']['requests'], 5)
+        self.assertEqual(limiter.stats['write']['requests'], 1)
+
+    def test_fail_fast(self):
+        limiter = RateLimiter(search_qps=1, burst=1, max_wait=0)
+        with LocalServer({'search': (200, SEARCH_RESPONSE)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, rate_limiter=limiter) as api:
+                api.search('a')
+                with self.assertRaises(RateLimitExceeded) as cm:
+                    api.search('b')
+            self.assertEqual(len(server.requests), 1)
+        self.assertEqual(cm.exception.endpoint, 'search')
+        self.assertTrue(cm.exception.retry_in > 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import unittest
+from visearch import client
+from visearch.cache import ResultCache
+from visearch.response import SearchResponse, SearchResult, json_loads, json_backend
+from tests.local_server import LocalServer
+
+
+SEARCH_RESPONSE = {
+    "status": "OK", "method": "search", "error": [], "page": 1, "limit": 2, "total": 3,
+    "result": [
+        {"im_name": "a", "score": 0.9, "value_map": {"price": "10.5", "brand": "x"}},
+        {"im_name": "b", "score": 0.8},
+    ],
+}
+
+
+class TestSearchResponse(unittest.TestCase):
+
+    def test_backend(self):
+        self.assertIn(json_backend(), ('orjson', 'ujson', 'simplejson', 'json'))
+        self.assertEqual(json_loads(json.dumps(SEARCH_RESPONSE).encode('utf-8')), SEARCH_RESPONSE)
+
+    def test_response(self):
+        resp = SearchResponse(json.loads(json.dumps(SEARCH_RESPONSE)))
+        self.assertEqual(resp.status, 'OK')
+        self.assertEqual(resp.total, 3)
+        self.assertEqual(resp['page'], 1)
+        self.assertEqual(resp.get('method'), 'search')
+        self.assertTrue('error' in resp)
+        self.assertRaises(KeyError, lambda: resp['objects'])
+
+        first, second = resp.result
+        self.assertTrue(isinstance(first, SearchResult))
+        self.assertTrue(resp['result'] is resp.result)
+        self.assertEqual((first.im_name, first.score), ('a', 0.9))
+        self.assertEqual(first.value_map['price'], '10.5')
+        self.assertEqual(first['value_map']['brand'], 'x')
+        self.assertEqual(second.value_map, {})
+        self.assertEqual(second.get('value_map', 'none'), 'none')
+        self.assertEqual(resp.to_dict()['result'][1], {"im_name": "b", "score": 0.8})
+        self.assertRaises(AttributeError, setattr, first, 'other', 1)
+
+
+class TestResultObjects(unittest.TestCase):
+
+    def test_search(self):
+        body = json.dumps(SEARCH_RESPONSE)
+        with LocalServer({'search': (200, body), 'uploadsearch': (200, body)}) as server:
+            cache = ResultCache()
+            with client.ViSearchAPI('debug', 'debug', host=server.host, cache=cache, result_objects=True) as api:
+                resp = api.search('a', get_all_fl=True)
+                cached = api.search('a', get_all_fl=True)
+                by_url = api.uploadsearch(image_url='http://a.jpg')
+
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                plain = api.search('a')
+
+        self.assertTrue(isinstance(resp, SearchResponse))
+        self.assertEqual(resp.result[0].value_map['price'], '10.5')
+        # the cache keeps the decoded dicts
+        self.assertTrue(isinstance(cached, SearchResponse))
+        self.assertEqual(list(cache._data.values())[0][1], SEARCH_RESPONSE)
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(by_url.result[1].im_name, 'b')
+        self.assertEqual(plain, SEARCH_RESPONSE)
+
+    def test_iter_search(self):
+        pages = {
+            '1': dict(SEARCH_RESPONSE, page=1),
+            '2': dict(SEARCH_RESPONSE, page=2, result=[{"im_name": "c", "score": 0.1}]),
+        }
+
+        def respond(method, path, body):
+            page = path.split('page=')[1].split('&')[0]
+            return json.dumps(pages[page])
+
+        with LocalServer({'search': (200, respond)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, result_objects=True) as api:
+                names = [result.im_name for result in api.iter_search('a', limit=2)]
+
+        self.assertEqual(names, ['a', 'b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
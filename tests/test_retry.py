@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os.path
+import unittest
+from visearch import client
+from visearch.bind import ViSearchAPIError, api_error
+from visearch.retry import RetryPolicy, RetryBudget, parse_retry_after
+from tests.local_server import LocalServer
+
+
+SEARCH_RESPONSE = '{"status": "OK", "method": "search", "result": [], "error": [], "total": 0, "page": 1}'
+INSERT_RESPONSE = '{"status": "OK", "total": 1, "method": "insert", "trans_id": 352649805417295872}'
+
+
+def failing(times, status, body, headers=None):
+    """
+        answer `status` to the first `times` calls, then `body` with 200
+    """
+    calls = []
+
+    def callback(method, path, request_body):
+        calls.append(path)
+        if len(calls) <= times:
+            return status, '{"status": "fail", "error": ["server busy"]}', headers or {}
+        return 200, body
+    return callback
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_is_retryable(self):
+        policy = RetryPolicy()
+        self.assertTrue(policy.is_retryable('search', 502))
+        self.assertTrue(policy.is_retryable('insert/status/123', 504))
+        self.assertFalse(policy.is_retryable('search', 400))
+        self.assertTrue(policy.is_retryable('search', request_sent=True))
+        # an insert the server may have processed is not sent again
+        self.assertFalse(policy.is_retryable('insert', 502))
+        self.assertFalse(policy.is_retryable('insert', request_sent=True))
+        self.assertTrue(policy.is_retryable('insert', 429))
+        self.assertTrue(policy.is_retryable('insert', 503))
+        self.assertTrue(policy.is_retryable('insert', request_sent=False))
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+        self.assertEqual([policy.backoff(attempt) for attempt in range(5)], [1, 2, 4, 5, 5])
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5)
+        self.assertTrue(all(0 <= policy.backoff(3) <= 5 for _ in range(100)))
+
+    def test_retry_after(self):
+        self.assertEqual(parse_retry_after('3'), 3)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+        self.assertEqual(parse_retry_after(None), None)
+
+        policy = RetryPolicy(max_backoff=10)
+        self.assertEqual(policy.retry_delay(0, 'search', 503, retry_after=2), 2)
+        self.assertEqual(policy.retry_delay(0, 'search', 503, retry_after=60), None)
+
+    def test_budget(self):
+        budget = RetryBudget(max_tokens=10, token_ratio=1)
+        policy = RetryPolicy(max_retries=100, budget=budget)
+
+        delays = [policy.retry_delay(0, 'search', 503) for _ in range(6)]
+        self.assertEqual([delay is not None for delay in delays], [True] * 4 + [False] * 2)
+        policy.record_success()
+        policy.record_success()
+        self.assertTrue(budget.can_retry())
+
+
+class TestClientRetry(unittest.TestCase):
+
+    def test_search_retried(self):
+        with LocalServer({'search': (200, failing(2, 503, SEARCH_RESPONSE))}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, retry=RetryPolicy(backoff_factor=0.01)) as api:
+                resp = api.search('test_im')
+
+        self.assertEqual(resp['status'], 'OK')
+        self.assertEqual(len(server.requests), 3)
+
+    def test_gives_up_after_max_retries(self):
+        with LocalServer({'search': (200, failing(5, 502, SEARCH_RESPONSE))}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, retry=RetryPolicy(max_retries=2, backoff_factor=0.01)) as api:
+                with self.assertRaises(ViSearchAPIError) as context:
+                    api.search('test_im')
+
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(context.exception.status_code, 502)
+        self.assertEqual(context.exception.error_message, 'server busy')
+        self.assertTrue('server busy' in context.exception.body)
+
+    def test_error_message(self):
+        self.assertEqual(api_error('search', 503, '{"error": ["busy", "retry later"]}').error_message,
+                         'busy; retry later')
+        self.assertEqual(api_error('search', 503, '{"error": "server busy"}').error_message, 'server busy')
+        self.assertEqual(api_error('search', 502, '<html></html>').error_message, 'search error')
+
+    def test_insert_not_retried_when_processed(self):
+        with LocalServer({'insert': (200, failing(1, 502, INSERT_RESPONSE))}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, retry=RetryPolicy(backoff_factor=0.01)) as api:
+                self.assertRaises(ViSearchAPIError, api.insert, {'im_name': 'a', 'im_url': 'http://a.jpg'})
+        self.assertEqual(len(server.requests), 1)
+
+    def test_insert_retried_on_429_with_retry_after(self):
+        with LocalServer({'insert': (200, failing(1, 429, INSERT_RESPONSE, {'Retry-After': '0'}))}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, retry=True) as api:
+                resp = api.insert({'im_name': 'a', 'im_url': 'http://a.jpg'})
+
+        self.assertEqual(resp['status'], 'OK')
+        self.assertEqual(len(server.requests), 2)
+
+    def test_upload_file_rewound(self):
+        image_path = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+        with LocalServer({'uploadsearch': (200, failing(1, 503, SEARCH_RESPONSE))}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, retry=RetryPolicy(backoff_factor=0.01)) as api:
+                api.uploadsearch(image_path=image_path)
+
+        self.assertEqual(len(server.requests), 2)
+        with open(image_path, 'rb') as f:
+            contents = f.read()
+        self.assertTrue(contents in server.requests[0][3])
+        self.assertTrue(contents in server.requests[1][3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import unittest
+from visearch import client
+from visearch.session import create_session, PooledHTTPAdapter
+from tests.local_server import LocalServer
+
+
+SEARCH_RESPONSE = '{"status": "OK", "method": "search", "result": [], "error": [], "total": 0, "page": 1}'
+
+
+class TestSession(unittest.TestCase):
+
+    def test_pool_settings(self):
+        session = create_session(pool_connections=3, pool_maxsize=7, pool_block=True)
+        adapter = session.get_adapter('https://visearch.visenze.com/')
+
+        self.assertTrue(isinstance(adapter, PooledHTTPAdapter))
+        self.assertEqual(adapter._pool_connections, 3)
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertEqual(adapter._pool_block, True)
+        self.assertTrue(session.get_adapter('http://visearch.visenze.com/') is adapter)
+
+    def test_client_reuses_connection(self):
+        with LocalServer({'search': (200, SEARCH_RESPONSE)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                for _ in range(3):
+                    resp = api.search('test_im')
+                    self.assertEqual(resp['status'], 'OK')
+
+                self.assertEqual(api.pool_stats, {'hits': 2, 'misses': 1, 'requests': 3})
+        self.assertEqual(len(server.requests), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from visearch import client
+from visearch.bind import ViSearchAPIError
+from visearch.singleflight import SingleFlight
+from tests.local_server import LocalServer
+
+
+SEARCH_RESPONSE = '{"status": "OK", "method": "search", "result": [{"im_name": "a"}], "error": [], "total": 1, "page": 1}'
+
+
+def slow(status, body, delay=0.2):
+    def respond(method, path, request_body):
+        time.sleep(delay)
+        return status, body
+    return respond
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_shared_call(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return calls
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            first = executor.submit(flight.do, 'key', work)
+            started.wait()
+            others = [executor.submit(flight.do, 'key', work) for _ in range(4)]
+            time.sleep(0.05)
+            release.set()
+            results = [first.result()] + [future.result() for future in others]
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is calls for result in results))
+        self.assertEqual(flight.stats, {'calls': 1, 'shared': 4, 'in_flight': 0})
+
+        # nothing is kept once the call returned
+        flight.do('key', work)
+        self.assertEqual(len(calls), 2)
+
+    def test_shared_exception(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def fail():
+            started.set()
+            release.wait()
+            raise ValueError('boom')
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(flight.do, 'key', fail)]
+            started.wait()
+            futures += [executor.submit(flight.do, 'key', fail) for _ in range(2)]
+            time.sleep(0.05)
+            release.set()
+            for future in futures:
+                self.assertRaises(ValueError, future.result)
+        self.assertEqual(flight.stats['in_flight'], 0)
+
+
+class TestClientCoalescing(unittest.TestCase):
+
+    def test_identical_searches(self):
+        with LocalServer({'search': (200, slow(200, SEARCH_RESPONSE))}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, coalesce=True) as api:
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    # the same filters in another order are the same request
+                    futures = [executor.submit(api.search, 'a', fl=['price', 'brand'] if i % 2 else ['brand', 'price'])
+                               for i in range(8)]
+                    futures.append(executor.submit(api.search, 'b'))
+                    results = [future.result() for future in futures]
+
+        self.assertEqual(len(server.requests), 2)
+        self.assertTrue(all(result['result'][0]['im_name'] == 'a' for result in results))
+        self.assertEqual(api.singleflight.stats['calls'], 2)
+
+    def test_shared_error(self):
+        with LocalServer({'search': (200, slow(500, '{"error": ["down"]}'))}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, coalesce=True) as api:
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    futures = [executor.submit(api.search, 'a') for _ in range(4)]
+                    for future in futures:
+                        self.assertRaises(ViSearchAPIError, future.result)
+
+        self.assertEqual(len(server.requests), 1)
+
+    def test_disabled(self):
+        with LocalServer({'search': (200, slow(200, SEARCH_RESPONSE, 0.1))}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                with ThreadPoolExecutor(max_workers=3) as executor:
+                    list(executor.map(lambda _: api.search('a'), range(3)))
+
+        self.assertEqual(len(server.requests), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import unittest
+from collections import defaultdict
+from six.moves.urllib.parse import urlparse, parse_qs
+from visearch import client
+from tests.local_server import LocalServer
+
+
+class InsertStatusServer(object):
+    """
+        every status call without error_page advances a transaction by 50 percent,
+        transaction '2' ends with 3 failed images
+    """
+
+    def __init__(self):
+        self.polls = defaultdict(int)
+
+    def __call__(self, method, path, body):
+        url = urlparse(path)
+        trans_id = url.path.split('/')[-1]
+        query = parse_qs(url.query)
+        if trans_id == 'unknown':
+            return json.dumps({'status': 'fail', 'method': 'insert/status', 'error': [{'error_code': 101}]})
+
+        fail_count = 3 if trans_id == '2' else 0
+        result = {'trans_id': trans_id, 'total': 10, 'fail_count': fail_count}
+        if 'error_page' in query:
+            page, limit = int(query['error_page'][0]), int(query['error_limit'][0])
+            errors = [{'index': i, 'error_code': 107} for i in range(fail_count)]
+            result['error_list'] = errors[(page - 1) * limit:page * limit]
+            result['processed_percent'] = 100
+        else:
+            self.polls[trans_id] += 1
+            result['processed_percent'] = min(50 * self.polls[trans_id], 100)
+        result['success_count'] = result['total'] - fail_count if result['processed_percent'] == 100 else 0
+        return json.dumps({'status': 'OK', 'method': 'insert/status', 'result': [result]})
+
+
+class TestInsertStatusTracker(unittest.TestCase):
+
+    def test_track_many_transactions(self):
+        status_server = InsertStatusServer()
+        with LocalServer({'insert/status/1': (200, status_server),
+                          'insert/status/2': (200, status_server),
+                          'insert/status/unknown': (200, status_server)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                tracker = api.track_insert_status([1, 2, 'unknown'], initial_delay=0.01, max_delay=0.05, error_limit=2)
+                report = tracker.wait(timeout=10)
+
+        self.assertEqual(list(tracker.futures.keys()), ['1', '2', 'unknown'])
+        self.assertEqual(report.total, 20)
+        self.assertEqual(report.success_count, 17)
+        self.assertEqual(report.fail_count, 3)
+        self.assertEqual([trans_id for trans_id, _ in report.errors], ['2', '2', '2'])
+        self.assertEqual([status.trans_id for status in report.failed], ['2', 'unknown'])
+        self.assertTrue(report.statuses[2].error is not None)
+        # finished transactions are not polled anymore
+        self.assertEqual(status_server.polls['1'], 2)
+        self.assertEqual(status_server.polls['2'], 2)
+
+    def test_insert_status_error_paging(self):
+        with LocalServer({'insert/status/2': (200, InsertStatusServer())}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                resp = api.insert_status(2, error_page=2, error_limit=2)
+
+        self.assertEqual(parse_qs(urlparse(server.requests[0][1]).query), {'error_page': ['2'], 'error_limit': ['2']})
+        self.assertEqual(len(resp['result'][0]['error_list']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import unittest
+from visearch import client
+from visearch.bind import ViSearchClientError
+from visearch.response import SearchResult
+from visearch.streaming import StreamingResponse
+from tests.local_server import LocalServer
+
+
+SEARCH_RESPONSE = {
+    "status": "OK", "method": "search", "error": [], "page": 1, "limit": 3,
+    "result": [
+        {"im_name": "a", "score": 0.95, "value_map": {"title": u"café ☕", "tags": ["x", {"y": [1, 2]}]}},
+        {"im_name": "b", "score": 12345},
+        {"im_name": "c ] } , \" [", "score": 1e-3},
+    ],
+    "total": 123456,
+}
+
+
+def byte_chunks(body, size=1):
+    data = body.encode('utf-8')
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+class TestStreamingResponse(unittest.TestCase):
+
+    def test_byte_by_byte(self):
+        body = json.dumps(SEARCH_RESPONSE, ensure_ascii=False, indent=1)
+        for size in (1, 2, 7, 1024):
+            stream = StreamingResponse(byte_chunks(body, size))
+            self.assertEqual(list(stream), SEARCH_RESPONSE['result'])
+            self.assertEqual(stream.count, 3)
+            expected = dict(SEARCH_RESPONSE)
+            del expected['result']
+            self.assertEqual(stream.fields, expected)
+
+    def test_items_before_end(self):
+        consumed = []
+
+        def chunks():
+            for chunk in byte_chunks(json.dumps(SEARCH_RESPONSE), 16):
+                consumed.append(chunk)
+                yield chunk
+
+        stream = iter(StreamingResponse(chunks()))
+        self.assertEqual(next(stream)['im_name'], 'a')
+        self.assertTrue(len(consumed) < len(json.dumps(SEARCH_RESPONSE)) // 16)
+
+    def test_close(self):
+        closed = []
+        stream = StreamingResponse(byte_chunks(json.dumps(SEARCH_RESPONSE)), close=lambda: closed.append(1))
+        for item in stream:
+            break
+        self.assertEqual(closed, [1])
+
+    def test_empty(self):
+        stream = StreamingResponse(byte_chunks('{"status": "OK", "result": [], "total": 0}'))
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.fields['total'], 0)
+
+    def test_failed_status(self):
+        stream = StreamingResponse(byte_chunks('{"status": "fail", "error": ["bad im_name"]}'))
+        self.assertRaises(ViSearchClientError, list, stream)
+        self.assertEqual(stream.fields['error'], ['bad im_name'])
+
+    def test_truncated(self):
+        body = json.dumps(SEARCH_RESPONSE)[:-30]
+        self.assertRaises(ViSearchClientError, list, StreamingResponse(byte_chunks(body, 5)))
+        self.assertRaises(ViSearchClientError, list, StreamingResponse(byte_chunks('[1, 2]')))
+
+
+class TestClientStreaming(unittest.TestCase):
+
+    def test_stream_search(self):
+        with LocalServer({'search': (200, json.dumps(SEARCH_RESPONSE))}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                stream = api.stream_search('a', limit=3, chunk_size=8)
+                names = [result['im_name'] for result in stream]
+
+            with client.ViSearchAPI('debug', 'debug', host=server.host, result_objects=True) as api:
+                results = list(api.stream_search('a'))
+
+        self.assertEqual(names, ['a', 'b', 'c ] } , " ['])
+        self.assertEqual(stream.fields['total'], 123456)
+        self.assertTrue('limit=3' in server.requests[0][1])
+        self.assertTrue(isinstance(results[0], SearchResult))
+        self.assertEqual(results[0].value_map['tags'][1], {"y": [1, 2]})
+
+    def test_stream_discoversearch(self):
+        body = json.dumps({"status": "OK", "objects": [{"type": "top", "result": [{"im_name": "a"}]},
+                                                       {"type": "shoe", "result": []}]})
+        with LocalServer({'discoversearch': (200, body)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host) as api:
+                types = [obj['type'] for obj in api.stream_discoversearch(im_url='http://a.jpg')]
+
+        self.assertEqual(types, ['top', 'shoe'])
+        self.assertEqual(server.requests[0][0], 'POST')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import os.path
+import socket
+import unittest
+from requests.exceptions import ConnectionError, ReadTimeout
+from visearch import client
+from visearch.bind import ViSearchAPIError, request_sent
+from visearch.multipart import FormBody
+from visearch.retry import RetryPolicy
+from visearch.transport import MemoryTransport, RequestsTransport, Urllib3Transport, encode_request
+from tests.local_server import LocalServer
+
+
+SEARCH_RESPONSE = '{"status": "OK", "method": "search", "result": [{"im_name": "a"}], "error": [], "total": 1, "page": 1}'
+INSERT_RESPONSE = '{"status": "OK", "method": "insert", "trans_id": 1, "total": 2}'
+IMAGE_PATH = os.path.dirname(os.path.realpath(__file__)) + '/fixtures/upload.jpg'
+
+
+def exercise(api):
+    api.search('im 1', fl=['price', 'brand'], fq={'brand': 'nike shoes'}, score=True)
+    api.insert([{'im_name': 'a', 'im_url': 'http://example.com/a.jpg', 'title': u'caf\xe9'},
+                {'im_name': 'b', 'im_url': 'http://example.com/b.jpg'}])
+    api.remove(['a', 'b'])
+    api.insert_status(352649805417295872, error_page=2)
+    api.uploadsearch(image_path=IMAGE_PATH, limit=5)
+
+
+class TestUrllib3Transport(unittest.TestCase):
+
+    def setUp(self):
+        self.responses = {
+            'search': (200, SEARCH_RESPONSE),
+            'insert': (200, INSERT_RESPONSE),
+            'remove': (200, INSERT_RESPONSE),
+            'insert/status/352649805417295872': (200, INSERT_RESPONSE),
+            'uploadsearch': (200, SEARCH_RESPONSE),
+        }
+
+    def test_same_requests_as_requests(self):
+        sent = []
+        for transport in (RequestsTransport(), Urllib3Transport()):
+            with LocalServer(self.responses) as server:
+                with client.ViSearchAPI('debug', 'debug', host=server.host, transport=transport) as api:
+                    exercise(api)
+                    self.assertEqual(api.pool_stats['requests'], 5)
+            sent.append(server.requests)
+
+        for (method, path, headers, body), (method2, path2, headers2, body2) in zip(*sent):
+            self.assertEqual((method, path), (method2, path2))
+            self.assertEqual(headers['Authorization'], headers2['Authorization'])
+            content_type = headers.get('Content-Type', '')
+            if 'boundary' not in content_type:
+                self.assertEqual(content_type, headers2.get('Content-Type', ''))
+                self.assertEqual(body, body2)
+            else:
+                # the same apart from the random boundary
+                self.assertTrue(headers2['Content-Type'].startswith('multipart/form-data; boundary='))
+                self.assertEqual(len(body), len(body2))
+
+    def test_stream_search(self):
+        with LocalServer(self.responses) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, transport=Urllib3Transport()) as api:
+                results = list(api.stream_search('a', chunk_size=8))
+                self.assertEqual(results, [{'im_name': 'a'}])
+                self.assertEqual(api.search('a')['status'], 'OK')
+                self.assertEqual(api.pool_stats, {'hits': 1, 'misses': 1, 'requests': 2})
+
+    def test_chunked_body(self):
+        transport = Urllib3Transport()
+        with LocalServer({'insert': (200, INSERT_RESPONSE)}) as server:
+            body = FormBody(iter([('im_name[0]', 'a'), ('im_url[0]', 'http://example.com/a.jpg')]))
+            request = transport.prepare('POST', server.host + 'insert', data=body)
+            resp = transport.send(request, timeout=5)
+            self.assertEqual(resp.json()['status'], 'OK')
+        self.assertEqual(server.requests[0][2]['Transfer-Encoding'], 'chunked')
+        self.assertEqual(server.requests[0][3], b'im_name%5B0%5D=a&im_url%5B0%5D=http%3A%2F%2Fexample.com%2Fa.jpg')
+
+    def test_errors(self):
+        with LocalServer({'search': (500, '{"error": ["busy"]}')}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, transport=Urllib3Transport()) as api:
+                with self.assertRaises(ViSearchAPIError) as cm:
+                    api.search('a')
+        self.assertEqual(cm.exception.status_code, 500)
+        self.assertEqual(cm.exception.error_message, 'busy')
+
+        # a port nobody listens on
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        host = 'http://127.0.0.1:%d/' % sock.getsockname()[1]
+        sock.close()
+        policy = RetryPolicy(max_retries=1, backoff_factor=0)
+        with client.ViSearchAPI('debug', 'debug', host=host, transport=Urllib3Transport(), retry=policy) as api:
+            with self.assertRaises(ConnectionError) as cm:
+                api.search('a')
+        self.assertFalse(request_sent(cm.exception))
+
+    def test_read_timeout(self):
+        import time
+
+        def slow(method, path, body):
+            time.sleep(0.3)
+            return SEARCH_RESPONSE
+
+        with LocalServer({'search': (200, slow)}) as server:
+            with client.ViSearchAPI('debug', 'debug', host=server.host, transport=Urllib3Transport(),
+                                    timeout=0.05) as api:
+                self.assertRaises(ReadTimeout, api.search, 'a')
+
+
+class TestMemoryTransport(unittest.TestCase):
+
+    def test_canned_responses(self):
+        def status(request):
+            return 200, json.dumps({'status': 'OK', 'url': request.url}), {'X-Test': '1'}
+
+        transport = MemoryTransport({
+            'search': (200, SEARCH_RESPONSE),
+            'insert': (200, INSERT_RESPONSE),
+            'remove': (200, INSERT_RESPONSE),
+            'insert/status': (200, status),
+            'uploadsearch': (200, SEARCH_RESPONSE),
+        })
+        with client.ViSearchAPI('debug', 'debug', transport=transport, result_objects=True) as api:
+            exercise(api)
+            self.assertEqual(api.insert_status(1)['url'], 'http://visearch.visenze.com/insert/status/1')
+            self.assertEqual([result.im_name for result in api.stream_search('a', chunk_size=4)], ['a'])
+            self.assertRaises(ViSearchAPIError, api.colorsearch, 'fff')
+            self.assertEqual(api.pool_stats, None)
+
+        requests = list(transport.requests)
+        self.assertEqual(len(requests), 8)
+        self.assertTrue('fq=brand:nike%20shoes' in requests[0].url)
+        self.assertTrue(b'title%5B0%5D=caf%C3%A9' in requests[1].content)
+        with open(IMAGE_PATH, 'rb') as f:
+            self.assertTrue(f.read() in requests[4].content)
+        self.assertEqual(int(requests[4].headers['Content-Length']), len(requests[4].content))
+
+    def test_static_headers(self):
+        headers = {'Retry-After': '3'}
+        transport = MemoryTransport({'search': (429, '{"status": "fail", "error": ["busy"]}', headers),
+                                     'colorsearch': (200, lambda request: SEARCH_RESPONSE)})
+        for _ in range(2):
+            response = transport.send(transport.prepare('GET', 'http://host/search'))
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.headers['Retry-After'], '3')
+            self.assertEqual(response.headers['Content-Type'], 'application/json')
+        # the canned headers are left as they were given
+        self.assertEqual(headers, {'Retry-After': '3'})
+        response = transport.send(transport.prepare('GET', 'http://host/colorsearch'))
+        self.assertEqual((response.status_code, response.json()['status']), (200, 'OK'))
+
+    def test_keep(self):
+        transport = MemoryTransport({'search': (200, SEARCH_RESPONSE)}, keep=2)
+        api = client.ViSearchAPI('debug', 'debug', transport=transport)
+        for i in range(5):
+            api.search('im_%d' % i)
+        self.assertEqual([request.url.split('im_name=')[1][:4] for request in transport.requests], ['im_3', 'im_4'])
+
+    def test_encode_request(self):
+        request = encode_request('GET', 'http://host/search', {'im_name': 'a b', 'fl': ['x', 'y'], 'skip': None},
+                                 auth=('user', 'pass'))
+        self.assertEqual(request.url, 'http://host/search?im_name=a+b&fl=x&fl=y')
+        self.assertEqual(request.headers['Authorization'], 'Basic dXNlcjpwYXNz')
+        self.assertTrue('Content-Length' not in request.headers)
+        request = encode_request('POST', 'http://host/insert', json={'a': 1})
+        self.assertEqual(request.body, b'{"a": 1}')
+        self.assertEqual(request.headers['Content-Length'], '8')
+
+        # the headers of the caller are copied, not completed in place
+        headers = {'X-Requested-With': 'sdk'}
+        for transport in (MemoryTransport(), Urllib3Transport()):
+            transport.prepare('POST', 'http://host/insert', data={'a': 1}, headers=headers, auth=('user', 'pass'))
+        self.assertEqual(headers, {'X-Requested-With': 'sdk'})
+
+
+if __name__ == '__main__':
+    unittest.main()
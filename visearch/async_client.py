@@ -0,0 +1,403 @@
+"""
+    asyncio flavour of ViSearchAPI, requires aiohttp (pip install visearch[async])
+"""
+import asyncio
+import base64
+import json as jsonlib
+import time
+from six.moves.urllib.parse import quote
+from . import __version__
+from .bind import build_parameters, build_path, canonical_parameters
+from .bind import ViSearchAPIError, ViSearchClientError, api_error, is_failure
+from .breaker import CircuitBreakers
+from .client import search_parameters, box_parameter, discoversearch_validation
+from .metrics import RequestMetrics
+from .response import SearchResponse, json_loads
+from .retry import RetryPolicy
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+DEFAULT_MAX_CONCURRENCY = 10
+
+
+def _form_data(data, files):
+    form = aiohttp.FormData()
+    for name, value in (data or {}).items():
+        for item in (value if isinstance(value, (list, tuple)) else [value]):
+            if item is not None:
+                form.add_field(name, str(item))
+    for name, file_tuple in files.items():
+        content_type = file_tuple[2] if len(file_tuple) > 2 else None
+        form.add_field(name, file_tuple[1], filename=file_tuple[0], content_type=content_type)
+    return form
+
+
+async def _connection_create_start(session, context, params):
+    context.connect_start = time.time()
+
+
+async def _connection_create_end(session, context, params):
+    metrics = context.trace_request_ctx
+    if metrics is not None:
+        metrics.timings['connect'] = time.time() - context.connect_start
+
+
+async def _async_send(api, path, method, parameters=None, data=None, files=None, json=None, metrics=None):
+    headers = {
+        'X-Requested-With': 'ViSenze-Python-SDK/{}'.format(__version__),
+        'Authorization': api.auth_info,
+    }
+
+    if method.upper() not in ('POST', 'GET'):
+        raise ViSearchClientError('unsupported http method')
+    timings = metrics.timings
+    start = time.time()
+    if files:
+        data = _form_data(data, files)
+    timings['encode'] = time.time() - start
+
+    session = api.session
+    async with api.semaphore:
+        sent = time.time()
+        # time spent waiting for one of the max_concurrency slots
+        timings['queue'] = sent - start - timings['encode']
+        timings['connect'] = 0.0
+        async with session.request(method.upper(),
+                                   api.host + path,
+                                   params=parameters or None,
+                                   data=data,
+                                   json=json,
+                                   timeout=aiohttp.ClientTimeout(total=api.timeout),
+                                   headers=headers,
+                                   trace_request_ctx=metrics) as resp:
+            first_byte = time.time()
+            timings['ttfb'] = first_byte - sent - timings['connect']
+            metrics.status_code = resp.status
+            metrics.request_bytes = int(resp.request_info.headers.get('Content-Length') or 0)
+            if resp.status != 200:
+                raise api_error(path, resp.status, await resp.text(), resp.headers)
+
+            content = await resp.read()
+            downloaded = time.time()
+            timings['download'] = downloaded - first_byte
+            metrics.response_bytes = len(content)
+
+    resp_data = json_loads(content) if api.result_objects else jsonlib.loads(content)
+    timings['decode'] = time.time() - downloaded
+
+    return resp_data
+
+
+async def _async_attempt(api, path, method, parameters=None, data=None, files=None, json=None, metrics=None):
+    breaker = None
+    if api.circuit_breakers is not None:
+        breaker = api.circuit_breakers.get(path)
+        breaker.before_call()
+    try:
+        if api.rate_limiter is not None:
+            # the bucket only hands out the delay, the wait does not block the event loop
+            delay = api.rate_limiter.acquire(path)
+            if delay:
+                await asyncio.sleep(delay)
+            metrics.timings['throttle'] = delay
+        for hook in api.hooks:
+            hook.before_request(metrics)
+    except BaseException:
+        # nothing was sent, a half open circuit must not wait for this probe
+        if breaker is not None:
+            breaker.release()
+        raise
+
+    start = time.time()
+    # None while the call has no outcome: a cancelled request says nothing about the service
+    failed = None
+    try:
+        resp_data = await _async_send(api, path, method, parameters, data, files, json, metrics)
+        failed = False
+        return resp_data
+    except asyncio.CancelledError:
+        # an Exception before python 3.8
+        raise
+    except Exception as e:
+        metrics.error = e
+        failed = is_failure(e) or isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError))
+        raise
+    finally:
+        metrics.total = time.time() - start
+        if breaker is not None:
+            if failed is None:
+                breaker.release()
+            else:
+                breaker.record(metrics.total, failed)
+        for hook in api.hooks:
+            hook.after_request(metrics)
+
+
+class AsyncSingleFlight(object):
+    """
+        SingleFlight for coroutines: the first caller starts the request as a task, callers
+        with the same key await that task. a cancelled caller does not cancel the request
+        for the others.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, func, *args, **kwargs):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.calls += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    @property
+    def stats(self):
+        return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self._tasks)}
+
+
+async def async_bind_method(api, path, method, parameters=None, data=None, files=None, json=None, timings=None):
+    policy = api.retry_policy
+    attempt = 0
+    while True:
+        metrics = RequestMetrics(path, method.upper(), attempt)
+        if attempt == 0 and timings:
+            metrics.timings.update(timings)
+        try:
+            resp_data = await _async_attempt(api, path, method, parameters, data, files, json, metrics)
+        except ViSearchAPIError as e:
+            if policy is None:
+                raise
+            delay = policy.retry_delay(attempt, path, status_code=e.status_code, retry_after=e.retry_after)
+            if delay is None:
+                raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if policy is None:
+                raise
+            sent = not isinstance(e, aiohttp.ClientConnectorError)
+            delay = policy.retry_delay(attempt, path, request_sent=sent)
+            if delay is None:
+                raise
+        else:
+            if policy is not None:
+                policy.record_success()
+            return resp_data
+
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+class AsyncViSearchAPI(object):
+    """
+        every method of ViSearchAPI as a coroutine, requests run on a shared aiohttp session
+        with at most `max_concurrency` of them in flight. image reading and resizing is done
+        in `executor` (the loop's default executor when None) to keep the event loop free.
+
+        the client must be closed with `await api.close()` or used as `async with`.
+    """
+
+    def __init__(self, access_key, secret_key, host="http://visearch.visenze.com/",
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=30, executor=None, fast_resize=False, retry=None,
+                 circuit_breaker=None, coalesce=False, result_objects=False, hooks=None, rate_limiter=None):
+        if aiohttp is None:
+            raise ViSearchClientError("AsyncViSearchAPI requires aiohttp, install it with `pip install visearch[async]`")
+
+        self.host = host
+        self.access_key = access_key
+        self.secret_key = secret_key
+        credentials = '{0}:{1}'.format(self.access_key, self.secret_key).encode('utf-8')
+        self.auth_info = 'Basic ' + base64.b64encode(credentials).decode('ascii')
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.executor = executor
+        self.fast_resize = fast_resize
+        self.retry_policy = RetryPolicy() if retry is True else retry
+        self.circuit_breakers = CircuitBreakers() if circuit_breaker is True else circuit_breaker
+        self.singleflight = AsyncSingleFlight() if coalesce else None
+        self.result_objects = result_objects
+        self.hooks = list(hooks or [])
+        self.rate_limiter = rate_limiter
+        self._session = None
+        self._semaphore = None
+
+    @property
+    def session(self):
+        # aiohttp sessions have to be created inside the running loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_start.append(_connection_create_start)
+            trace.on_connection_create_end.append(_connection_create_end)
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=[trace])
+        return self._session
+
+    @property
+    def semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _run_in_executor(self, func, *args):
+        return asyncio.get_event_loop().run_in_executor(self.executor, func, *args)
+
+    async def insert(self, images, **kwargs):
+        if type(images).__name__ != 'list':
+            images = [images, ]
+
+        path = 'insert'
+        required_fields = ['im_name', 'im_url']
+        raw_parameters = {
+            'images': images,
+        }
+        data = build_parameters(path, raw_parameters, required_fields)
+        data.update(kwargs)
+        return await async_bind_method(self, path, 'POST', data=data)
+
+    async def update(self, images, **kwargs):
+        if type(images).__name__ != 'list':
+            images = [images, ]
+
+        path = 'insert'
+        required_fields = ['im_name']
+        raw_parameters = {
+            'images': images,
+        }
+        data = build_parameters(path, raw_parameters, required_fields)
+        data.update(kwargs)
+        return await async_bind_method(self, path, 'POST', data=data)
+
+    async def remove(self, image_names, **kwargs):
+        if type(image_names).__name__ != 'list':
+            image_names = [image_names, ]
+        path = 'remove'
+        data = build_parameters(path, image_names)
+        data.update(kwargs)
+        return await async_bind_method(self, path, 'POST', data=data)
+
+    async def insert_status(self, trans_id, error_page=None, error_limit=None):
+        path = 'insert/status/{trans_id}'
+        path_parameters = {
+            'trans_id': str(trans_id)
+        }
+        if error_page:
+            path_parameters['error_page'] = error_page
+        if error_limit:
+            path_parameters['error_limit'] = error_limit
+        path = build_path(path, path_parameters)
+        return await async_bind_method(self, path, 'GET', path_parameters)
+
+    def _response(self, resp):
+        if self.result_objects:
+            return SearchResponse(resp)
+        return resp
+
+    async def _search(self, path, parameters, **kwargs):
+        parameters = build_parameters(path, parameters, **kwargs)
+        if self.singleflight is None:
+            resp = await async_bind_method(self, path, 'GET', parameters)
+        else:
+            key = (path, canonical_parameters(parameters))
+            resp = await self.singleflight.do(key, async_bind_method, self, path, 'GET', parameters)
+        return self._response(resp)
+
+    async def search(self, im_name, page=1, limit=30, fl=None, fq=None, score=False, score_max=1, score_min=0, get_all_fl=False, **kwargs):
+        parameters = search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl)
+        parameters['im_name'] = im_name
+        return await self._search('search', parameters, **kwargs)
+
+    async def recommendation(self, im_name, page=1, limit=30, fl=None, fq=None, score=False, score_max=1, score_min=0, get_all_fl=False, **kwargs):
+        parameters = search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl)
+        parameters['im_name'] = im_name
+        return await self._search('recommendation', parameters, **kwargs)
+
+    async def colorsearch(self, color, page=1, limit=30, fl=None, fq=None, score=False, score_max=1, score_min=0, get_all_fl=False, **kwargs):
+        if color.startswith('#'):
+            color = color[1:]
+        parameters = search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl)
+        parameters['color'] = color
+        return await self._search('colorsearch', parameters, **kwargs)
+
+    async def uploadsearch(self, image_path=None, image_url=None, box=None, page=1, limit=30, fl=None, fq=None, score=False, score_max=1, score_min=0, resize=None, get_all_fl=False, **kwargs):
+        parameters = search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl)
+        if box:
+            parameters.update({'box': box_parameter(box)})
+
+        path = 'uploadsearch'
+
+        if not (image_path or image_url):
+            raise ViSearchClientError("either provide image_path or image_url")
+        elif image_url:
+            parameters.update({'im_url': quote(image_url)})
+            return await self._search(path, parameters, **kwargs)
+        else:
+            # Pillow is only imported by the first image read
+            from .image import read_file, read_image
+            start = time.time()
+            if resize:
+                files = await self._run_in_executor(read_image, image_path, resize, None, self.fast_resize)
+            else:
+                files = await self._run_in_executor(read_file, image_path)
+            timings = {'preprocess': time.time() - start}
+            parameters = build_parameters(path, parameters, **kwargs)
+            return self._response(await async_bind_method(self, path, 'POST', parameters, files=files, timings=timings))
+
+    async def discoversearch(self, im_url=None, image=None, im_id=None, detection="all",
+                             detection_limit=5, detection_sensitivity="low", result_limit=10, box=None, **kwargs):
+        parameters = {
+            "detection_limit": detection_limit,
+            "detection_sensitivity": detection_sensitivity,
+            "result_limit": result_limit,
+            "detection": detection
+        }
+        path = 'discoversearch'
+        files = None
+        timings = None
+
+        if box:
+            parameters.update({'box': box_parameter(box)})
+
+        if not (im_url or image or im_id):
+            raise ViSearchClientError("at least one of `im_url`, `image` or `im_id` must exists")
+        elif im_url:
+            parameters['im_url'] = im_url
+        elif image:
+            start = time.time()
+            files = await self._run_in_executor(self._read_discover_image, image)
+            timings = {'preprocess': time.time() - start}
+        else:
+            parameters['im_id'] = im_id
+
+        parameters.update(kwargs)
+        return await async_bind_method(self, path, 'POST', data=parameters, files=files, timings=timings)
+
+    @staticmethod
+    def _read_discover_image(image):
+        from .image import read_image
+        files = read_image(image, None, validation_func=discoversearch_validation)
+        # the sync client streams the file, here it is read off the loop as well
+        file_tuple = files['image']
+        return {'image': (file_tuple[0], file_tuple[1].read(), file_tuple[2])}
@@ -1,7 +1,13 @@
-import requests
+import json as jsonlib
 import re
+import time
 from six.moves.urllib.parse import quote
 from . import __version__
+from .metrics import RequestMetrics
+from .multipart import MultipartBody, StreamingBody
+from .response import json_loads
+from .retry import parse_retry_after
+from .pool import take_connect_time
 
 
 re_path_template = re.compile('{\w+}')
@@ -25,6 +31,9 @@ class ViSearchAPIError(Exception):
         self.status_code = status_code
         self.error_type = error_type
         self.error_message = error_message
+        # raw response body and the parsed Retry-After header, in seconds
+        self.body = kwargs.get('body')
+        self.retry_after = kwargs.get('retry_after')
 
     def __str__(self):
         return "(%s) %s-%s" % (self.status_code, self.error_type, self.error_message)
@@ -48,17 +57,8 @@ def build_path(path, parameters):
 def build_parameters(path, raw_parameters, required_fields=None, **kwargs):
     if path == 'insert':
         images = raw_parameters['images']
-
-        for ind, image in enumerate(images):
-            is_required_fields_provided = all(attr_name in image.keys() for attr_name in required_fields)
-            if not is_required_fields_provided:
-                error_message = "insert api: the {0}'s image doesn't provide the required fields".format(ind)
-                raise ViSearchClientError(error_message)
-
-        param = {}
-        for ind, image in enumerate(images):
-            for attr_name, attr_value in image.items():
-                param['%s[%d]' % (attr_name, ind)] = attr_value
+        check_required_fields(images, required_fields)
+        param = dict(iter_insert_fields(images))
 
     elif path == 'remove':
         param = dict([('im_name[{}]'.format(ind), image_name) for ind, image_name in enumerate(raw_parameters)])
@@ -81,33 +81,212 @@ def build_parameters(path, raw_parameters, required_fields=None, **kwargs):
     return param
 
 
-def bind_method(api, path, method, parameters=None, data=None, files=None, json=None):
+def check_required_fields(images, required_fields):
+    for ind, image in enumerate(images):
+        is_required_fields_provided = all(attr_name in image.keys() for attr_name in required_fields)
+        if not is_required_fields_provided:
+            error_message = "insert api: the {0}'s image doesn't provide the required fields".format(ind)
+            raise ViSearchClientError(error_message)
+
+
+def iter_insert_fields(images, extra=None):
+    """
+        the form fields of build_parameters('insert', ...) as (name, value) pairs, generated
+        one image at a time, followed by the `extra` fields
+    """
+    for ind, image in enumerate(images):
+        for attr_name, attr_value in image.items():
+            yield '%s[%d]' % (attr_name, ind), attr_value
+    for name, value in (extra or {}).items():
+        yield name, value
+
+
+def canonical_parameters(parameters):
+    """
+        order-independent form of a query string built by build_parameters, so that
+        the same fl values or fq filters given in another order give the same string
+    """
+    return '&'.join(sorted(parameters.split('&')))
+
+
+def api_error(path, status_code, body, headers=None):
+    error_message = "{0} error".format(path)
+    try:
+        errors = jsonlib.loads(body).get('error')
+        if errors:
+            if not isinstance(errors, list):
+                errors = [errors]
+            error_message = '; '.join(str(error) for error in errors)
+    except (ValueError, AttributeError):
+        pass
+    retry_after = parse_retry_after((headers or {}).get('Retry-After'))
+    return ViSearchAPIError(status_code, "{0} error".format(path), error_message, body=body, retry_after=retry_after)
+
+
+def request_sent(error):
+    """
+        whether the server may have received the request that failed with `error`
+    """
+    from requests.exceptions import ConnectTimeout, ConnectionError
+    from urllib3.exceptions import NewConnectionError
+    if isinstance(error, ConnectTimeout):
+        return False
+    if isinstance(error, ConnectionError) and error.args:
+        # wrapped in a MaxRetryError by requests, as is by the urllib3 transport
+        reason = getattr(error.args[0], 'reason', error.args[0])
+        return not isinstance(reason, NewConnectionError)
+    return True
+
+
+def _rewind(files):
+    for file_tuple in (files or {}).values():
+        fp = file_tuple[1] if isinstance(file_tuple, (list, tuple)) else file_tuple
+        if hasattr(fp, 'seek'):
+            fp.seek(0)
+
+
+def _send(api, path, method, parameters=None, data=None, files=None, json=None, stream=False, metrics=None):
     headers = {'X-Requested-With': 'ViSenze-Python-SDK/{}'.format(__version__)}
 
-    if method.upper() == 'POST':
-        resp = requests.post(
-            api.host + path,
-            params=parameters,
-            data=data,
-            files=files,
-            json=json,
-            auth=api.auth_info,
-            timeout=30,
-            headers=headers)
-    elif method.upper() == 'GET':
-        resp = requests.get(
-            api.host + path,
-            params=parameters,
-            files=files,
-            auth=api.auth_info,
-            timeout=30,
-            headers=headers)
-    else:
+    method = method.upper()
+    if method not in ('POST', 'GET'):
         raise ViSearchClientError('unsupported http method')
+    if method == 'GET':
+        data = json = None
+    if files:
+        data = MultipartBody(data, files)
+        files = None
+    if isinstance(data, StreamingBody):
+        if data.len == 0:
+            # as requests sends an empty dict, not as an empty chunked stream
+            data = None
+        else:
+            headers['Content-Type'] = data.content_type
+
+    transport = api.transport
+    timings = metrics.timings
+    start = time.time()
+    request = transport.prepare(method, api.host + path, params=parameters, data=data, json=json,
+                                headers=headers, auth=api.auth_info)
+    encoded = time.time()
+
+    # always streamed, so that the wait for the answer and its download are told apart
+    take_connect_time()
+    resp = transport.send(request, timeout=api.timeout)
+    first_byte = time.time()
+    timings['encode'] = encoded - start
+    timings['connect'] = take_connect_time()
+    timings['ttfb'] = first_byte - encoded - timings['connect']
+    metrics.status_code = resp.status_code
+    metrics.request_bytes = int(request.headers.get('Content-Length') or 0)
 
     if resp.status_code != 200:
-        raise ViSearchAPIError(resp.status_code, "{0} error".format(path), "{0} error".format(path))
+        raise api_error(path, resp.status_code, resp.text, resp.headers)
+
+    if stream:
+        # the body is parsed by the caller while it downloads
+        return resp
 
-    resp_data = resp.json()
+    content = resp.content
+    downloaded = time.time()
+    timings['download'] = downloaded - first_byte
+    metrics.response_bytes = len(content)
+
+    if api.result_objects:
+        # decoded by the fastest installed json library
+        resp_data = json_loads(content)
+    else:
+        resp_data = resp.json()
+    timings['decode'] = time.time() - downloaded
 
     return resp_data
+
+
+def is_request_error(error):
+    """
+        whether `error` is an http error of the transport: connection errors, timeouts...
+    """
+    # only called once a request failed, requests is loaded by then
+    from requests.exceptions import RequestException
+    return isinstance(error, RequestException)
+
+
+def is_failure(error):
+    """
+        whether `error` says the service is unhealthy, as opposed to a bad request
+    """
+    if isinstance(error, ViSearchAPIError):
+        return error.status_code == 429 or error.status_code >= 500
+    return is_request_error(error)
+
+
+def _attempt(api, path, method, parameters=None, data=None, files=None, json=None, stream=False, metrics=None):
+    breaker = None
+    if api.circuit_breakers is not None:
+        breaker = api.circuit_breakers.get(path)
+        breaker.before_call()
+    try:
+        if api.rate_limiter is not None:
+            metrics.timings['throttle'] = api.rate_limiter.wait(path)
+        for hook in api.hooks:
+            hook.before_request(metrics)
+    except BaseException:
+        # nothing was sent, a half open circuit must not wait for this probe
+        if breaker is not None:
+            breaker.release()
+        raise
+
+    start = time.time()
+    # None while the call has no outcome, e.g. when interrupted by KeyboardInterrupt
+    failed = None
+    try:
+        resp_data = _send(api, path, method, parameters, data, files, json, stream, metrics)
+        failed = False
+        return resp_data
+    except Exception as e:
+        metrics.error = e
+        failed = is_failure(e)
+        raise
+    finally:
+        metrics.total = time.time() - start
+        if breaker is not None:
+            if failed is None:
+                breaker.release()
+            else:
+                breaker.record(metrics.total, failed)
+        for hook in api.hooks:
+            hook.after_request(metrics)
+
+
+def bind_method(api, path, method, parameters=None, data=None, files=None, json=None, stream=False, timings=None):
+    """
+        timings: phases measured before the request, e.g. preprocess, reported with the first attempt
+    """
+    policy = api.retry_policy
+    attempt = 0
+    while True:
+        metrics = RequestMetrics(path, method.upper(), attempt)
+        if attempt == 0 and timings:
+            metrics.timings.update(timings)
+        try:
+            resp_data = _attempt(api, path, method, parameters, data, files, json, stream, metrics)
+        except ViSearchAPIError as e:
+            if policy is None:
+                raise
+            delay = policy.retry_delay(attempt, path, status_code=e.status_code, retry_after=e.retry_after)
+            if delay is None:
+                raise
+        except Exception as e:
+            if policy is None or not is_request_error(e):
+                raise
+            delay = policy.retry_delay(attempt, path, request_sent=request_sent(e))
+            if delay is None:
+                raise
+        else:
+            if policy is not None:
+                policy.record_success()
+            return resp_data
+
+        attempt += 1
+        time.sleep(delay)
+        _rewind(files)
@@ -0,0 +1,140 @@
+import threading
+import time
+from .bind import ViSearchClientError
+from .retry import endpoint_of
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(ViSearchClientError):
+
+    def __init__(self, endpoint, retry_in):
+        super(CircuitOpenError, self).__init__(
+            "circuit open for {0}, retry in {1:.1f}s".format(endpoint, retry_in))
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class CircuitBreaker(object):
+    """
+        failure_threshold: consecutive failed or slow calls that open the circuit
+        slow_call_duration: seconds after which a successful call still counts as a failure
+        reset_timeout: seconds the circuit stays open before letting probe calls through
+        half_open_max_calls: probe calls allowed at the same time while half open
+
+        a call fails on a 429 or 5xx answer, a connection error or a timeout. while open,
+        calls raise CircuitOpenError immediately. the first successful probe closes the
+        circuit again, a failed one opens it for another reset_timeout.
+    """
+
+    def __init__(self, endpoint, failure_threshold=5, slow_call_duration=None, reset_timeout=30, half_open_max_calls=1):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.slow_call_duration = slow_call_duration
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._half_open_calls = 0
+
+        self.successes = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.time() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.time()
+        self._consecutive_failures = 0
+        self.times_opened += 1
+
+    def before_call(self):
+        with self._lock:
+            if self._state == OPEN:
+                open_for = time.time() - self._opened_at
+                if open_for < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.endpoint, self.reset_timeout - open_for)
+                self._state = HALF_OPEN
+                self._half_open_calls = 0
+
+            if self._state == HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.endpoint, 0)
+                self._half_open_calls += 1
+
+    def release(self):
+        """
+            give back the probe slot taken by before_call for a call that was not sent
+        """
+        with self._lock:
+            if self._state == HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record(self, duration, failed):
+        slow = not failed and self.slow_call_duration is not None and duration > self.slow_call_duration
+        with self._lock:
+            if failed or slow:
+                self.failures += failed
+                self.slow_calls += slow
+                self._consecutive_failures += 1
+                if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                    self._open()
+            else:
+                self.successes += 1
+                self._consecutive_failures = 0
+                if self._state == HALF_OPEN:
+                    self._state = CLOSED
+
+    @property
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'successes': self.successes,
+                'failures': self.failures,
+                'slow_calls': self.slow_calls,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened,
+            }
+
+
+class CircuitBreakers(object):
+    """
+        one CircuitBreaker per endpoint, created on first use with the given settings
+    """
+
+    def __init__(self, **breaker_kwargs):
+        self.breaker_kwargs = breaker_kwargs
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        endpoint = endpoint_of(path)
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = self._breakers[endpoint] = CircuitBreaker(endpoint, **self.breaker_kwargs)
+            return breaker
+
+    @property
+    def stats(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return dict((breaker.endpoint, breaker.stats) for breaker in breakers)
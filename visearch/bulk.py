@@ -0,0 +1,352 @@
+import collections
+import functools
+import itertools
+import time
+from .bind import ViSearchClientError
+from .concurrency import AdaptiveConcurrency, DEFAULT_MAX_LIMIT
+
+
+# the insert endpoint accepts at most 100 images per call
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_WORKERS = 4
+
+
+def iter_batches(iterable, batch_size):
+    """
+        split any iterable, generators included, into lists of at most batch_size items
+    """
+    if batch_size < 1:
+        raise ViSearchClientError("invalid batch size: {0}".format(batch_size))
+
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _outcome(future):
+    try:
+        return future.result(), None
+    except Exception as e:
+        # one failing item must not abort the others, it is reported with its result
+        return None, e
+
+
+def adaptive_concurrency(adaptive, workers):
+    """
+        the AdaptiveConcurrency of the `adaptive` argument of the bulk methods: True for one
+        starting at `workers`, or an instance, None to keep `workers` fixed
+    """
+    if adaptive is True:
+        return AdaptiveConcurrency(initial=workers, max_limit=max(workers, DEFAULT_MAX_LIMIT))
+    return adaptive or None
+
+
+def _limit(workers, concurrency):
+    return concurrency.limit if concurrency is not None else workers
+
+
+def run_bounded(send, items, workers=DEFAULT_WORKERS, ordered=False, concurrency=None):
+    """
+        call send(item) for every item on a pool of `workers` threads and yield
+        (index, item, response, error) in completion order, or in input order when `ordered`.
+        with an AdaptiveConcurrency as `concurrency`, it decides how many items run at once,
+        on up to its max_limit threads.
+
+        items are pulled from the iterable lazily, no more than 2 * workers of them
+        are held at any time, so memory does not grow with the size of the input.
+    """
+    if concurrency is not None:
+        workers = concurrency.max_limit
+        send = functools.partial(concurrency.call, send)
+    if workers < 1:
+        raise ViSearchClientError("invalid number of workers: {0}".format(workers))
+
+    # imported here, the backport of python 2 imports multiprocessing with concurrent.futures
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = collections.OrderedDict()
+
+    def _completed(futures):
+        for future in futures:
+            index, item = pending.pop(future)
+            response, error = _outcome(future)
+            yield index, item, response, error
+
+    def _next_done():
+        if ordered:
+            # wait for the oldest item, later ones keep running meanwhile
+            return [next(iter(pending))]
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        return done
+
+    try:
+        for index, item in enumerate(items):
+            pending[executor.submit(send, item)] = (index, item)
+            if len(pending) >= 2 * workers:
+                for result in _completed(_next_done()):
+                    yield result
+
+        while pending:
+            for result in _completed(_next_done()):
+                yield result
+    finally:
+        # the consumer stopped early, drop items that have not started yet
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+class BatchResult(object):
+    """
+        outcome of one insert or remove call. the images are only kept for failed batches,
+        so they can be submitted again. `concurrency` is the number of calls allowed in
+        flight when it completed.
+    """
+
+    def __init__(self, index, images, response=None, error=None, concurrency=None):
+        self.index = index
+        self.count = len(images)
+        self.response = response
+        self.error = error
+        self.concurrency = concurrency
+        self.images = None if self.succeeded else images
+
+    @property
+    def succeeded(self):
+        return self.error is None and self.response is not None and self.response.get('status') == 'OK'
+
+    @property
+    def trans_id(self):
+        if self.response:
+            return self.response.get('trans_id')
+        return None
+
+    def __repr__(self):
+        return '<BatchResult index=%d count=%d trans_id=%s succeeded=%s>' % (
+            self.index, self.count, self.trans_id, self.succeeded)
+
+
+class BulkResult(object):
+
+    def __init__(self, batches):
+        self.batches = sorted(batches, key=lambda batch: batch.index)
+
+    @property
+    def trans_ids(self):
+        return [batch.trans_id for batch in self.batches if batch.trans_id is not None]
+
+    @property
+    def succeeded(self):
+        return [batch for batch in self.batches if batch.succeeded]
+
+    @property
+    def failed(self):
+        return [batch for batch in self.batches if not batch.succeeded]
+
+    @property
+    def total(self):
+        return sum(batch.count for batch in self.batches)
+
+    def __repr__(self):
+        return '<%s batches=%d total=%d failed=%d>' % (
+            type(self).__name__, len(self.batches), self.total, len(self.failed))
+
+
+class BulkInsertResult(BulkResult):
+    pass
+
+
+class BulkRemoveResult(BulkResult):
+    pass
+
+
+def _iter_bulk(send, items, batch_size, workers, adaptive):
+    concurrency = adaptive_concurrency(adaptive, workers)
+    for index, batch, response, error in run_bounded(send, iter_batches(items, batch_size), workers,
+                                                     concurrency=concurrency):
+        yield BatchResult(index, batch, response, error, _limit(workers, concurrency))
+
+
+def iter_bulk_insert(api, images, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, adaptive=None, **kwargs):
+    def send(batch):
+        return api.insert(batch, **kwargs)
+
+    return _iter_bulk(send, images, batch_size, workers, adaptive)
+
+
+def bulk_insert(api, images, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, adaptive=None, **kwargs):
+    return BulkInsertResult(iter_bulk_insert(api, images, batch_size, workers, adaptive, **kwargs))
+
+
+def iter_bulk_remove(api, image_names, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, adaptive=None,
+                     **kwargs):
+    def send(batch):
+        return api.remove(batch, **kwargs)
+
+    return _iter_bulk(send, image_names, batch_size, workers, adaptive)
+
+
+def bulk_remove(api, image_names, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, adaptive=None, **kwargs):
+    return BulkRemoveResult(iter_bulk_remove(api, image_names, batch_size, workers, adaptive, **kwargs))
+
+
+class UploadSearchResult(object):
+
+    def __init__(self, index, image_path, response=None, error=None, concurrency=None):
+        self.index = index
+        self.image_path = image_path
+        self.response = response
+        self.error = error
+        self.concurrency = concurrency
+
+    @property
+    def succeeded(self):
+        return self.error is None and self.response is not None and self.response.get('status') == 'OK'
+
+    def __repr__(self):
+        return '<UploadSearchResult index=%d image_path=%s succeeded=%s>' % (
+            self.index, self.image_path, self.succeeded)
+
+
+def prefetch(executor, func, items, depth):
+    """
+        yield (item, future of func(item)) for every item, with the calls submitted to executor
+        `depth` items ahead of the consumer so they run while the earlier items are used.
+        the calls not handed out yet are cancelled when the generator is closed.
+    """
+    submitted = collections.deque()
+    try:
+        for item in items:
+            submitted.append((item, executor.submit(func, item)))
+            if len(submitted) > depth:
+                yield submitted.popleft()
+        while submitted:
+            yield submitted.popleft()
+    finally:
+        for _, future in submitted:
+            future.cancel()
+
+
+def _prepare(resize, fast, mmap_file, image_path):
+    """
+        prepare_upload of image_path and the seconds it took, run in the pool processes
+    """
+    from .image import prepare_upload
+    start = time.time()
+    return prepare_upload(image_path, resize, fast, mmap_file), time.time() - start
+
+
+def iter_batch_uploadsearch(api, image_paths, parameters, resize=None, workers=DEFAULT_WORKERS,
+                            processes=None, ordered=False, adaptive=None):
+    """
+        upload search every image of image_paths with the same query string `parameters`.
+        resizing and encoding runs in a pool of `processes` processes (one per cpu when None,
+        in the sending threads when 0), the uploads on `workers` threads. the images are handed
+        to the pool ahead of the uploads, both stages run at the same time. an
+        AdaptiveConcurrency only limits the uploads, not the resizing.
+    """
+    concurrency = adaptive_concurrency(adaptive, workers)
+    threads = concurrency.max_limit if concurrency is not None else workers
+
+    def upload(files, timings):
+        if concurrency is not None:
+            return api._response(concurrency.call(api._upload, parameters, files, timings))
+        return api._response(api._upload(parameters, files, timings))
+
+    if not resize or processes == 0:
+        def send(image_path):
+            files, elapsed = _prepare(resize, api.fast_resize, api.mmap_uploads, image_path)
+            return upload(files, {'preprocess': elapsed})
+
+        for index, image_path, response, error in run_bounded(send, image_paths, threads, ordered):
+            yield UploadSearchResult(index, image_path, response, error, _limit(workers, concurrency))
+        return
+
+    # imported here, they load multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import cpu_count
+
+    processes = processes or cpu_count()
+    process_pool = ProcessPoolExecutor(max_workers=processes)
+    # every process busy, and a resized image ready for every upload thread
+    prepared = prefetch(process_pool, functools.partial(_prepare, resize, api.fast_resize, False), image_paths,
+                        processes + threads)
+
+    def send(item):
+        files, elapsed = item[1].result()
+        return upload(files, {'preprocess': elapsed})
+
+    try:
+        for index, item, response, error in run_bounded(send, prepared, threads, ordered):
+            yield UploadSearchResult(index, item[0], response, error, _limit(workers, concurrency))
+    finally:
+        prepared.close()
+        process_pool.shutdown(wait=True)
+
+
+class RegionSearchResult(object):
+    """
+        outcome of the upload search of one region of an image. `detection` is the object of the
+        discoversearch response the region was detected as, None for a box given by the caller.
+    """
+
+    def __init__(self, index, box, response=None, error=None, detection=None):
+        self.index = index
+        self.box = box
+        self.response = response
+        self.error = error
+        self.detection = detection
+
+    @property
+    def type(self):
+        return self.detection.get('type') if self.detection else None
+
+    @property
+    def succeeded(self):
+        return self.error is None and self.response is not None and self.response.get('status') == 'OK'
+
+    def __repr__(self):
+        return '<RegionSearchResult index=%d box=%s type=%s succeeded=%s>' % (
+            self.index, self.box, self.type, self.succeeded)
+
+
+def search_regions(api, image_path, boxes, parameters, resize=None, workers=DEFAULT_WORKERS, detections=None):
+    """
+        upload search the regions `boxes` of image_path with the query string `parameters`.
+        the image is decoded once and every region is cropped from it locally, so every upload
+        is a small crop of the image. the searches run on `workers` threads, a RegionSearchResult
+        is returned for every box, in order.
+    """
+    from .image import crop_regions
+
+    boxes = list(boxes)
+    if not boxes:
+        return []
+    start = time.time()
+    regions = crop_regions(image_path, boxes, resize, api.fast_resize)
+    # the image is decoded for all of them, each region carries its share
+    preprocess = (time.time() - start) / len(regions)
+
+    def send(index):
+        return api._response(api._upload(parameters, regions[index], {'preprocess': preprocess}))
+
+    results = [None] * len(boxes)
+    for index, _, response, error in run_bounded(send, range(len(boxes)), workers):
+        detection = detections[index] if detections else None
+        results[index] = RegionSearchResult(index, boxes[index], response, error, detection)
+    return results
+
+
+def search_boxes(api, image_path, boxes, parameters, resize=None, workers=DEFAULT_WORKERS):
+    """
+        search_regions for boxes given by the caller, an OrderedDict of RegionSearchResult keyed by
+        the (x1, y1, x2, y2) tuple of every box. a box given twice is searched once.
+    """
+    from .image import check_box
+
+    boxes = list(collections.OrderedDict.fromkeys(check_box(box) for box in boxes))
+    results = search_regions(api, image_path, boxes, parameters, resize, workers)
+    return collections.OrderedDict((result.box, result) for result in results)
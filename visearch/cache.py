@@ -0,0 +1,284 @@
+import errno
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_MAXSIZE = 1024
+DEFAULT_TTL = 60
+
+
+class ResultCache(object):
+    """
+        thread-safe LRU cache of api responses with a time to live per endpoint.
+
+        maxsize: maximum number of responses kept, the least recently used one is evicted first
+        ttl: seconds a response stays valid, for endpoints not listed in `ttls`
+        ttls: endpoint -> seconds, e.g. {'search': 300, 'colorsearch': 3600}
+
+        cached responses are shared between callers and must not be modified.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, ttls=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.time():
+                # kept until evicted, as a fallback while the service is down
+                self.misses += 1
+                return None
+
+            # move to the most recently used end
+            del self._data[key]
+            self._data[key] = entry
+            self.hits += 1
+            return value
+
+    def get_stale(self, key):
+        """
+            the cached value even if it expired, without touching the stats or the lru order
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            return entry[1] if entry is not None else None
+
+    def set(self, key, value, endpoint=None, expires_at=None):
+        """
+            expires_at: when the value expires, instead of the ttl of the endpoint from now
+        """
+        if expires_at is None:
+            expires_at = time.time() + self.ttls.get(endpoint, self.ttl)
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (expires_at, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, endpoint=None):
+        """
+            drop every response, or only the ones of `endpoint`
+        """
+        with self._lock:
+            if endpoint is None:
+                self._data.clear()
+            else:
+                for key in [key for key in self._data if key[0] == endpoint]:
+                    del self._data[key]
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+            }
+
+
+DEFAULT_UPLOAD_MAXSIZE = 256
+DEFAULT_UPLOAD_TTL = 300
+DEFAULT_DISK_BYTES = 100 * pow(2, 20)
+
+# os.rename does not overwrite on windows
+_replace = getattr(os, 'replace', os.rename)
+
+
+def file_fingerprint(image_path, chunk_size=pow(2, 20)):
+    """
+        sha1 of the raw file bytes, the image is not decoded
+    """
+    digest = hashlib.sha1()
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def upload_cache_key(image_path, resize, parameters):
+    """
+        parameters is the canonical query string of the upload search (box, fl, fq, ...)
+    """
+    digest = hashlib.sha1(file_fingerprint(image_path).encode('ascii'))
+    digest.update(repr(resize).encode('utf-8'))
+    digest.update(parameters.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        # already pruned or replaced by another process sharing the directory
+        if e.errno != errno.ENOENT:
+            raise
+
+
+class DiskCache(object):
+    """
+        json files in `directory`, the oldest are deleted once they take more than max_bytes.
+
+        several processes may share the directory. a file another process removed meanwhile
+        is skipped, and a failed write only leaves the entry out of the cache.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_DISK_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _files(self):
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+
+    def _entries(self):
+        """
+            (mtime, size, path) of every file still there
+        """
+        entries = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                entry = json.loads(f.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            return None
+        if entry['expires_at'] <= time.time():
+            return None
+        return entry
+
+    def set(self, key, entry):
+        contents = json.dumps(entry).encode('utf-8')
+        path = self._path(key)
+        # unique across the threads of every process sharing the directory
+        tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.current_thread().ident)
+        with self._lock:
+            try:
+                try:
+                    old_size = os.path.getsize(path)
+                except OSError:
+                    old_size = 0
+                with open(tmp_path, 'wb') as f:
+                    f.write(contents)
+                _replace(tmp_path, path)
+                self._size += len(contents) - old_size
+                if self._size > self.max_bytes:
+                    self._prune()
+            except (IOError, OSError):
+                # a full or unwritable disk must not fail the search that was answered
+                try:
+                    _remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _prune(self):
+        entries = sorted(self._entries())
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_bytes:
+                break
+            self._size -= size
+            _remove(path)
+
+    def clear(self):
+        with self._lock:
+            for path in self._files():
+                _remove(path)
+            self._size = 0
+
+
+class UploadCache(object):
+    """
+        results of uploadsearch keyed on the image content together with the resize
+        setting and the search parameters, so a repeated upload of the same image is
+        answered without decoding, resizing or uploading it.
+
+        maxsize and ttl bound the in-memory LRU, `directory` adds a second level on disk
+        bounded to `max_disk_bytes`. `bytes_saved` counts the upload bytes of every hit.
+    """
+
+    def __init__(self, maxsize=DEFAULT_UPLOAD_MAXSIZE, ttl=DEFAULT_UPLOAD_TTL, directory=None,
+                 max_disk_bytes=DEFAULT_DISK_BYTES):
+        self.ttl = ttl
+        self.memory = ResultCache(maxsize, ttl)
+        self.disk = DiskCache(directory, max_disk_bytes) if directory else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def get(self, key):
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                # only as long as it has left on disk
+                self.memory.set(key, entry, expires_at=entry['expires_at'])
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.bytes_saved += entry['upload_size']
+        return entry['result']
+
+    def set(self, key, result, upload_size):
+        entry = {
+            'expires_at': time.time() + self.ttl,
+            'upload_size': upload_size,
+            'result': result,
+        }
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+
+    def invalidate(self):
+        self.memory.invalidate()
+        if self.disk is not None:
+            self.disk.clear()
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bytes_saved': self.bytes_saved,
+                'size': len(self.memory),
+            }
@@ -1,22 +1,130 @@
 import os
-try:
-    from StringIO import StringIO
-except ImportError:
-    from io import BytesIO as StringIO
-from PIL import Image
-from requests.auth import HTTPBasicAuth
+import threading
+import time
 from six.moves.urllib.parse import quote
-from .bind import bind_method, build_parameters, build_path
-from .bind import ViSearchClientError
+from .bind import bind_method, build_parameters, build_path, canonical_parameters
+from .bind import ViSearchClientError, check_required_fields, iter_insert_fields
+from .cache import ResultCache, upload_cache_key
+from .breaker import CircuitBreakers, CircuitOpenError
+from .bulk import (bulk_insert, iter_bulk_insert, bulk_remove, iter_bulk_remove, iter_batch_uploadsearch,
+                   search_boxes, search_regions, DEFAULT_BATCH_SIZE, DEFAULT_WORKERS)
+from .multipart import FilePart, FormBody, MappedFilePart
+from .pagination import ResultIterator
+from .response import SearchResponse, SearchResult
+from .retry import RetryPolicy
+from .singleflight import SingleFlight
+from .status import track_insert_status
+from .streaming import StreamingResponse, DEFAULT_CHUNK_SIZE
+from .pool import DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE
+
+
+CACHEABLE_ENDPOINTS = ('search', 'recommendation', 'colorsearch')
+
+
+def search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl):
+    parameters = {
+        'page': page,
+        'limit': limit,
+        'score_max': score_max,
+        'score_min': score_min,
+        'get_all_fl': get_all_fl
+    }
+    if fl:
+        parameters.update({'fl': fl})
+    if fq:
+        parameters.update({'fq': fq})
+    if score:
+        parameters.update({'score': score})
+    return parameters
+
+
+def box_parameter(box):
+    if (type(box).__name__ == 'list' or type(box).__name__ == 'tuple') and len(box) == 4:
+        return ','.join(map(str, box))
+    else:
+        raise ViSearchClientError("invalid box: {0}".format(box))
+
+
+def discoversearch_validation(width, height, size):
+    # if width < 100 or height < 100:
+    #     raise ViSearchClientError("width and height of the image must be larger than 100px")
+
+    if size > 10 * pow(2, 20): # larger than 10MB
+        raise ViSearchClientError("file size should not larger than 10MB")
 
 
 class ViSearchAPI(object):
-    def __init__(self, access_key, secret_key, host="http://visearch.visenze.com/"):
+    def __init__(self, access_key, secret_key, host="http://visearch.visenze.com/",
+                 pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False,
+                 timeout=30, cache=None, upload_cache=None, fast_resize=False, retry=None, circuit_breaker=None,
+                 coalesce=False, result_objects=False, hooks=None, mmap_uploads=False, rate_limiter=None,
+                 transport=None):
         # self.host = "http://visearch.visenze.com/"
         self.host = host
+        self.timeout = timeout
         self.access_key = access_key
         self.secret_key = secret_key
-        self.auth_info = HTTPBasicAuth(self.access_key, self.secret_key)
+        # basic auth, as requests takes it
+        self.auth_info = (self.access_key, self.secret_key)
+        # a Transport sending the http requests, requests with the pool settings above when None
+        self._transport = transport
+        self._pool_settings = {'pool_connections': pool_connections, 'pool_maxsize': pool_maxsize,
+                               'pool_block': pool_block}
+        self._transport_lock = threading.Lock()
+        # `cache=True` for a ResultCache with default settings
+        self.cache = ResultCache() if cache is True else cache
+        self.upload_cache = upload_cache
+        # decode-time downscaling keeping the aspect ratio instead of stretching to the resize box
+        self.fast_resize = fast_resize
+        # `retry=True` for a RetryPolicy with default settings
+        self.retry_policy = RetryPolicy() if retry is True else retry
+        # `circuit_breaker=True` for CircuitBreakers with default settings
+        self.circuit_breakers = CircuitBreakers() if circuit_breaker is True else circuit_breaker
+        # identical searches running at the same time share one request
+        self.singleflight = SingleFlight() if coalesce else None
+        # search methods return SearchResponse objects instead of dicts
+        self.result_objects = result_objects
+        # RequestHook objects, called before and after every http request
+        self.hooks = list(hooks or [])
+        # images sent without resizing are read from a memory map, without copies
+        self.mmap_uploads = mmap_uploads
+        # a RateLimiter keeping the requests within the account's qps, may be shared by several clients
+        self.rate_limiter = rate_limiter
+
+    @property
+    def transport(self):
+        # the default transport, and with it requests, is only loaded by the first request
+        if self._transport is None:
+            with self._transport_lock:
+                if self._transport is None:
+                    from .transport import RequestsTransport
+                    self._transport = RequestsTransport(**self._pool_settings)
+        return self._transport
+
+    @property
+    def session(self):
+        # the requests session of the default transport
+        return getattr(self.transport, 'session', None)
+
+    @property
+    def pool_stats(self):
+        return self.transport.stats
+
+    def invalidate_cache(self, endpoint=None):
+        if self.cache is not None:
+            self.cache.invalidate(endpoint)
+        if self.upload_cache is not None and endpoint in (None, 'uploadsearch'):
+            self.upload_cache.invalidate()
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def insert(self, images, **kwargs):
         if type(images).__name__ != 'list':
@@ -25,14 +133,31 @@ class ViSearchAPI(object):
         path = 'insert'
         required_fields = ['im_name', 'im_url']
         method = 'POST'
-        raw_parameters = {
-            'images': images,
-        }
-        data = build_parameters(path, raw_parameters, required_fields)
-        data.update(kwargs)
+        check_required_fields(images, required_fields)
+        # encoded while it is sent, without a dict of every field or a copy of the whole body
+        data = FormBody(lambda: iter_insert_fields(images, kwargs))
         resp = bind_method(self, path, method, data=data)
+        self.invalidate_cache()
         return resp
 
+    def bulk_insert(self, images, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, adaptive=None, **kwargs):
+        """
+            insert images from any iterable in batches of `batch_size`, with `workers` insert calls
+            running at the same time. returns a BulkInsertResult with the trans_id and outcome of
+            every batch, a failed batch does not stop the others.
+
+            adaptive: True, or an AdaptiveConcurrency, to adjust the number of calls in flight
+            to the load of the service, starting from `workers`
+        """
+        return bulk_insert(self, images, batch_size, workers, adaptive, **kwargs)
+
+    def iter_bulk_insert(self, images, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, adaptive=None,
+                         **kwargs):
+        """
+            like bulk_insert, but yields a BatchResult as soon as each batch completes
+        """
+        return iter_bulk_insert(self, images, batch_size, workers, adaptive, **kwargs)
+
     def update(self, images, **kwargs):
         if type(images).__name__ != 'list':
             images = [images, ]
@@ -40,12 +165,10 @@ class ViSearchAPI(object):
         path = 'insert'
         required_fields = ['im_name']
         method = 'POST'
-        raw_parameters = {
-            'images': images,
-        }
-        data = build_parameters(path, raw_parameters, required_fields)
-        data.update(kwargs)
+        check_required_fields(images, required_fields)
+        data = FormBody(lambda: iter_insert_fields(images, kwargs))
         resp = bind_method(self, path, method, data=data)
+        self.invalidate_cache()
         return resp
 
     def remove(self, image_names, **kwargs):
@@ -56,8 +179,23 @@ class ViSearchAPI(object):
         data = build_parameters(path, image_names)
         data.update(kwargs)
         resp = bind_method(self, path, method, data=data)
+        self.invalidate_cache()
         return resp
 
+    def bulk_remove(self, image_names, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, adaptive=None,
+                    **kwargs):
+        """
+            remove image names from any iterable in batches, like bulk_insert. returns a BulkRemoveResult
+        """
+        return bulk_remove(self, image_names, batch_size, workers, adaptive, **kwargs)
+
+    def iter_bulk_remove(self, image_names, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, adaptive=None,
+                         **kwargs):
+        """
+            like bulk_remove, but yields a BatchResult as soon as each batch completes
+        """
+        return iter_bulk_remove(self, image_names, batch_size, workers, adaptive, **kwargs)
+
     def insert_status(self, trans_id, error_page=None, error_limit=None):
         path = 'insert/status/{trans_id}'
         path_parameters = {
@@ -68,53 +206,65 @@ class ViSearchAPI(object):
         if error_limit:
             path_parameters['error_limit'] = error_limit
         path = build_path(path, path_parameters)
-        resp = bind_method(self, path, 'GET')
+        # build_path consumes trans_id, what is left goes into the query string
+        resp = bind_method(self, path, 'GET', path_parameters)
+        return resp
+
+    def track_insert_status(self, trans_ids, **kwargs):
+        """
+            poll the status of many insert transactions concurrently, see InsertStatusTracker
+            for the options. `.wait()` on the returned tracker gives an InsertStatusReport,
+            `.futures` has one future per trans_id.
+        """
+        return track_insert_status(self, trans_ids, **kwargs)
+
+    def _response(self, resp):
+        if self.result_objects:
+            return SearchResponse(resp)
         return resp
 
     def _search(self, path, parameters, **kwargs):
         parameters = build_parameters(path, parameters, **kwargs)
-        resp = bind_method(self, path, 'GET', parameters)
+        return self._response(self._cached_get(path, parameters))
+
+    def _cached_get(self, path, parameters):
+        key = (path, canonical_parameters(parameters))
+        cacheable = self.cache is not None and path in CACHEABLE_ENDPOINTS
+        if cacheable:
+            resp = self.cache.get(key)
+            if resp is not None:
+                return resp
+
+        try:
+            resp = self._get(key, path, parameters)
+        except CircuitOpenError:
+            # an expired result beats no result while the endpoint is down
+            resp = self.cache.get_stale(key) if cacheable else None
+            if resp is None:
+                raise
+            return resp
+        if cacheable and resp.get('status') == 'OK':
+            self.cache.set(key, resp, path)
         return resp
 
+    def _get(self, key, path, parameters):
+        if self.singleflight is None:
+            return bind_method(self, path, 'GET', parameters)
+        return self.singleflight.do(key, bind_method, self, path, 'GET', parameters)
+
     def search(self, im_name, page=1, limit=30, fl=None, fq=None, score=False, score_max=1, score_min=0, get_all_fl=False, **kwargs):
-        parameters = {
-            'im_name': im_name,
-            'page': page,
-            'limit': limit,
-            'score_max': score_max,
-            'score_min': score_min,
-            'get_all_fl': get_all_fl
-        }
-        if fl:
-            parameters.update({'fl': fl})
-        if fq:
-            parameters.update({'fq': fq})
-        if score:
-            parameters.update({'score': score})
+        parameters = search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl)
+        parameters['im_name'] = im_name
 
         path = 'search'
         return self._search(path, parameters, **kwargs)
 
     def recommendation(self, im_name, page=1, limit=30, fl=None, fq=None, score=False, score_max=1, score_min=0, get_all_fl=False, **kwargs):
-        parameters = {
-            'im_name': im_name,
-            'page': page,
-            'limit': limit,
-            'score_max': score_max,
-            'score_min': score_min,
-            'get_all_fl': get_all_fl
-        }
-        if fl:
-            parameters.update({'fl': fl})
-        if fq:
-            parameters.update({'fq': fq})
-        if score:
-            parameters.update({'score': score})
+        parameters = search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl)
+        parameters['im_name'] = im_name
 
         path = 'recommendation'
-        parameters = build_parameters(path, parameters, **kwargs)
-        resp = bind_method(self, path, 'GET', parameters)
-        return resp
+        return self._search(path, parameters, **kwargs)
 
     def colorsearch(self, color, page=1, limit=30, fl=None, fq=None, score=False, score_max=1, score_min=0, get_all_fl=False, **kwargs):
         # _rgbstr = re.compile(r'^(?:[0-9a-fA-F]{3}){1,2}$')
@@ -122,80 +272,60 @@ class ViSearchAPI(object):
             color = color[1:]
         # if not bool(_rgbstr.match(color)):
         #     raise ViSearchClientError("the color {} is not in 6 character hex format".format(color))
-        parameters = {
-            'color': color,
-            'page': page,
-            'limit': limit,
-            'score_max': score_max,
-            'score_min': score_min,
-            'get_all_fl': get_all_fl
-        }
-        if fl:
-            parameters.update({'fl': fl})
-        if fq:
-            parameters.update({'fq': fq})
-        if score:
-            parameters.update({'score': score})
+        parameters = search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl)
+        parameters['color'] = color
 
         path = 'colorsearch'
         return self._search(path, parameters, **kwargs)
 
-    def _read_image(self, image_path, resize_settings, validation_func=None):
-        image = Image.open(image_path)
+    def _stream(self, path, method, key, parameters=None, data=None, files=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                timings=None):
+        resp = bind_method(self, path, method, parameters, data=data, files=files, stream=True, timings=timings)
+        wrap = SearchResult if self.result_objects and key == 'result' else None
+        return StreamingResponse(resp.iter_content(chunk_size), key, wrap, resp.close)
 
-        if resize_settings:
-            if resize_settings == 'STANDARD':
-                dimensions, quality = (512, 512), 75
-            elif resize_settings == 'HIGH':
-                dimensions, quality = (1024, 1024), 75
-            else:
-                resize_type_name = type(resize_settings).__name__
-                if (resize_type_name == 'list' or resize_type_name == 'tuple') and len(resize_settings) == 3:
-                    dimensions, quality = (resize_settings[0], resize_settings[1]), resize_settings[2]
-                else:
-                    raise ViSearchClientError("invalid resize settings: {0}".format(resize_settings))
-
-            image = image.resize(dimensions, Image.ANTIALIAS)
-
-            output = StringIO()
-            image.save(output, 'JPEG', quality=quality)
-            contents = output.getvalue()
-            size = len(contents)
-            output.close()
-            fp = (image_path, contents)
-            files = {'image': fp}
-        else:
-            filename = os.path.basename(image_path)
-            files = {'image': (filename, open(image_path, 'rb'), 'application/octet-stream')}
-            size = os.path.getsize(image_path)
+    def stream_search(self, im_name, page=1, limit=30, fl=None, fq=None, score=False, score_max=1, score_min=0, get_all_fl=False,
+                      chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+        """
+            like search, but returns a StreamingResponse yielding every result as soon as it
+            is downloaded, the other fields of the response are in its `fields`
+        """
+        parameters = search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl)
+        parameters['im_name'] = im_name
+        parameters = build_parameters('search', parameters, **kwargs)
+        return self._stream('search', 'GET', 'result', parameters, chunk_size=chunk_size)
+
+    def _iter_results(self, method, query, limit, max_results, stop_when, prefetch, kwargs):
+        def fetch(page):
+            return method(query, page=page, limit=limit, **kwargs)
+
+        return iter(ResultIterator(fetch, kwargs.pop('page', 1), limit, max_results,
+                                   kwargs.get('score_min'), stop_when, prefetch))
+
+    def iter_search(self, im_name, limit=30, max_results=None, stop_when=None, prefetch=True, **kwargs):
+        """
+            iterate over search results across pages, fetching the next page in the background.
+            stops after `max_results` results, below `score_min` or when stop_when(result) is true,
+            other keyword arguments are the ones of search.
+        """
+        return self._iter_results(self.search, im_name, limit, max_results, stop_when, prefetch, kwargs)
 
-        width, height = image.size
-        if validation_func:
-            validation_func(width, height, size)
+    def iter_recommendation(self, im_name, limit=30, max_results=None, stop_when=None, prefetch=True, **kwargs):
+        return self._iter_results(self.recommendation, im_name, limit, max_results, stop_when, prefetch, kwargs)
 
-        image.close()
+    def iter_colorsearch(self, color, limit=30, max_results=None, stop_when=None, prefetch=True, **kwargs):
+        return self._iter_results(self.colorsearch, color, limit, max_results, stop_when, prefetch, kwargs)
 
-        return files
+    def _read_image(self, image_path, resize_settings, validation_func=None):
+        # Pillow is only imported by the first image read
+        from .image import read_image
+        return read_image(image_path, resize_settings, validation_func, fast=self.fast_resize,
+                          mmap_file=self.mmap_uploads)
 
     def uploadsearch(self, image_path=None, image_url=None, box=None, page=1, limit=30, fl=None, fq=None, score=False, score_max=1, score_min=0, resize=None, get_all_fl=False, **kwargs):
-        parameters = {
-            'page': page,
-            'limit': limit,
-            'score_max': score_max,
-            'score_min': score_min,
-            'get_all_fl': get_all_fl
-        }
-        if fl:
-            parameters.update({'fl': fl})
-        if fq:
-            parameters.update({'fq': fq})
-        if score:
-            parameters.update({'score': score})
+        parameters = search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl)
         if box:
-            if (type(box).__name__ == 'list' or type(box).__name__ == 'tuple') and len(box) == 4:
-                parameters.update({'box': ','.join(map(str, box))})
-            else:
-                raise ViSearchClientError("invalid box: {0}".format(box))
+            parameters.update({'box': box_parameter(box)})
 
         path = 'uploadsearch'
 
@@ -205,46 +335,132 @@ class ViSearchAPI(object):
             parameters.update({'im_url': quote(image_url)})
             return self._search(path, parameters, **kwargs)
         else:
+            parameters = build_parameters(path, parameters, **kwargs)
+            if self.upload_cache is not None:
+                cache_key = upload_cache_key(image_path, resize, canonical_parameters(parameters))
+                resp = self.upload_cache.get(cache_key)
+                if resp is not None:
+                    return self._response(resp)
+
+            start = time.time()
             if resize:
                 files = self._read_image(image_path, resize)
+                upload_size = len(files['image'][1])
             else:
                 filename = os.path.basename(image_path)
-                files = {'image': (filename, open(image_path, 'rb'), 'application/octet-stream')}
-            parameters = build_parameters(path, parameters, **kwargs)
-            return bind_method(self, path, 'POST', parameters, files=files)
+                part = MappedFilePart(image_path) if self.mmap_uploads else FilePart(image_path)
+                files = {'image': (filename, part, 'application/octet-stream')}
+                upload_size = len(part)
+            resp = self._upload(parameters, files, {'preprocess': time.time() - start})
 
-    def discoversearch(self, im_url=None, image=None, im_id=None, detection="all",
-                       detection_limit=5, detection_sensitivity="low", result_limit=10, box=None, **kwargs):
+            if self.upload_cache is not None and resp.get('status') == 'OK':
+                self.upload_cache.set(cache_key, resp, upload_size)
+            return self._response(resp)
+
+    def _upload(self, parameters, files, timings=None):
+        return bind_method(self, 'uploadsearch', 'POST', parameters, files=files, timings=timings)
+
+    def batch_uploadsearch(self, image_paths, box=None, page=1, limit=30, fl=None, fq=None, score=False, score_max=1, score_min=0, resize=None, get_all_fl=False,
+                           workers=DEFAULT_WORKERS, processes=None, ordered=False, adaptive=None, **kwargs):
+        """
+            upload search many local images with the same search parameters. images are resized
+            in a process pool and uploaded by `workers` threads; an UploadSearchResult is yielded
+            for every image as it completes, or in input order when `ordered`. a failing image is
+            reported in its result and does not stop the others. `adaptive` as in bulk_insert.
+        """
+        parameters = search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl)
+        if box:
+            parameters.update({'box': box_parameter(box)})
+        parameters = build_parameters('uploadsearch', parameters, **kwargs)
+        return iter_batch_uploadsearch(self, image_paths, parameters, resize, workers, processes, ordered, adaptive)
+
+    def _discoversearch_request(self, im_url, image, im_id, detection, detection_limit, detection_sensitivity,
+                                result_limit, box, kwargs):
         parameters = {
             "detection_limit": detection_limit,
             "detection_sensitivity": detection_sensitivity,
             "result_limit": result_limit,
             "detection": detection
         }
-        path = 'discoversearch'
         files = None
+        timings = {}
 
         if box:
-            if (type(box).__name__ == 'list' or type(box).__name__ == 'tuple') and len(box) == 4:
-                parameters.update({'box': ','.join(map(str, box))})
-            else:
-                raise ViSearchClientError("invalid box: {0}".format(box))
+            parameters.update({'box': box_parameter(box)})
 
         if not (im_url or image or im_id):
             raise ViSearchClientError("at least one of `im_url`, `image` or `im_id` must exists")
         elif im_url:
             parameters['im_url'] = im_url
         elif image:
-            def validation(width, height, size):
-                # if width < 100 or height < 100:
-                #     raise ViSearchClientError("width and height of the image must be larger than 100px")
-
-                if size > 10 * pow(2, 20): # larger than 10MB
-                    raise ViSearchClientError("file size should not larger than 10MB")
-
-            files = self._read_image(image, None, validation_func=validation)
+            start = time.time()
+            files = self._read_image(image, None, validation_func=discoversearch_validation)
+            timings['preprocess'] = time.time() - start
         else:
             parameters['im_id'] = im_id
 
         parameters.update(kwargs)
-        return bind_method(self, path, 'POST', data=parameters, files=files)
\ No newline at end of file
+        return parameters, files, timings
+
+    def discoversearch(self, im_url=None, image=None, im_id=None, detection="all",
+                       detection_limit=5, detection_sensitivity="low", result_limit=10, box=None, **kwargs):
+        path = 'discoversearch'
+        parameters, files, timings = self._discoversearch_request(im_url, image, im_id, detection, detection_limit,
+                                                                  detection_sensitivity, result_limit, box, kwargs)
+        return bind_method(self, path, 'POST', data=parameters, files=files, timings=timings)
+
+    def stream_discoversearch(self, im_url=None, image=None, im_id=None, detection="all", detection_limit=5,
+                              detection_sensitivity="low", result_limit=10, box=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                              **kwargs):
+        """
+            like discoversearch, but returns a StreamingResponse yielding every detected object
+            with its results as soon as it is downloaded
+        """
+        parameters, files, timings = self._discoversearch_request(im_url, image, im_id, detection, detection_limit,
+                                                                  detection_sensitivity, result_limit, box, kwargs)
+        return self._stream('discoversearch', 'POST', 'objects', data=parameters, files=files, chunk_size=chunk_size,
+                            timings=timings)
+
+    def uploadsearch_boxes(self, image_path, boxes, page=1, limit=30, fl=None, fq=None, score=False, score_max=1,
+                           score_min=0, resize=None, get_all_fl=False, workers=DEFAULT_WORKERS, **kwargs):
+        """
+            upload search several regions of the local image image_path, (x1, y1, x2, y2) boxes in
+            pixels of the original image. unlike uploadsearch with `box`, the image is decoded once,
+            every region is cropped (and resized with `resize`) locally and only the crop is sent;
+            the searches run at the same time on `workers` threads.
+
+            returns an OrderedDict mapping the box, as a tuple of ints, to its RegionSearchResult,
+            in the order of `boxes`. a failed search does not stop the others.
+        """
+        parameters = search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl)
+        parameters = build_parameters('uploadsearch', parameters, **kwargs)
+        return search_boxes(self, image_path, boxes, parameters, resize, workers)
+
+    def search_objects(self, image, objects=None, detection="all", detection_limit=5, detection_sensitivity="low",
+                       page=1, limit=30, fl=None, fq=None, score=False, score_max=1, score_min=0, resize=None,
+                       get_all_fl=False, workers=DEFAULT_WORKERS, **kwargs):
+        """
+            upload search every object detected in the local image `image`, e.g. to shop the look.
+            the image is decoded once, the objects are cropped from it locally and searched at
+            the same time on `workers` threads. returns a RegionSearchResult per object, in the
+            order of the detections, with the object in its `detection`; a failed search does
+            not stop the others.
+
+            objects: the discoversearch response of the image, or its `objects`. when None the
+                image is sent to discoversearch first, with detection, detection_limit and
+                detection_sensitivity.
+            resize: the size every crop is shrunk to, as in uploadsearch
+        """
+        if objects is None:
+            # the results of discoversearch itself are not used, only its detections
+            objects = self.discoversearch(image=image, detection=detection, detection_limit=detection_limit,
+                                          detection_sensitivity=detection_sensitivity, result_limit=1)
+        if isinstance(objects, dict):
+            if objects.get('status', 'OK') != 'OK':
+                raise ViSearchClientError("discoversearch failed: {0}".format(objects.get('error')))
+            objects = objects.get('objects') or []
+
+        parameters = search_parameters(page, limit, fl, fq, score, score_max, score_min, get_all_fl)
+        parameters = build_parameters('uploadsearch', parameters, **kwargs)
+        return search_regions(self, image, [obj['box'] for obj in objects], parameters, resize, workers,
+                              detections=objects)
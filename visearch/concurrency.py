@@ -0,0 +1,111 @@
+import threading
+import time
+from .bind import ViSearchClientError, is_failure
+from .breaker import CircuitOpenError
+
+
+DEFAULT_MAX_LIMIT = 32
+
+
+class AdaptiveConcurrency(object):
+    """
+        how many requests may be in flight, adjusted to the load of the service with additive
+        increase and multiplicative decrease, as tcp congestion control does.
+
+        the limit grows by one once `limit` healthy requests have completed, about once per
+        round trip. it is multiplied by `backoff` when a request fails because the service is
+        overloaded: timeouts, connection errors, 429, 5xx and an open circuit. other errors
+        neither grow nor cut the limit, and their latency is not averaged. the requests that
+        were already in flight when the limit was cut do not cut it again. a request slower than
+        `latency_tolerance` times the average latency does not count as healthy, the limit stops
+        growing while the latency rises.
+
+        one instance may be shared by several bulk calls, `limit` and `stats` can be read at any
+        time.
+    """
+
+    def __init__(self, initial=4, min_limit=1, max_limit=DEFAULT_MAX_LIMIT, backoff=0.5, latency_tolerance=2.0):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ViSearchClientError("invalid concurrency limits: {0} <= {1} <= {2}".format(
+                min_limit, initial, max_limit))
+        if not 0 < backoff < 1:
+            raise ViSearchClientError("invalid backoff: {0}".format(backoff))
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.increases = 0
+        self.decreases = 0
+        self._limit = float(initial)
+        self._healthy = 0
+        self._latency = None
+        # bumped by every cut, a request started before it is not counted again
+        self._generation = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def acquire(self):
+        """
+            wait for a free slot, returns the token to release it with
+        """
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+            return time.time(), self._generation
+
+    def release(self, token, overloaded=False, failed=False):
+        """
+            overloaded: the request failed because of the load of the service
+            failed: it failed for another reason, e.g. a bad request, it only frees the slot
+        """
+        started, generation = token
+        latency = time.time() - started
+        with self._condition:
+            self.in_flight -= 1
+            if overloaded:
+                if generation == self._generation:
+                    self._limit = max(self._limit * self.backoff, self.min_limit)
+                    self._generation += 1
+                    self._healthy = 0
+                    self.decreases += 1
+            elif not failed:
+                slow = self._latency is not None and latency > self.latency_tolerance * self._latency
+                # a lasting change of latency becomes the new normal
+                self._latency = latency if self._latency is None else 0.9 * self._latency + 0.1 * latency
+                if not slow:
+                    self._healthy += 1
+                    if self._healthy >= self.limit and self._limit < self.max_limit:
+                        self._limit = min(self._limit + 1, self.max_limit)
+                        self._healthy = 0
+                        self.increases += 1
+            self._condition.notify_all()
+
+    def call(self, func, *args, **kwargs):
+        token = self.acquire()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.release(token, is_failure(e) or isinstance(e, CircuitOpenError), failed=True)
+            raise
+        except BaseException:
+            self.release(token, failed=True)
+            raise
+        self.release(token)
+        return result
+
+    @property
+    def stats(self):
+        with self._condition:
+            return {
+                'limit': self.limit,
+                'in_flight': self.in_flight,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'latency': self._latency,
+            }
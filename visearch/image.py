@@ -0,0 +1,191 @@
+import os
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+from PIL import Image
+from .bind import ViSearchClientError
+from .multipart import FilePart, MappedFilePart
+from .probe import ImageInfo, probe_file
+
+
+def resize_dimensions(resize_settings):
+    if resize_settings == 'STANDARD':
+        return (512, 512), 75
+    elif resize_settings == 'HIGH':
+        return (1024, 1024), 75
+    else:
+        resize_type_name = type(resize_settings).__name__
+        if (resize_type_name == 'list' or resize_type_name == 'tuple') and len(resize_settings) == 3:
+            return (resize_settings[0], resize_settings[1]), resize_settings[2]
+        else:
+            raise ViSearchClientError("invalid resize settings: {0}".format(resize_settings))
+
+
+def read_file(image_path):
+    """
+        the raw image as multipart file tuple, with the content already read into memory
+    """
+    filename = os.path.basename(image_path)
+    with open(image_path, 'rb') as f:
+        return {'image': (filename, f.read(), 'application/octet-stream')}
+
+
+def _encode_jpeg(image, quality):
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = StringIO()
+    image.save(output, 'JPEG', quality=quality)
+    # hand the encoder's own buffer to the upload instead of copying it out
+    if hasattr(output, 'getbuffer'):
+        return output.getbuffer()
+    return output.getvalue()
+
+
+def fast_resize(image, dimensions, quality):
+    """
+        shrink `image` to fit within dimensions keeping its aspect ratio.
+
+        jpeg files are decoded directly at a reduced scale (draft mode). a jpeg that already
+        fits is not passed here, read_image sends it as is.
+        returns (image, contents)
+    """
+    if image.format == 'JPEG':
+        image.draft('RGB', dimensions)
+    image.thumbnail(dimensions, Image.LANCZOS)
+    return image, _encode_jpeg(image, quality)
+
+
+def check_box(box):
+    """
+        box as an (x1, y1, x2, y2) tuple of ints
+    """
+    try:
+        x1, y1, x2, y2 = [int(value) for value in box]
+    except (TypeError, ValueError):
+        raise ViSearchClientError("invalid box: {0}".format(box))
+    if x2 <= x1 or y2 <= y1:
+        raise ViSearchClientError("invalid box: {0}".format(box))
+    return x1, y1, x2, y2
+
+
+def crop_regions(image_path, boxes, resize_settings=None, fast=False):
+    """
+        decode image_path once and cut every box of `boxes`, (x1, y1, x2, y2) in pixels of the
+        image, out of it as its own jpeg. with resize_settings every crop is shrunk to fit them
+        keeping its aspect ratio, without it is encoded at quality 95 in full size.
+        returns the multipart files of the boxes, in order.
+
+        fast: jpeg files are decoded directly at the lowest scale that still leaves every crop
+        as large as resize_settings.
+    """
+    boxes = [check_box(box) for box in boxes]
+    dimensions, quality = resize_dimensions(resize_settings) if resize_settings else (None, 95)
+    filename = os.path.basename(image_path)
+
+    image = Image.open(image_path)
+    try:
+        width, height = image.size
+        if fast and dimensions and image.format == 'JPEG' and boxes:
+            reduction = min(min(float(x2 - x1) / dimensions[0], float(y2 - y1) / dimensions[1])
+                            for x1, y1, x2, y2 in boxes)
+            if reduction > 1:
+                image.draft('RGB', (int(width / reduction), int(height / reduction)))
+        image.load()
+        scale_x = float(image.size[0]) / width
+        scale_y = float(image.size[1]) / height
+
+        regions = []
+        for x1, y1, x2, y2 in boxes:
+            left, top = max(int(x1 * scale_x), 0), max(int(y1 * scale_y), 0)
+            right, bottom = min(int(round(x2 * scale_x)), image.size[0]), min(int(round(y2 * scale_y)), image.size[1])
+            if right <= left or bottom <= top:
+                raise ViSearchClientError("box {0} is outside of the image".format((x1, y1, x2, y2)))
+            region = image.crop((left, top, right, bottom))
+            if dimensions:
+                region.thumbnail(dimensions, Image.LANCZOS)
+            regions.append({'image': (filename, _encode_jpeg(region, quality))})
+        return regions
+    finally:
+        image.close()
+
+
+def image_info(image_path, fileobj=None, size=None):
+    """
+        ImageInfo of image_path from its header, read from fileobj when given. jpeg, png and webp
+        headers are parsed directly, other formats by Pillow, which only reads the header as well.
+    """
+    if fileobj is None:
+        # opened here, a missing file raises IOError on python 2 too
+        with open(image_path, 'rb') as f:
+            return image_info(image_path, f, os.fstat(f.fileno()).st_size)
+    if size is None:
+        size = os.path.getsize(image_path)
+    info = probe_file(fileobj, size)
+    if info is None:
+        fileobj.seek(0)
+        image = Image.open(fileobj)
+        info = ImageInfo(image.format, image.size[0], image.size[1], size)
+        image.close()
+    return info
+
+
+def read_image(image_path, resize_settings, validation_func=None, fast=False, mmap_file=False):
+    """
+        validation_func is called with the width, height and size in bytes of the file from
+        its header, before the image is decoded or read.
+
+        mmap_file: without resize, send the file from a memory map. the image header is
+        then parsed from the same map, the file is only read once.
+    """
+    part = None
+    if mmap_file and not resize_settings:
+        part = MappedFilePart(image_path)
+        info = image_info(image_path, part.reader(), part.size)
+    else:
+        info = image_info(image_path)
+
+    if validation_func:
+        try:
+            validation_func(info.width, info.height, info.size)
+        except Exception:
+            if part is not None:
+                part.close()
+            raise
+
+    if not resize_settings:
+        filename = os.path.basename(image_path)
+        return {'image': (filename, part or FilePart(image_path), 'application/octet-stream')}
+
+    dimensions, quality = resize_dimensions(resize_settings)
+    if fast and info.format == 'JPEG' and info.width <= dimensions[0] and info.height <= dimensions[1]:
+        # fits already, sent as is without Pillow
+        with open(image_path, 'rb') as f:
+            return {'image': (image_path, f.read())}
+
+    source = Image.open(image_path)
+    try:
+        if fast:
+            _, contents = fast_resize(source, dimensions, quality)
+        else:
+            image = source.resize(dimensions, Image.LANCZOS)
+
+            output = StringIO()
+            image.save(output, 'JPEG', quality=quality)
+            contents = output.getvalue()
+            output.close()
+    finally:
+        source.close()
+    return {'image': (image_path, contents)}
+
+
+def prepare_upload(image_path, resize_settings=None, fast=False, mmap_file=False):
+    """
+        the multipart file of image_path as plain bytes, or a FilePart read when it is sent,
+        so it can be returned from a process pool
+    """
+    if not resize_settings:
+        part = MappedFilePart(image_path) if mmap_file else FilePart(image_path)
+        return {'image': (os.path.basename(image_path), part, 'application/octet-stream')}
+    filename, contents = read_image(image_path, resize_settings, fast=fast)['image']
+    return {'image': (filename, bytes(contents))}
@@ -0,0 +1,153 @@
+import math
+import threading
+import time
+from .retry import endpoint_of
+
+
+# in request order: image reading/resizing, waiting on the rate limiter, building the request
+# body, waiting for a free slot (async client only), opening the connection, sending up to
+# the first byte of the answer, reading the body, parsing the json
+PHASES = ('preprocess', 'throttle', 'encode', 'queue', 'connect', 'ttfb', 'download', 'decode')
+
+
+class RequestMetrics(object):
+    """
+        what is known about one http request, handed to the hooks of the client.
+        timings maps the phases in PHASES to seconds, `total` is the wall time of the
+        request without preprocess. an image is only preprocessed once, its time is
+        reported with the first attempt.
+    """
+
+    def __init__(self, path, method, attempt=0):
+        self.path = path
+        self.endpoint = endpoint_of(path)
+        self.method = method
+        self.attempt = attempt
+        self.started_at = time.time()
+        self.timings = {}
+        self.total = None
+        self.status_code = None
+        self.request_bytes = None
+        self.response_bytes = None
+        self.error = None
+
+    def __repr__(self):
+        return '<RequestMetrics %s %s status=%s total=%s>' % (self.method, self.path, self.status_code, self.total)
+
+
+class RequestHook(object):
+    """
+        base class of the hooks passed to the clients with `hooks=[...]`, both methods
+        are called from the thread (or event loop) making the request
+    """
+
+    def before_request(self, metrics):
+        pass
+
+    def after_request(self, metrics):
+        pass
+
+
+class Histogram(object):
+    """
+        log-scaled histogram of durations, every bucket is `growth` times wider than the
+        previous one so percentiles are within that factor whatever the range of values,
+        in constant memory
+    """
+
+    def __init__(self, min_value=1e-5, growth=1.05):
+        self.min_value = min_value
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self._buckets = {}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        bucket = 0
+        if value > self.min_value:
+            bucket = int(math.log(value / self.min_value) / self._log_growth) + 1
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        if not self.count:
+            return None
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(self.min_value * self.growth ** bucket, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+class _EndpointStats(object):
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.status_codes = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.timings = {}
+
+
+class MetricsCollector(RequestHook):
+    """
+        in-memory aggregation per endpoint: request and error counts, status codes,
+        payload bytes, and a Histogram of the total time and of every phase
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def after_request(self, metrics):
+        timings = dict(metrics.timings)
+        if metrics.total is not None:
+            timings['total'] = metrics.total
+        with self._lock:
+            stats = self._endpoints.get(metrics.endpoint)
+            if stats is None:
+                stats = self._endpoints[metrics.endpoint] = _EndpointStats()
+            stats.requests += 1
+            stats.errors += metrics.error is not None
+            if metrics.status_code is not None:
+                stats.status_codes[metrics.status_code] = stats.status_codes.get(metrics.status_code, 0) + 1
+            stats.request_bytes += metrics.request_bytes or 0
+            stats.response_bytes += metrics.response_bytes or 0
+            for phase, seconds in timings.items():
+                histogram = stats.timings.get(phase)
+                if histogram is None:
+                    histogram = stats.timings[phase] = Histogram()
+                histogram.record(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict((endpoint, {
+                'requests': stats.requests,
+                'errors': stats.errors,
+                'status_codes': dict(stats.status_codes),
+                'request_bytes': stats.request_bytes,
+                'response_bytes': stats.response_bytes,
+                'timings': dict((phase, histogram.summary()) for phase, histogram in stats.timings.items()),
+            }) for endpoint, stats in self._endpoints.items())
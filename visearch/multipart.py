@@ -0,0 +1,272 @@
+"""
+    request bodies generated chunk by chunk while they are sent, instead of being built in memory.
+
+    a body is re-iterable, so that it can be sent again on a retry. `len` is its size in bytes
+    when it is known up front, requests then sends it with a Content-Length header; it is None
+    for a body generated from a one-shot iterator, which is sent with chunked transfer encoding.
+"""
+import binascii
+import mmap
+import os
+import six
+from six.moves.urllib.parse import urlencode
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def _to_bytes(value):
+    if isinstance(value, six.binary_type):
+        return value
+    if not isinstance(value, six.text_type):
+        value = six.text_type(value)
+    return value.encode('utf-8')
+
+
+def _join(chunks):
+    """
+        the chunks of a body as one bytes, python 2 cannot join memoryviews and bytearrays
+    """
+    if six.PY2:
+        chunks = (chunk.tobytes() if isinstance(chunk, memoryview) else bytes(chunk) for chunk in chunks)
+    return b''.join(chunks)
+
+
+class FilePart(object):
+    """
+        a file sent from disk: it is only opened while the body is sent, in chunks,
+        and closed right after
+    """
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        # IOError for a missing file on python 2 as well, where getsize raises OSError
+        with open(path, 'rb') as f:
+            self.size = os.fstat(f.fileno()).st_size
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+
+class MappedFilePart(FilePart):
+    """
+        a file sent straight from a read-only memory map: the chunks are memoryview slices
+        of the mapped pages, no python bytes copy of the file is made (on python 3, python 2
+        copies one chunk at a time). the map is created by
+        open() or the first iteration, and released after every complete iteration.
+    """
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        super(MappedFilePart, self).__init__(path, chunk_size)
+        self._map = None
+
+    def open(self):
+        if self._map is None and self.size:
+            with open(self.path, 'rb') as f:
+                # the map stays valid once the file is closed
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def reader(self):
+        """
+            a file-like object reading the map, for Image.open, that does not close it
+        """
+        return _MapReader(self.open() or b'')
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # chunks are still referenced, the map goes away with them
+                pass
+            self._map = None
+
+    def __iter__(self):
+        mapped = self.open()
+        if mapped is None:
+            return
+        try:
+            if six.PY2:
+                # python 2 has no memoryview of an mmap, its slices are copies of one chunk each
+                for start in range(0, self.size, self.chunk_size):
+                    yield mapped[start:start + self.chunk_size]
+                return
+            view = memoryview(mapped)
+            for start in range(0, self.size, self.chunk_size):
+                yield view[start:start + self.chunk_size]
+            view.release()
+        finally:
+            self.close()
+
+    def __getstate__(self):
+        # sent back from a process pool without its map
+        state = self.__dict__.copy()
+        state['_map'] = None
+        return state
+
+
+class _MapReader(object):
+
+    def __init__(self, mapped):
+        self._map = mapped
+        self._pos = 0
+
+    def read(self, size=-1):
+        end = len(self._map) if size is None or size < 0 else min(self._pos + size, len(self._map))
+        data = self._map[self._pos:end]
+        self._pos = end
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += len(self._map)
+        self._pos = offset
+        return offset
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        pass
+
+
+class StreamingBody(object):
+    content_type = None
+    len = None
+
+    def __iter__(self):
+        raise NotImplementedError
+
+
+class _BodyReader(object):
+    """
+        one pass over a body as a file, python 2's httplib sends anything that has no read()
+        with a single sendall. `size` is ignored, every read returns the next chunk.
+    """
+
+    def __init__(self, body):
+        self._chunks = iter(body)
+
+    def read(self, size=-1):
+        for chunk in self._chunks:
+            if len(chunk):
+                return chunk
+        return b''
+
+
+class FormBody(StreamingBody):
+    """
+        an application/x-www-form-urlencoded body, encoded like requests does it.
+
+        fields is a sequence of (name, value) pairs, or a function returning an iterable of
+        them when the pairs are generated: the body can then be sent again and its length
+        is computed by encoding it once without keeping it. fields given as a one-shot
+        iterator are sent with chunked transfer.
+    """
+    content_type = 'application/x-www-form-urlencoded'
+
+    def __init__(self, fields, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        if callable(fields):
+            self._fields = fields
+        elif isinstance(fields, (list, tuple)):
+            self._fields = lambda: fields
+        else:
+            iterator = iter(fields)
+            self._fields = lambda: iterator
+            return
+        self.len = sum(len(chunk) for chunk in self)
+
+    def _encoded(self):
+        separator = b''
+        for name, value in self._fields():
+            if isinstance(value, (list, tuple)):
+                values = [_to_bytes(item) for item in value]
+            else:
+                values = _to_bytes(value)
+            yield separator + urlencode([(_to_bytes(name), values)], doseq=True).encode('ascii')
+            separator = b'&'
+
+    def __iter__(self):
+        chunk = []
+        size = 0
+        for pair in self._encoded():
+            chunk.append(pair)
+            size += len(pair)
+            if size >= self.chunk_size:
+                yield b''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield b''.join(chunk)
+
+
+def _quote_header_value(value):
+    # as browsers (and urllib3) do for names and filenames in multipart headers
+    return _to_bytes(value).replace(b'"', b'%22').replace(b'\r', b'%0D').replace(b'\n', b'%0A')
+
+
+class MultipartBody(StreamingBody):
+    """
+        a multipart/form-data body with the fields of `fields` (a dict or (name, value) pairs)
+        followed by the files of `files`, a dict of name to (filename, content[, content_type])
+        as requests takes them. a content may be bytes, a memoryview, a FilePart or any
+        sized iterable of bytes, it is streamed without being copied.
+    """
+
+    def __init__(self, fields=None, files=None, boundary=None):
+        # what uuid4().hex gives, without importing uuid and platform
+        self.boundary = boundary or binascii.hexlify(os.urandom(16)).decode('ascii')
+        self.content_type = 'multipart/form-data; boundary={0}'.format(self.boundary)
+        if isinstance(fields, dict):
+            fields = fields.items()
+
+        self._parts = []
+        for name, value in fields or ():
+            header = b'Content-Disposition: form-data; name="' + _quote_header_value(name) + b'"\r\n\r\n'
+            # a list is sent as one part per item, as requests does
+            for item in (value if isinstance(value, (list, tuple)) else [value]):
+                if item is not None:
+                    self._parts.append((header, _to_bytes(item)))
+        for name, file_tuple in (files or {}).items():
+            filename, content = file_tuple[0], file_tuple[1]
+            content_type = file_tuple[2] if len(file_tuple) > 2 else None
+            if hasattr(content, 'read') and not hasattr(content, '__len__'):
+                # an already open file, its size is not known otherwise
+                content = content.read()
+            header = (b'Content-Disposition: form-data; name="' + _quote_header_value(name) +
+                      b'"; filename="' + _quote_header_value(filename) + b'"\r\n')
+            if content_type:
+                header += b'Content-Type: ' + _to_bytes(content_type) + b'\r\n'
+            self._parts.append((header + b'\r\n', content))
+
+        delimiter = len(self.boundary) + 4
+        self.len = sum(delimiter + len(header) + len(content) + 2 for header, content in self._parts) + delimiter + 2
+
+    def __iter__(self):
+        delimiter = b'--' + self.boundary.encode('ascii') + b'\r\n'
+        for header, content in self._parts:
+            yield delimiter + header
+            if isinstance(content, (six.binary_type, memoryview, bytearray)):
+                yield content
+            else:
+                for chunk in content:
+                    yield chunk
+            yield b'\r\n'
+        yield b'--' + self.boundary.encode('ascii') + b'--\r\n'
@@ -0,0 +1,82 @@
+from .bind import ViSearchClientError
+
+
+class ResultIterator(object):
+    """
+        iterate over the results of a paged search, one result at a time.
+
+        fetch(page) returns the response of one page. while the results of page N are
+        consumed, page N+1 is already requested in a background thread. iteration ends
+        when the last page is reached, after `max_results` results, at the first result
+        scoring below `score_min`, or at the first result for which stop_when(result) is true.
+    """
+
+    def __init__(self, fetch, page=1, limit=30, max_results=None, score_min=None, stop_when=None, prefetch=True):
+        self.fetch = fetch
+        self.page = page
+        self.limit = limit
+        self.max_results = max_results
+        self.score_min = score_min
+        self.stop_when = stop_when
+        self.prefetch = prefetch
+        self.pages_fetched = 0
+        self.last_response = None
+
+    def _is_last_page(self, page, resp):
+        results = resp.get('result') or []
+        if len(results) < self.limit:
+            return True
+        total = resp.get('total')
+        if total is not None and page * self.limit >= total:
+            return True
+        # results come by descending score, nothing on later pages can qualify
+        score = results[-1].get('score')
+        return self.score_min is not None and score is not None and score < self.score_min
+
+    def _stop_at(self, result):
+        score = result.get('score')
+        if self.score_min is not None and score is not None and score < self.score_min:
+            return True
+        return self.stop_when is not None and self.stop_when(result)
+
+    def _get(self, future):
+        resp = future.result()
+        self.pages_fetched += 1
+        self.last_response = resp
+        if resp.get('status') != 'OK':
+            raise ViSearchClientError("page {0} failed: {1}".format(resp.get('page'), resp.get('error')))
+        return resp
+
+    def __iter__(self):
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=1)
+        page = self.page
+        future = executor.submit(self.fetch, page)
+        count = 0
+        try:
+            while True:
+                resp = self._get(future)
+                last_page = self._is_last_page(page, resp)
+                if self.max_results is not None and count + len(resp.get('result') or []) >= self.max_results:
+                    last_page = True
+                future = None
+                if self.prefetch and not last_page:
+                    future = executor.submit(self.fetch, page + 1)
+
+                for result in resp.get('result') or []:
+                    if self._stop_at(result):
+                        return
+                    yield result
+                    count += 1
+                    if self.max_results is not None and count >= self.max_results:
+                        return
+
+                if last_page:
+                    return
+                page += 1
+                if future is None:
+                    future = executor.submit(self.fetch, page)
+        finally:
+            if future is not None:
+                future.cancel()
+            executor.shutdown(wait=False)
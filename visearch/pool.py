@@ -0,0 +1,67 @@
+"""
+    connection pool settings and counters, shared by the transports without importing any
+    http library
+"""
+import threading
+import time
+
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+
+class PoolStats(object):
+    """
+        counters of connection checkouts shared by every pool of a session.
+        a hit is a checkout that reused an open keep-alive connection,
+        a miss is a checkout that has to open a new tcp(+tls) connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'requests': self.hits + self.misses,
+            }
+
+
+_connect_time = threading.local()
+
+
+def take_connect_time():
+    """
+        seconds spent opening connections (tcp and tls handshakes) in the calling thread
+        since the previous call
+    """
+    elapsed = getattr(_connect_time, 'elapsed', 0.0)
+    _connect_time.elapsed = 0.0
+    return elapsed
+
+
+def _timed_connection(conn_cls):
+    def connect(self):
+        start = time.time()
+        try:
+            return conn_cls.connect(self)
+        finally:
+            _connect_time.elapsed = getattr(_connect_time, 'elapsed', 0.0) + time.time() - start
+
+    return type('Timed' + conn_cls.__name__, (conn_cls, ), {'connect': connect})
@@ -0,0 +1,107 @@
+"""
+    format, width and height of jpeg, png and webp images from the first bytes of the file,
+    without Pillow and without decoding anything. used to validate an image before it is
+    decoded or uploaded.
+"""
+import os
+import struct
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# start of frame markers, the ones between 0xc0 and 0xcf that are not DHT, JPG or DAC
+JPEG_SOF_MARKERS = frozenset(range(0xc0, 0xd0)) - frozenset((0xc4, 0xc8, 0xcc))
+# markers without a length and payload: TEM and the restart markers
+JPEG_STANDALONE_MARKERS = frozenset((0x01, ) + tuple(range(0xd0, 0xd8)))
+
+
+class ImageInfo(object):
+    __slots__ = ('format', 'width', 'height', 'size')
+
+    def __init__(self, format, width, height, size):
+        self.format = format
+        self.width = width
+        self.height = height
+        self.size = size
+
+    def __repr__(self):
+        return '<ImageInfo %s %dx%d %d bytes>' % (self.format, self.width, self.height, self.size)
+
+
+def _jpeg_dimensions(f):
+    f.seek(2)
+    while True:
+        marker = bytearray(f.read(2))
+        if len(marker) < 2 or marker[0] != 0xff:
+            return None
+        code = marker[1]
+        while code == 0xff:
+            # fill bytes before the marker
+            fill = bytearray(f.read(1))
+            if not fill:
+                return None
+            code = fill[0]
+        if code in JPEG_STANDALONE_MARKERS:
+            continue
+        if code in (0xd9, 0xda):
+            # end of image or start of scan without a frame header
+            return None
+
+        segment = f.read(2)
+        if len(segment) < 2:
+            return None
+        length = struct.unpack('>H', segment)[0]
+        if code in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            # a height of 0 is given later in a DNL segment
+            return (width, height) if width and height else None
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _webp_dimensions(head):
+    chunk = head[12:16]
+    if chunk == b'VP8 ' and head[23:26] == b'\x9d\x01\x2a':
+        width, height = struct.unpack('<HH', head[26:30])
+        return width & 0x3fff, height & 0x3fff
+    if chunk == b'VP8L' and head[20:21] == b'\x2f':
+        bits = struct.unpack('<I', head[21:25])[0]
+        return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+    if chunk == b'VP8X':
+        width = struct.unpack('<I', head[24:27] + b'\0')[0]
+        height = struct.unpack('<I', head[27:30] + b'\0')[0]
+        return width + 1, height + 1
+    return None
+
+
+def probe_file(f, size):
+    """
+        ImageInfo of the image in the binary file object f, of `size` bytes, read from its header.
+        None when it is not a jpeg, png or webp image or the header is cut short.
+    """
+    head = bytes(f.read(32))
+    if len(head) < 30:
+        return None
+
+    if head.startswith(b'\xff\xd8'):
+        image_format, dimensions = 'JPEG', _jpeg_dimensions(f)
+    elif head.startswith(PNG_SIGNATURE) and head[12:16] == b'IHDR':
+        image_format, dimensions = 'PNG', struct.unpack('>II', head[16:24])
+    elif head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        image_format, dimensions = 'WEBP', _webp_dimensions(head)
+    else:
+        return None
+
+    if dimensions is None:
+        return None
+    return ImageInfo(image_format, dimensions[0], dimensions[1], size)
+
+
+def probe_image(image_path):
+    """
+        ImageInfo of the image file image_path, from its header and its size on disk.
+        None for formats other than jpeg, png and webp.
+    """
+    with open(image_path, 'rb') as f:
+        return probe_file(f, os.fstat(f.fileno()).st_size)
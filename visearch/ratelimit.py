@@ -0,0 +1,135 @@
+import threading
+import time
+from .bind import ViSearchClientError
+from .retry import endpoint_of
+
+
+SEARCH_ENDPOINTS = ('search', 'recommendation', 'colorsearch', 'uploadsearch', 'discoversearch')
+WRITE_ENDPOINTS = ('insert', 'remove')
+
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class RateLimitExceeded(ViSearchClientError):
+
+    def __init__(self, endpoint, retry_in):
+        super(RateLimitExceeded, self).__init__(
+            "rate limit reached for {0}, next slot in {1:.2f}s".format(endpoint, retry_in))
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class TokenBucket(object):
+    """
+        `rate` tokens per second, up to `burst` of them saved up while idle. with a burst of
+        one, no second ever sees more than `rate` requests; a larger burst lets up to
+        burst - 1 more through in the second after an idle time.
+
+        a caller reserves its token and is told how long to wait before using it, the
+        lock is never held while waiting, so threads and coroutines can share a bucket
+        and are served in the order they asked.
+    """
+
+    def __init__(self, rate, burst=1, clock=_clock):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def reserve(self, max_wait=None):
+        """
+            returns (wait, reserved): the seconds to wait before the token can be used, and
+            False without reserving anything when that is more than max_wait
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.burst)
+            self._updated = now
+            wait = max(1 - self._tokens, 0) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return wait, False
+            # may go below zero, the callers after this one wait longer
+            self._tokens -= 1
+            return wait, True
+
+
+class RateLimiter(object):
+    """
+        search_qps: requests per second to search, recommendation, colorsearch, uploadsearch
+            and discoversearch together, None for no limit
+        write_qps: requests per second to insert and remove together, None for no limit
+        burst: requests that may go at once after an idle time. the default of 1 keeps every
+            second within the qps, a larger burst may exceed it by burst - 1 requests
+        max_wait: seconds a request may wait for its turn, beyond that it fails at once with
+            RateLimitExceeded; None always waits, 0 never does
+
+        retries count against the limit like any other request. share one RateLimiter, or use
+        RateLimiter.for_account, between the clients of a process that use the same quota.
+    """
+
+    _accounts = {}
+    _accounts_lock = threading.Lock()
+
+    def __init__(self, search_qps=None, write_qps=None, burst=1, max_wait=None, clock=_clock):
+        self.max_wait = max_wait
+        self.buckets = {}
+        if search_qps:
+            self.buckets['search'] = TokenBucket(search_qps, burst, clock)
+        if write_qps:
+            self.buckets['write'] = TokenBucket(write_qps, burst, clock)
+        self._lock = threading.Lock()
+        self._stats = dict((name, {'requests': 0, 'waited': 0.0, 'rejected': 0}) for name in self.buckets)
+
+    @classmethod
+    def for_account(cls, access_key, **kwargs):
+        """
+            the RateLimiter of an access key, created with kwargs on first use and shared by
+            every later caller in the process
+        """
+        with cls._accounts_lock:
+            limiter = cls._accounts.get(access_key)
+            if limiter is None:
+                limiter = cls._accounts[access_key] = cls(**kwargs)
+            return limiter
+
+    def bucket_name(self, path):
+        endpoint = endpoint_of(path)
+        if endpoint in SEARCH_ENDPOINTS:
+            return 'search'
+        if endpoint in WRITE_ENDPOINTS:
+            return 'write'
+        return None
+
+    def acquire(self, path):
+        """
+            reserve a request to `path`, returns the seconds to wait before sending it
+        """
+        name = self.bucket_name(path)
+        bucket = self.buckets.get(name)
+        if bucket is None:
+            return 0
+
+        wait, reserved = bucket.reserve(self.max_wait)
+        with self._lock:
+            stats = self._stats[name]
+            if reserved:
+                stats['requests'] += 1
+                stats['waited'] += wait
+            else:
+                stats['rejected'] += 1
+        if not reserved:
+            raise RateLimitExceeded(endpoint_of(path), wait)
+        return wait
+
+    def wait(self, path):
+        delay = self.acquire(path)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict((name, dict(stats)) for name, stats in self._stats.items())
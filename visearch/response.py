@@ -0,0 +1,119 @@
+"""
+    fast json decoding and light result objects, used with `result_objects=True`
+"""
+import importlib
+
+
+JSON_BACKENDS = ('orjson', 'ujson', 'simplejson', 'json')
+_backend = []
+
+
+def _load_backend():
+    for name in JSON_BACKENDS:
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            continue
+        _backend[:] = [name, module.loads]
+        return _backend
+
+
+def json_backend():
+    """
+        name of the json library used by json_loads, it is picked on the first call
+    """
+    return (_backend or _load_backend())[0]
+
+
+def json_loads(content):
+    return (_backend or _load_backend())[1](content)
+
+
+class SearchResult(object):
+    """
+        one search result. the metadata in value_map is only looked up when it is
+        accessed, `result['key']` and `result.get('key')` work as on the plain dict.
+    """
+    __slots__ = ('im_name', 'score', '_raw')
+
+    def __init__(self, raw):
+        self.im_name = raw.get('im_name')
+        self.score = raw.get('score')
+        self._raw = raw
+
+    @property
+    def value_map(self):
+        return self._raw.get('value_map') or {}
+
+    def get(self, key, default=None):
+        return self._raw.get(key, default)
+
+    def __getitem__(self, key):
+        return self._raw[key]
+
+    def __contains__(self, key):
+        return key in self._raw
+
+    def to_dict(self):
+        return self._raw
+
+    def __repr__(self):
+        return '<SearchResult im_name=%s score=%s>' % (self.im_name, self.score)
+
+
+class SearchResponse(object):
+    """
+        a search response wrapping the decoded dict. the results are turned into
+        SearchResult objects on first access, every other key reads through to the dict.
+    """
+    __slots__ = ('_raw', '_results')
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._results = None
+
+    @property
+    def status(self):
+        return self._raw.get('status')
+
+    @property
+    def error(self):
+        return self._raw.get('error')
+
+    @property
+    def page(self):
+        return self._raw.get('page')
+
+    @property
+    def limit(self):
+        return self._raw.get('limit')
+
+    @property
+    def total(self):
+        return self._raw.get('total')
+
+    @property
+    def result(self):
+        if self._results is None:
+            self._results = [SearchResult(result) for result in self._raw.get('result') or []]
+        return self._results
+
+    def get(self, key, default=None):
+        if key == 'result' and 'result' in self._raw:
+            return self.result
+        return self._raw.get(key, default)
+
+    def __getitem__(self, key):
+        value = self._raw[key]
+        if key == 'result':
+            return self.result
+        return value
+
+    def __contains__(self, key):
+        return key in self._raw
+
+    def to_dict(self):
+        return self._raw
+
+    def __repr__(self):
+        return '<SearchResponse status=%s page=%s total=%s>' % (self.status, self.page, self.total)
@@ -0,0 +1,119 @@
+import random
+import threading
+import time
+
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+# the server rejected these before doing any work, a retry cannot apply a request twice
+NOT_PROCESSED_STATUSES = (429, 503)
+# insert creates a new transaction on every call
+NON_IDEMPOTENT_PATHS = ('insert', )
+
+
+def parse_retry_after(value):
+    """
+        seconds to wait from a Retry-After header, given in seconds or as an http date
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        # rare, not worth importing the email package up front
+        import email.utils
+        parsed = email.utils.parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(email.utils.mktime_tz(parsed) - time.time(), 0)
+
+
+def endpoint_of(path):
+    # insert/status/{trans_id} -> insert/status
+    return 'insert/status' if path.startswith('insert/status') else path
+
+
+class RetryBudget(object):
+    """
+        client-wide cap on retries, shared by every request of the clients using it.
+
+        every failure takes a token and every success gives back `token_ratio` of one,
+        retries are only made while more than half of `max_tokens` are left. during an
+        outage the budget runs dry and the clients stop adding retry traffic.
+    """
+
+    def __init__(self, max_tokens=100, token_ratio=0.1):
+        self.max_tokens = float(max_tokens)
+        self.token_ratio = token_ratio
+        self.tokens = self.max_tokens
+        self._lock = threading.Lock()
+
+    def record_success(self):
+        with self._lock:
+            self.tokens = min(self.tokens + self.token_ratio, self.max_tokens)
+
+    def record_failure(self):
+        with self._lock:
+            self.tokens = max(self.tokens - 1, 0)
+
+    def can_retry(self):
+        with self._lock:
+            return self.tokens > self.max_tokens / 2
+
+
+class RetryPolicy(object):
+    """
+        max_retries: retries per request on top of the first attempt
+        backoff_factor, max_backoff: the n-th retry waits up to backoff_factor * 2 ** n seconds,
+            at most max_backoff, with full jitter (a random delay in that range) unless jitter is False
+        retry_statuses: http statuses worth another attempt
+        respect_retry_after: wait as long as the Retry-After header says, a request is not
+            retried when it asks for more than max_backoff
+        budget: RetryBudget shared across requests, a private one is created when None
+
+        a non-idempotent request (insert) is only retried when the server did not process
+        it: the connection could not be opened, or the answer was 429 or 503.
+    """
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=30, retry_statuses=RETRYABLE_STATUSES,
+                 jitter=True, respect_retry_after=True, budget=None):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = retry_statuses
+        self.jitter = jitter
+        self.respect_retry_after = respect_retry_after
+        self.budget = budget or RetryBudget()
+
+    def is_retryable(self, path, status_code=None, request_sent=True):
+        if status_code is not None and status_code not in self.retry_statuses:
+            return False
+        if endpoint_of(path) not in NON_IDEMPOTENT_PATHS:
+            return True
+        if status_code is None:
+            return not request_sent
+        return status_code in NOT_PROCESSED_STATUSES
+
+    def backoff(self, attempt):
+        delay = min(self.backoff_factor * (2 ** attempt), self.max_backoff)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def record_success(self):
+        self.budget.record_success()
+
+    def retry_delay(self, attempt, path, status_code=None, request_sent=True, retry_after=None):
+        """
+            seconds to wait before attempt number `attempt + 1`, or None to give up
+        """
+        if not self.is_retryable(path, status_code, request_sent):
+            return None
+        self.budget.record_failure()
+        if attempt >= self.max_retries or not self.budget.can_retry():
+            return None
+
+        if self.respect_retry_after and retry_after is not None:
+            if retry_after > self.max_backoff:
+                return None
+            return retry_after
+        return self.backoff(attempt)
@@ -0,0 +1,52 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from .pool import PoolStats, _timed_connection, DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE
+
+
+def _counting_pool(pool_cls, stats):
+    def _get_conn(self, timeout=None):
+        conn = pool_cls._get_conn(self, timeout=timeout)
+        # a connection without socket is either brand new or was reset
+        # because the server dropped it, both mean a fresh handshake
+        stats.record(getattr(conn, 'sock', None) is not None)
+        return conn
+
+    return type('Counting' + pool_cls.__name__, (pool_cls, ), {
+        '_get_conn': _get_conn,
+        'ConnectionCls': _timed_connection(pool_cls.ConnectionCls),
+    })
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+
+    def __init__(self, stats=None, **kwargs):
+        self.stats = stats or PoolStats()
+        super(PooledHTTPAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(PooledHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self.stats),
+            'https': _counting_pool(HTTPSConnectionPool, self.stats),
+        }
+
+
+def create_session(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                   pool_block=False, stats=None):
+    """
+        create a keep-alive session.
+
+        pool_connections: number of per-host connection pools to cache
+        pool_maxsize: maximum number of connections kept open per host
+        pool_block: wait for a free connection instead of opening a throwaway
+            one when all `pool_maxsize` connections of a host are in use
+    """
+    adapter = PooledHTTPAdapter(stats=stats,
+                                pool_connections=pool_connections,
+                                pool_maxsize=pool_maxsize,
+                                pool_block=pool_block)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
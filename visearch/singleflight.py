@@ -0,0 +1,53 @@
+import threading
+
+
+class SingleFlight(object):
+    """
+        coalesce concurrent calls with the same key: the first caller runs the function,
+        callers arriving while it is in flight wait for it and get the same result, or
+        the same exception. the key is forgotten as soon as the call returns, so results
+        are never reused afterwards (that is the job of the result cache).
+
+        the result is shared, callers must not modify it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                from concurrent.futures import Future
+                future = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            # waiters must not hang on a KeyboardInterrupt either
+            self._forget(key)
+            future.set_exception(e)
+            raise
+        self._forget(key)
+        future.set_result(result)
+        return result
+
+    def _forget(self, key):
+        # callers arriving from now on make a new request
+        with self._lock:
+            del self._calls[key]
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self._calls)}
@@ -0,0 +1,230 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from .bind import ViSearchAPIError, ViSearchClientError
+
+
+DEFAULT_WORKERS = 4
+DEFAULT_ERROR_LIMIT = 100
+
+
+class TransactionStatus(object):
+    """
+        final state of one insert transaction. `errors` holds the error_list entries of
+        every error page, `error` is set when the status could not be retrieved at all.
+    """
+
+    def __init__(self, trans_id, result=None, errors=None, error=None):
+        self.trans_id = trans_id
+        self.result = result or {}
+        self.errors = errors or []
+        self.error = error
+
+    @property
+    def total(self):
+        return self.result.get('total', 0)
+
+    @property
+    def success_count(self):
+        return self.result.get('success_count', 0)
+
+    @property
+    def fail_count(self):
+        return self.result.get('fail_count', 0)
+
+    @property
+    def succeeded(self):
+        return self.error is None and self.result.get('processed_percent') == 100 and self.fail_count == 0
+
+    def __repr__(self):
+        return '<TransactionStatus trans_id=%s total=%d success=%d fail=%d>' % (
+            self.trans_id, self.total, self.success_count, self.fail_count)
+
+
+class InsertStatusReport(object):
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+
+    @property
+    def total(self):
+        return sum(status.total for status in self.statuses)
+
+    @property
+    def success_count(self):
+        return sum(status.success_count for status in self.statuses)
+
+    @property
+    def fail_count(self):
+        return sum(status.fail_count for status in self.statuses)
+
+    @property
+    def errors(self):
+        return [(status.trans_id, error) for status in self.statuses for error in status.errors]
+
+    @property
+    def failed(self):
+        return [status for status in self.statuses if not status.succeeded]
+
+    def __repr__(self):
+        return '<InsertStatusReport transactions=%d total=%d success=%d fail=%d>' % (
+            len(self.statuses), self.total, self.success_count, self.fail_count)
+
+
+class _Transaction(object):
+
+    def __init__(self, trans_id, delay):
+        from concurrent.futures import Future
+        self.trans_id = trans_id
+        self.future = Future()
+        self.delay = delay
+        self.percent = 0
+        self.polled_at = None
+        self.retries = 0
+
+
+class InsertStatusTracker(object):
+    """
+        poll insert_status for many transactions on a pool of `workers` threads.
+
+        each transaction is polled on its own schedule: while it makes progress the next poll
+        is planned for its estimated completion time, when it stalls or a poll fails the delay
+        grows by `backoff_factor`, always within [initial_delay, max_delay]. finished
+        transactions are not polled anymore; their paged error lists are fetched `error_limit`
+        errors at a time and the result is set on the per transaction future.
+    """
+
+    def __init__(self, api, trans_ids, workers=DEFAULT_WORKERS, initial_delay=1, max_delay=60,
+                 backoff_factor=2, error_limit=DEFAULT_ERROR_LIMIT, max_retries=5):
+        self.api = api
+        self.workers = workers
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+        self.error_limit = error_limit
+        self.max_retries = max_retries
+
+        self._transactions = OrderedDict((str(trans_id), _Transaction(str(trans_id), initial_delay))
+                                         for trans_id in trans_ids)
+        self._schedule = []
+        self._pending = len(self._transactions)
+        self._condition = threading.Condition()
+        self._executor = None
+        self._thread = None
+
+    @property
+    def futures(self):
+        """
+            trans_id -> concurrent.futures.Future of its TransactionStatus,
+            use asyncio.wrap_future to await one from a coroutine
+        """
+        return OrderedDict((trans_id, transaction.future) for trans_id, transaction in self._transactions.items())
+
+    def start(self):
+        if self._thread is not None:
+            return self
+
+        from concurrent.futures import ThreadPoolExecutor
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        now = time.time()
+        for transaction in self._transactions.values():
+            heapq.heappush(self._schedule, (now, transaction.trans_id))
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        self.start()
+        deadline = None if timeout is None else time.time() + timeout
+        statuses = []
+        for transaction in self._transactions.values():
+            remaining = None if deadline is None else max(deadline - time.time(), 0)
+            statuses.append(transaction.future.result(remaining))
+        return InsertStatusReport(statuses)
+
+    def _run(self):
+        try:
+            while True:
+                with self._condition:
+                    while self._pending and (not self._schedule or self._schedule[0][0] > time.time()):
+                        timeout = self._schedule[0][0] - time.time() if self._schedule else None
+                        self._condition.wait(timeout)
+                    if not self._pending:
+                        return
+                    _, trans_id = heapq.heappop(self._schedule)
+                self._executor.submit(self._poll, self._transactions[trans_id])
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def _reschedule(self, transaction, delay):
+        transaction.delay = min(max(delay, self.initial_delay), self.max_delay)
+        with self._condition:
+            heapq.heappush(self._schedule, (time.time() + transaction.delay, transaction.trans_id))
+            self._condition.notify()
+
+    def _resolve(self, transaction, status):
+        transaction.future.set_result(status)
+        with self._condition:
+            self._pending -= 1
+            self._condition.notify()
+
+    def _poll(self, transaction):
+        try:
+            self._poll_once(transaction)
+        except Exception as e:
+            if not transaction.future.done():
+                self._resolve(transaction, TransactionStatus(transaction.trans_id, error=e))
+
+    def _poll_once(self, transaction):
+        try:
+            resp = self.api.insert_status(transaction.trans_id)
+        except (ViSearchAPIError, ViSearchClientError, IOError) as e:
+            transaction.retries += 1
+            if transaction.retries > self.max_retries:
+                self._resolve(transaction, TransactionStatus(transaction.trans_id, error=e))
+            else:
+                self._reschedule(transaction, transaction.delay * self.backoff_factor)
+            return
+
+        if resp.get('status') != 'OK' or not resp.get('result'):
+            self._resolve(transaction, TransactionStatus(transaction.trans_id, error=resp.get('error') or resp))
+            return
+
+        transaction.retries = 0
+        result = resp['result'][0]
+        percent = result.get('processed_percent', 0)
+        if percent >= 100:
+            self._resolve(transaction, self._finish(transaction, result))
+            return
+
+        now = time.time()
+        if transaction.polled_at is not None and percent > transaction.percent:
+            rate = (percent - transaction.percent) / (now - transaction.polled_at)
+            delay = (100 - percent) / rate
+        else:
+            delay = transaction.delay * self.backoff_factor
+        transaction.percent = percent
+        transaction.polled_at = now
+        self._reschedule(transaction, delay)
+
+    def _finish(self, transaction, result):
+        errors = []
+        page = 1
+        while len(errors) < result.get('fail_count', 0):
+            try:
+                resp = self.api.insert_status(transaction.trans_id, error_page=page, error_limit=self.error_limit)
+            except (ViSearchAPIError, ViSearchClientError, IOError) as e:
+                return TransactionStatus(transaction.trans_id, result, errors, error=e)
+            error_list = resp['result'][0].get('error_list') if resp.get('result') else None
+            if not error_list:
+                break
+            errors.extend(error_list)
+            page += 1
+        return TransactionStatus(transaction.trans_id, result, errors)
+
+
+def track_insert_status(api, trans_ids, **kwargs):
+    return InsertStatusTracker(api, trans_ids, **kwargs).start()
@@ -0,0 +1,109 @@
+import codecs
+import json
+from .bind import ViSearchClientError
+
+
+DEFAULT_CHUNK_SIZE = 16 * 1024
+
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+
+class StreamingResponse(object):
+    """
+        iterate over the items of the `key` array of a json response while it downloads.
+
+        chunks is an iterable of bytes, e.g. the iter_content of a streamed response. only the
+        item being parsed is held in memory. the other top-level fields are collected in `fields`,
+        those coming after the array once the iteration ended. a response that does not have the
+        status OK raises ViSearchClientError at the end of the iteration.
+    """
+
+    def __init__(self, chunks, key='result', wrap=None, close=None):
+        self.key = key
+        self.wrap = wrap
+        self.fields = {}
+        self.count = 0
+        self._chunks = iter(chunks)
+        self._close = close
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        try:
+            for item in self._parse():
+                self.count += 1
+                yield self.wrap(item) if self.wrap is not None else item
+        finally:
+            if self._close is not None:
+                self._close()
+
+        if self.fields.get('status') != 'OK':
+            raise ViSearchClientError("stream failed: {0}".format(self.fields.get('error')))
+
+    def _fill(self):
+        if self._eof:
+            raise ViSearchClientError("invalid or truncated response")
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._text.decode(b'', True)
+        else:
+            text = self._text.decode(chunk)
+        # drop what has been parsed already
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+
+    def _peek(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            self._fill()
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char not in chars:
+            raise ViSearchClientError("invalid response: expected {0} at {1!r}".format(
+                ' or '.join(chars), self._buf[self._pos:self._pos + 20]))
+        self._pos += 1
+        return char
+
+    def _value(self):
+        while True:
+            self._peek()
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                end = None
+            # a number at the end of the buffer may go on in the next chunk
+            if end is not None and (end < len(self._buf) or self._eof):
+                self._pos = end
+                return value
+            self._fill()
+
+    def _parse(self):
+        self._expect('{')
+        if self._peek() == '}':
+            return
+
+        while True:
+            name = self._value()
+            self._expect(':')
+            if name == self.key and self._peek() == '[':
+                self._pos += 1
+                if self._peek() == ']':
+                    self._pos += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                self.fields[name] = self._value()
+
+            if self._expect(',}') == '}':
+                return
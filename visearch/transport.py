@@ -0,0 +1,320 @@
+"""
+    the http layer of ViSearchAPI.
+
+    a transport turns a call into a request with prepare(), whose `headers` are final, and
+    sends it with send(). the response has status_code, headers, content, text, json(),
+    iter_content(chunk_size) and close() like a requests response; send() returns before
+    the body is read, the caller reads `content` or streams it.
+
+    errors are raised as the requests exceptions (ConnectTimeout, ReadTimeout, ConnectionError)
+    whatever the transport, the retry policy and the circuit breaker rely on them.
+"""
+import base64
+import json as jsonlib
+import threading
+from collections import deque
+import requests
+import six
+import urllib3
+from requests.exceptions import ConnectTimeout, ReadTimeout, ConnectionError as RequestsConnectionError
+from six.moves.urllib.parse import quote, urlencode, urlparse
+from urllib3.exceptions import (ConnectTimeoutError, HTTPError as Urllib3HTTPError, NewConnectionError,
+                                ReadTimeoutError)
+from urllib3._collections import HTTPHeaderDict
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from .multipart import FormBody, StreamingBody, _BodyReader, _join, _to_bytes
+from .retry import endpoint_of
+from .pool import PoolStats, DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE
+from .session import _counting_pool, create_session
+
+
+# characters left as they are in a query string given as text, as requests does
+_QUERY_SAFE = "!#$%&'()*+,/:;=?@[]~"
+
+
+class Transport(object):
+
+    def prepare(self, method, url, params=None, data=None, json=None, headers=None, auth=None):
+        raise NotImplementedError
+
+    def send(self, request, timeout=None):
+        raise NotImplementedError
+
+    @property
+    def stats(self):
+        """
+            connection pool counters as PoolStats.as_dict, None for a transport without pool
+        """
+        return None
+
+    def close(self):
+        pass
+
+
+class RequestsTransport(Transport):
+    """
+        requests session with the pooled adapter of create_session, and requests' handling of
+        proxies and certificates from the environment
+    """
+
+    def __init__(self, session=None, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False):
+        self.session = session or create_session(pool_connections, pool_maxsize, pool_block)
+
+    def prepare(self, method, url, params=None, data=None, json=None, headers=None, auth=None):
+        return self.session.prepare_request(requests.Request(
+            method, url, params=params, data=data, json=json, auth=auth, headers=headers))
+
+    def send(self, request, timeout=None):
+        if six.PY2 and isinstance(request.body, StreamingBody) and 'Content-Length' in request.headers:
+            request = request.copy()
+            request.body = _BodyReader(request.body)
+        settings = self.session.merge_environment_settings(request.url, {}, True, None, None)
+        return self.session.send(request, timeout=timeout, **settings)
+
+    @property
+    def stats(self):
+        adapter = self.session.get_adapter('https://')
+        return adapter.stats.as_dict() if hasattr(adapter, 'stats') else None
+
+    def close(self):
+        self.session.close()
+
+
+class Request(object):
+    """
+        a request encoded by encode_request. body is bytes, a StreamingBody or None,
+        `chunked` when its length is not known up front. MemoryTransport sets `content`
+        to the body as it was sent.
+    """
+    content = None
+
+    def __init__(self, method, url, headers, body=None, chunked=False):
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.chunked = chunked
+
+    def __repr__(self):
+        return '<Request %s %s>' % (self.method, self.url)
+
+
+def _encode_pairs(pairs):
+    if isinstance(pairs, dict):
+        pairs = pairs.items()
+    encoded = []
+    for name, value in pairs:
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = [_to_bytes(item) for item in value if item is not None]
+        else:
+            value = _to_bytes(value)
+        encoded.append((_to_bytes(name), value))
+    return urlencode(encoded, doseq=True)
+
+
+def basic_auth(auth):
+    """
+        the Authorization header of an HTTPBasicAuth or a (username, password) tuple
+    """
+    username, password = (auth.username, auth.password) if hasattr(auth, 'username') else auth
+    credentials = _to_bytes(username) + b':' + _to_bytes(password)
+    return 'Basic ' + base64.b64encode(credentials).decode('ascii')
+
+
+def encode_request(method, url, params=None, data=None, json=None, headers=None, auth=None):
+    """
+        a Request with the url, headers and body requests would send for the same arguments,
+        without its hooks, cookies and environment lookups
+    """
+    if params:
+        query = params if isinstance(params, six.string_types) else _encode_pairs(params)
+        url += ('&' if '?' in url else '?') + quote(query, safe=_QUERY_SAFE)
+
+    headers = dict(headers or {})
+    headers.setdefault('Accept-Encoding', 'gzip, deflate')
+    headers.setdefault('Accept', '*/*')
+    if auth is not None:
+        headers['Authorization'] = basic_auth(auth)
+
+    body = None
+    chunked = False
+    if isinstance(data, StreamingBody):
+        body = data
+        if data.len is None:
+            chunked = True
+            headers['Transfer-Encoding'] = 'chunked'
+        else:
+            headers['Content-Length'] = str(data.len)
+    else:
+        if data and isinstance(data, (dict, list, tuple)):
+            body = _encode_pairs(data).encode('ascii')
+            headers.setdefault('Content-Type', FormBody.content_type)
+        elif data:
+            body = _to_bytes(data)
+        elif json is not None:
+            body = jsonlib.dumps(json).encode('utf-8')
+            headers.setdefault('Content-Type', 'application/json')
+        if body is not None:
+            headers['Content-Length'] = str(len(body))
+        elif method == 'POST':
+            headers['Content-Length'] = '0'
+
+    return Request(method, url, headers, body, chunked)
+
+
+class Response(object):
+    """
+        the requests-like response of the transports that are not requests, built on `content`
+    """
+    encoding = 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
+
+    def json(self):
+        return jsonlib.loads(self.content.decode(self.encoding))
+
+    def iter_content(self, chunk_size=1):
+        content = self.content
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+def _translate(error):
+    if isinstance(error, NewConnectionError):
+        # a subclass of ConnectTimeoutError, but the connection was refused
+        return RequestsConnectionError(error)
+    if isinstance(error, ConnectTimeoutError):
+        return ConnectTimeout(error)
+    if isinstance(error, ReadTimeoutError):
+        return ReadTimeout(error)
+    return RequestsConnectionError(error)
+
+
+class Urllib3Response(Response):
+
+    def __init__(self, raw, request):
+        self.raw = raw
+        self.request = request
+        self.status_code = raw.status
+        self.headers = raw.headers
+        self._content = None
+
+    @property
+    def content(self):
+        if self._content is None:
+            try:
+                self._content = self.raw.read()
+            except Urllib3HTTPError as e:
+                raise _translate(e)
+            finally:
+                self.raw.release_conn()
+        return self._content
+
+    def iter_content(self, chunk_size=1):
+        if self._content is not None:
+            for chunk in super(Urllib3Response, self).iter_content(chunk_size):
+                yield chunk
+            return
+        try:
+            for chunk in self.raw.stream(chunk_size):
+                yield chunk
+        except Urllib3HTTPError as e:
+            raise _translate(e)
+
+    def close(self):
+        self.raw.close()
+        self.raw.release_conn()
+
+
+class Urllib3Transport(Transport):
+    """
+        urllib3 directly, without the session, adapter and response layers of requests.
+        the pool settings are those of create_session; proxies and certificate bundles
+        from the environment are not looked up.
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False,
+                 stats=None):
+        self.pool_stats = stats or PoolStats()
+        self.pool_manager = urllib3.PoolManager(num_pools=pool_connections, maxsize=pool_maxsize, block=pool_block)
+        self.pool_manager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self.pool_stats),
+            'https': _counting_pool(HTTPSConnectionPool, self.pool_stats),
+        }
+
+    def prepare(self, method, url, params=None, data=None, json=None, headers=None, auth=None):
+        return encode_request(method, url, params, data, json, headers, auth)
+
+    def send(self, request, timeout=None):
+        body = request.body
+        if six.PY2 and isinstance(body, StreamingBody) and not request.chunked:
+            body = _BodyReader(body)
+        try:
+            raw = self.pool_manager.urlopen(request.method, request.url, body=body, headers=request.headers,
+                                            chunked=request.chunked, timeout=timeout, retries=False,
+                                            redirect=False, preload_content=False)
+        except Urllib3HTTPError as e:
+            raise _translate(e)
+        return Urllib3Response(raw, request)
+
+    @property
+    def stats(self):
+        return self.pool_stats.as_dict()
+
+    def close(self):
+        self.pool_manager.clear()
+
+
+class MemoryResponse(Response):
+
+    def __init__(self, status_code, content, headers, request):
+        self.status_code = status_code
+        self.content = content
+        self.headers = HTTPHeaderDict(headers)
+        self.request = request
+
+
+class MemoryTransport(Transport):
+    """
+        canned answers without any network io, to measure the cost of the client itself.
+
+        responses maps an endpoint ('search', 'insert/status', ...) to (status, body[, headers]),
+        body may be a function taking the Request and returning the body or such a tuple.
+        other endpoints get a 404. request bodies are generated in full as they would be sent,
+        `content` of the Request is set to them, the last `keep` requests are in `requests`.
+    """
+
+    def __init__(self, responses=None, keep=100):
+        self.responses = dict(responses or {})
+        self.requests = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def prepare(self, method, url, params=None, data=None, json=None, headers=None, auth=None):
+        return encode_request(method, url, params, data, json, headers, auth)
+
+    def send(self, request, timeout=None):
+        body = request.body
+        if body is not None and not isinstance(body, six.binary_type):
+            body = _join(body)
+        request.content = body or b''
+        with self._lock:
+            self.requests.append(request)
+
+        endpoint = endpoint_of(urlparse(request.url).path.lstrip('/'))
+        response = tuple(self.responses.get(endpoint, (404, '{}')))
+        if callable(response[1]):
+            resp_body = response[1](request)
+            response = resp_body if isinstance(resp_body, tuple) else (response[0], resp_body) + response[2:]
+        status, resp_body, headers = (response + ({}, ))[:3]
+        # the canned headers are reused by every response
+        headers = dict(headers)
+        headers.setdefault('Content-Type', 'application/json')
+        return MemoryResponse(status, _to_bytes(resp_body), headers, request)